@@ -7,7 +7,7 @@ from dash.exceptions import PreventUpdate
 
 import dash_bootstrap_components as dbc
 
-from components import layout
+from components import layout, api, metrics, profiling
 
 app = dash.Dash(
     __name__,
@@ -17,9 +17,13 @@ app = dash.Dash(
     ],  # CYBORG BOOTSTRAP SLATE MORPH FLATLY
 )
 app.title = "PV Design"
+metrics.instrument(app)  # before the callbacks are registered by the layout
 app.layout = layout.create_layout(app)
+profiling.instrument(app)  # opt-in, see components/profiling.py
 
 server = app.server  # for gunicorn: run "gunicorn app:server"
+api.register(server)  # json endpoints under /api/v1
+metrics.register(server)  # prometheus text format under /metrics
 
 if __name__ == "__main__":
     app.run_server(debug=True, port=8888)
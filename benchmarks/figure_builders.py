@@ -0,0 +1,226 @@
+# compares the dict based figure builders in components/figures.py with the
+# previous plotly.graph_objects implementation, run with
+#   python -m benchmarks.figure_builders
+import timeit
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+from plotly.subplots import make_subplots
+
+from components import figures, simulation
+
+PANEL_COUNTS = [1, 10, 50, 200]
+REPEAT = 5
+
+
+def style_figure(fig: go.Figure):
+    fig.update_xaxes(**figures.AXIS_STYLE)
+    fig.update_yaxes(**figures.AXIS_STYLE)
+    fig.update_layout(
+        margin=dict(l=5, r=5, t=50, b=5),
+        legend=dict(
+            x=0.0,
+            y=1.0,
+            bgcolor="rgba(255, 255, 255, 0.9)",
+            bordercolor="rgba(255, 255, 255, 1)",
+        ),
+    )
+
+
+def legacy_day_figure(times, powers_W, energies_kWh, labels, colors, title):
+    fig = make_subplots(rows=1, cols=1, specs=[[{"secondary_y": True}]])
+    for k, (label, color) in enumerate(zip(labels, colors)):
+        fig.add_trace(
+            go.Scatter(
+                x=times,
+                y=powers_W[:, k],
+                name=f"Pwr {label} [W]",
+                hovertemplate="%{y:.1f}%{_xother}",
+                line=dict(width=3, color=color),
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=times,
+                y=energies_kWh[:, k],
+                name=f"Energy {label} [kWh]",
+                hovertemplate="%{y:.2f}%{_xother}",
+                line=dict(width=3, dash="dot", color=color),
+            ),
+            secondary_y=True,
+        )
+    fig.add_trace(
+        go.Scatter(
+            x=times,
+            y=powers_W.sum(axis=1),
+            name="Pwr Sum [W]",
+            hovertemplate="%{y:.1f}%{_xother}",
+            line=dict(color="black", width=4),
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=times,
+            y=energies_kWh.sum(axis=1),
+            name="Energy Sum [kWh]",
+            hovertemplate="%{y:.2f}%{_xother}",
+            line=dict(color="black", width=4, dash="dot"),
+        ),
+        secondary_y=True,
+    )
+    fig.update_layout(
+        hovermode="x unified",
+        title=title,
+        yaxis1=dict(title="Power [W]"),
+        yaxis2=dict(title="Energy [kWh]"),
+    )
+    style_figure(fig=fig)
+    return fig
+
+
+def legacy_annual_figure(months, energies_kWh, labels, colors, title):
+    fig = go.Figure()
+    for k, (label, color) in enumerate(zip(labels, colors)):
+        fig.add_trace(
+            go.Bar(
+                name=label,
+                x=months,
+                y=energies_kWh[:, k],
+                hovertemplate="%{x}: %{y:.1f} kWh",
+                marker_color=color,
+            )
+        )
+    fig.add_trace(
+        go.Bar(
+            name="<b>total",
+            x=months,
+            y=energies_kWh.sum(axis=1),
+            hovertemplate="%{x}: %{y:.1f} kWh",
+            marker_color="black",
+        )
+    )
+    fig.update_layout(barmode="group", title=title, yaxis_title="Energy [kWh]")
+    style_figure(fig=fig)
+    return fig
+
+
+def legacy_contour_figure(azimuths_deg, tilts_deg, efficiency, markers):
+    eff_min = np.min(efficiency)
+    fig = go.Figure()
+    fig.add_trace(
+        go.Contour(
+            x=azimuths_deg,
+            y=tilts_deg,
+            z=np.round(efficiency, 2),
+            name="efficiency",
+            hovertemplate="azimuth: %{x}°<br>tilt: %{y}°<br>eff.: %{z}%<extra></extra>",
+            contours=dict(
+                coloring="heatmap",
+                showlabels=True,
+                labelfont=dict(size=16),
+                start=np.floor(eff_min - (eff_min % 5)),
+                size=5,
+                end=100,
+            ),
+            colorbar=dict(title=dict(text="Efficiency [%]", font=dict(size=14))),
+        )
+    )
+    for m in markers:
+        fig.add_trace(
+            go.Scatter(
+                x=[m["azimuth_deg"]],
+                y=[m["altitude_deg"]],
+                name=m["label"],
+                mode="markers",
+                showlegend=False,
+                marker_symbol="square-cross",
+                hovertemplate=f"<b>{m['label']}</b><br>azimuth: %{{x}}°<br>tilt: %{{y}}°<br>eff.:{m['efficiency']}%<extra></extra>",
+                marker=dict(
+                    size=30,
+                    color=m["color"],
+                    line=dict(width=2, color="DarkSlateGrey"),
+                ),
+            )
+        )
+    fig.update_layout(
+        margin=dict(l=5, r=5, t=5, b=5),
+        yaxis_title="Tilt Angle [deg]",
+        xaxis_title="Azimuth Angle [deg]",
+        xaxis=dict(dtick=45),
+        yaxis=dict(dtick=10),
+    )
+    return fig
+
+
+def make_inputs(n: int) -> dict:
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2022-06-21", periods=48, freq="30min", tz="Europe/Vienna")
+    powers_W = rng.uniform(0, 1000, (len(times), n))
+    labels = [f"{i+1}.Panel" for i in range(n)]
+    colors = ["#FF0000"] * n
+    markers = [
+        dict(
+            label=labels[i],
+            azimuth_deg=float(i % 360),
+            altitude_deg=float(i % 90),
+            efficiency=90.0,
+            color=colors[i],
+        )
+        for i in range(n)
+    ]
+    return dict(
+        day=dict(
+            times=times,
+            powers_W=powers_W,
+            energies_kWh=np.cumsum(powers_W, axis=0) / 2000,
+            labels=labels,
+            colors=colors,
+            title="day",
+        ),
+        annual=dict(
+            months=simulation.MONTHS,
+            energies_kWh=rng.uniform(0, 500, (12, n)),
+            labels=labels,
+            colors=colors,
+            title="year",
+        ),
+        contour=dict(
+            azimuths_deg=np.linspace(0, 360, 9),
+            tilts_deg=np.linspace(0, 90, 7),
+            efficiency=rng.uniform(50, 100, (7, 9)),
+            markers=markers,
+        ),
+    )
+
+
+def best_of(fn, kwargs) -> float:
+    return min(
+        timeit.repeat(lambda: to_json_plotly(fn(**kwargs)), number=1, repeat=REPEAT)
+    )
+
+
+def main():
+    builders = [
+        ("day", legacy_day_figure, figures.day_figure),
+        ("annual", legacy_annual_figure, figures.annual_figure),
+        ("contour", legacy_contour_figure, figures.contour_figure),
+    ]
+    print(
+        f"{'figure':<8} {'panels':>6} {'legacy [ms]':>12} "
+        f"{'dict [ms]':>10} {'speedup':>8}"
+    )
+    for n in PANEL_COUNTS:
+        inputs = make_inputs(n)
+        for name, legacy, new in builders:
+            t_legacy = best_of(legacy, inputs[name])
+            t_new = best_of(new, inputs[name])
+            print(
+                f"{name:<8} {n:>6} {t_legacy * 1000:>12.1f} {t_new * 1000:>10.1f}"
+                f" {t_legacy / t_new:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
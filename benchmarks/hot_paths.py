@@ -0,0 +1,313 @@
+# times the simulation, optimization and figure code paths of the app for
+# several panel counts and resolutions, runs offline (fixed location, no
+# geocoding) and compares against the stored baselines:
+#   python -m benchmarks.hot_paths                 # compare, exit 1 on regression
+#   python -m benchmarks.hot_paths --save          # store new baselines
+#   python -m benchmarks.hot_paths -k figure       # only matching cases
+import argparse
+import inspect
+import json
+import os
+import sys
+import timeit
+from datetime import date
+
+import numpy as np
+
+from components import ids, simulation, panels, prefetch
+from components.geolocation import with_opti_angles
+from components.location import Geolocation
+from components.panel import Panel
+from components.panels import AllPanels
+from components.result_graph import (
+    create_day_figure,
+    create_annual_figure,
+    create_optimal_contour_figure,
+)
+
+PANEL_COUNTS = [1, 10, 100]
+FREQ_MINUTES = [60, 15]
+REPEAT = 5
+THRESHOLD = 0.5  # allowed slowdown against the baseline, timings are noisy
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+YEAR = 2022
+THEDATE = date(YEAR, 6, 21)
+WEATHER = [0.4, 0.5, 0.6, 0.7, 0.8, 0.8, 0.9, 0.8, 0.7, 0.6, 0.4, 0.4]
+GEOLOCATION = Geolocation(
+    lat=48.2083537,
+    lon=16.3725042,
+    ele=171.0,
+    tz_str="Europe/Vienna",
+    address="Wien, Österreich",
+)
+
+
+def make_panels(n: int) -> list[Panel]:
+    return [
+        Panel(
+            label=f"panel {i + 1}",
+            size_m2=float(1 + i % 20),
+            azimuth_deg=float((90 + 37 * i) % 360),
+            altitude_deg=float((15 + 11 * i) % 90),
+            color="#FF0000",
+        )
+        for i in range(n)
+    ]
+
+
+def opti_geolocation() -> Geolocation:
+    return with_opti_angles(GEOLOCATION.copy(), year=YEAR)
+
+
+def cold():
+    # every repetition starts without cached sky conditions and results
+    simulation.clear_caches()
+    panels.days_of_interest.cache_clear()
+
+
+def render_graph_callback():
+    from app import app
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    # render_graph looks at its trigger, calls are timed as tab switches
+    context_value.set(
+        AttributeDict(
+            triggered_inputs=[dict(prop_id=f"{ids.TABS_PLOT}.active_tab", value=None)]
+        )
+    )
+    return inspect.unwrap(app.callback_map[f"{ids.DIV_GRAPH}.children"]["callback"])
+
+
+def cases() -> list[tuple]:
+    # (name, setup before every repetition, timed function)
+    loc = dict(
+        tz_str=GEOLOCATION.tz_str,
+        lat=GEOLOCATION.lat,
+        lon=GEOLOCATION.lon,
+        ele=GEOLOCATION.ele,
+    )
+    result = []
+
+    for freq in FREQ_MINUTES:
+        panel = make_panels(1)[0]
+        times = simulation.year_times(YEAR, GEOLOCATION.tz_str, freq)
+        result.append(
+            (
+                f"panel.dc_power[freq={freq}]",
+                None,
+                lambda p=panel, t=times: p.dc_power(times=t, **loc),
+            )
+        )
+        result.append(
+            (
+                f"panel.monthly_energy[cold,freq={freq}]",
+                cold,
+                lambda p=panel, f=freq: p.monthly_energy(
+                    monthly_weather_factors=WEATHER,
+                    year=YEAR,
+                    label="p",
+                    freq_minutes=f,
+                    **loc,
+                ),
+            )
+        )
+
+    for n in PANEL_COUNTS:
+        for freq in FREQ_MINUTES:
+            allpanels = AllPanels(panels=make_panels(n))
+            result.append(
+                (
+                    f"allpanels.monthly_energy[n={n},freq={freq}]",
+                    None,
+                    lambda a=allpanels, f=freq: a.monthly_energy(
+                        monthly_weather_factors=WEATHER,
+                        year=YEAR,
+                        freq_minutes=f,
+                        **loc,
+                    ),
+                )
+            )
+            result.append(
+                (
+                    f"allpanels.monthly_energy[cold,n={n},freq={freq}]",
+                    cold,
+                    lambda a=allpanels, f=freq: a.monthly_energy(
+                        monthly_weather_factors=WEATHER,
+                        year=YEAR,
+                        freq_minutes=f,
+                        **loc,
+                    ),
+                )
+            )
+            result.append(
+                (
+                    f"allpanels.get_days_of_interest[cold,n={n},freq={freq}]",
+                    cold,
+                    lambda a=allpanels, f=freq: a.get_days_of_interest(
+                        year=YEAR, freq_minutes=f, **loc
+                    ),
+                )
+            )
+            result.append(
+                (
+                    f"allpanels.get_days_of_interest[n={n},freq={freq}]",
+                    None,
+                    lambda a=allpanels, f=freq: a.get_days_of_interest(
+                        year=YEAR, freq_minutes=f, **loc
+                    ),
+                )
+            )
+
+    result.append(("geolocation.opti_matrix_build[cold]", cold, opti_geolocation))
+    geolocation = opti_geolocation()
+    result.append(
+        (
+            "geolocation.get_opti_matrix",
+            None,
+            lambda: geolocation.get_opti_matrix(WEATHER),
+        )
+    )
+
+    for n in PANEL_COUNTS:
+        allpanels = AllPanels(panels=make_panels(n))
+        result.append(
+            (
+                f"figure.day[n={n}]",
+                None,
+                lambda a=allpanels: create_day_figure(
+                    geolocation=geolocation, allpanels=a, thedate=THEDATE
+                ),
+            )
+        )
+        result.append(
+            (
+                f"figure.annual[n={n}]",
+                None,
+                lambda a=allpanels: create_annual_figure(
+                    geolocation=geolocation,
+                    allpanels=a,
+                    thedate=THEDATE,
+                    monthly_weather_factors=WEATHER,
+                ),
+            )
+        )
+        result.append(
+            (
+                f"figure.contour[n={n}]",
+                None,
+                lambda a=allpanels: create_optimal_contour_figure(
+                    geolocation=geolocation,
+                    thedate=THEDATE,
+                    monthly_weather_factors=WEATHER,
+                    allpanels=a,
+                ),
+            )
+        )
+
+    render_graph = render_graph_callback()
+    for n in PANEL_COUNTS:
+        panel_data = AllPanels(panels=make_panels(n)).dict()
+        for tab in [
+            ids.TAB_PLOT_DAY,
+            ids.TAB_PLOT_YEAR,
+            ids.TAB_PLOT_OPTI,
+            ids.TAB_PLOT_INVERTER,
+        ]:
+            result.append(
+                (
+                    f"render_graph[n={n},tab={tab}]",
+                    None,
+                    lambda d=panel_data, t=tab: render_graph(
+                        d, geolocation.dict(), WEATHER, THEDATE.isoformat(), t
+                    ),
+                )
+            )
+    return result
+
+
+def calibrate() -> float:
+    # fixed numpy workload, baselines are scaled by its runtime so they
+    # can be compared across machines
+    x = np.random.default_rng(0).uniform(size=(500, 500))
+    return min(timeit.repeat(lambda: np.sin(x) @ x, number=5, repeat=4 * REPEAT))
+
+
+def best_of(setup, fn, repeat: int) -> float:
+    # seconds per call, fast cases are looped for at least 0.2s per repetition
+    fn()  # warm up imports and caches that are always warm in the app
+    if setup is None:
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        return min(timer.repeat(number=number, repeat=repeat)) / number
+    times = []
+    for _ in range(repeat):
+        setup()
+        times.append(timeit.timeit(fn, number=1))
+    return min(times)
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmark the hot code paths")
+    parser.add_argument("-k", "--filter", default="", help="only names containing")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true", help="store as baseline")
+    args = parser.parse_args(argv)
+    # no background work while timing, render_graph would start the prefetch
+    os.environ[prefetch.CPU_SHARE_ENV] = "0"
+
+    baselines = load_baselines(args.baseline)
+    calibration = calibrate()
+    scale = calibration / baselines.get("_calibration_s", calibration)
+
+    print(f"machine speed relative to the baseline: {1 / scale:.2f}")
+    results = {}
+    regressions = []
+    print(f"{'case':<52} {'time [ms]':>10} {'baseline':>10} {'change':>8}")
+    for name, setup, fn in cases():
+        if args.filter not in name:
+            continue
+        t = best_of(setup, fn, args.repeat)
+        results[name] = t
+        line = f"{name:<52} {t * 1000:>10.2f}"
+        if name in baselines.get("cases", {}):
+            expected = baselines["cases"][name] * scale
+            change = t / expected - 1
+            line += f" {expected * 1000:>10.2f} {change:>+7.0%}"
+            if change > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        # kept baselines are rescaled to the new calibration
+        cases_saved = {k: v * scale for k, v in baselines.get("cases", {}).items()}
+        cases_saved.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                dict(_calibration_s=calibration, cases=cases_saved),
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"saved {len(results)} baselines to {args.baseline}")
+        return 0
+
+    if len(regressions) > 0:
+        print(f"{len(regressions)} case(s) slower than +{args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# compares the lifetime projection from one simulated year against full
+# simulations of every year without degradation, runs offline like the
+# hot paths and exits 1 if a year deviates more than the threshold:
+#   python -m benchmarks.lifetime_accuracy
+#   python -m benchmarks.lifetime_accuracy --years 10 --panels 100
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from components import lifetime, simulation
+
+from .hot_paths import GEOLOCATION, WEATHER, YEAR, make_panels
+
+THRESHOLD = 0.005  # relative deviation of one year's total energy
+PANELS = 10
+
+
+def simulate_years(panels: list, years: int) -> np.ndarray:
+    # (years, n) annual energy [kWh], one simulation per year
+    return np.array(
+        [
+            simulation.monthly_energy_batch(
+                panels,
+                tz_str=GEOLOCATION.tz_str,
+                lat=GEOLOCATION.lat,
+                lon=GEOLOCATION.lon,
+                ele=GEOLOCATION.ele,
+                monthly_weather_factors=WEATHER,
+                year=YEAR + k,
+            ).sum(axis=0)
+            for k in range(years)
+        ]
+    )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="accuracy of the projection")
+    parser.add_argument("--years", type=int, default=lifetime.LIFETIME_YEARS)
+    parser.add_argument("--panels", type=int, default=PANELS)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    panels = make_panels(args.panels)
+    start = time.perf_counter()
+    simulated = simulate_years(panels, args.years)
+    simulated_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_year = simulation.monthly_energy_batch(
+        panels,
+        tz_str=GEOLOCATION.tz_str,
+        lat=GEOLOCATION.lat,
+        lon=GEOLOCATION.lon,
+        ele=GEOLOCATION.ele,
+        monthly_weather_factors=WEATHER,
+        year=YEAR,
+    )
+    projected = lifetime.project(first_year, YEAR, args.years, 0.0)
+    projected_s = time.perf_counter() - start
+
+    deviation = projected / simulated - 1
+    print(f"{'year':<6} {'simulated [kWh]':>16} {'projected [kWh]':>16} {'max dev':>8}")
+    for k in range(args.years):
+        print(
+            f"{YEAR + k:<6} {simulated[k].sum():>16.1f} {projected[k].sum():>16.1f}"
+            f" {np.abs(deviation[k]).max():>8.3%}"
+        )
+    print(
+        f"{args.years} simulated years {simulated_s:.2f} s, "
+        f"projection {projected_s * 1000:.1f} ms (first year cached)"
+    )
+
+    worst = np.abs(deviation).max()
+    if worst > args.threshold:
+        print(f"largest deviation {worst:.3%} above {args.threshold:.1%}")
+        return 1
+    print(f"largest deviation {worst:.3%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
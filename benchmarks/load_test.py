@@ -0,0 +1,355 @@
+# replays dash callback requests concurrently against a local server and
+# reports throughput and latency percentiles per callback; the server runs
+# with a stubbed geocoder, so no network is needed:
+#   python -m benchmarks.load_test run --users 8 --duration 30 --workers 4
+#   python -m benchmarks.load_test run --url http://127.0.0.1:8050 --payloads rec.jsonl
+#   python -m benchmarks.load_test serve --port 8050 --workers 4
+# real payloads are recorded with PV_RECORD_FILE=rec.jsonl (components/profiling.py)
+import argparse
+import hashlib
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from plotly.io.json import to_json_plotly
+
+from components import ids
+from components.location import Geolocation
+
+UPDATE_PATH = "/_dash-update-component"
+ADDRESSES = ["Wien", "Graz", "Linz", "Salzburg", "Innsbruck", "München", "Zürich"]
+YEAR_DATE = "2022-06-21"
+WEATHER = [0.4, 0.5, 0.6, 0.7, 0.8, 0.8, 0.9, 0.8, 0.7, 0.6, 0.4, 0.4]
+STARTUP_TIMEOUT_S = 60
+
+
+def fake_geolocation(location_str: str) -> Geolocation:
+    # deterministic coordinates in central europe instead of nominatim,
+    # the same address always resolves to the same location
+    from components.geolocation import tf
+
+    digest = hashlib.sha256(location_str.strip().lower().encode()).digest()
+    lat = round(45.0 + digest[0] / 255 * 10.0, 4)
+    lon = round(5.0 + digest[1] / 255 * 15.0, 4)
+    return Geolocation(
+        lat=lat,
+        lon=lon,
+        ele=float(100 + digest[2] * 4),
+        tz_str=tf.timezone_at(lng=lon, lat=lat) or "Europe/Vienna",
+        address=location_str,
+    )
+
+
+def stubbed_server():
+    # gunicorn entry point: gunicorn "benchmarks.load_test:stubbed_server()"
+    from components import geolocation
+    from app import server
+
+    geolocation.lookup_geolocation = fake_geolocation
+    return server
+
+
+def _dash_id(id_str: str, index):
+    # pattern-matching ids are stored as json with ["MATCH"] wildcards
+    if not id_str.startswith("{"):
+        return id_str
+    return {k: index if v == ["MATCH"] else v for k, v in json.loads(id_str).items()}
+
+
+def _prop_id(dash_id, prop: str) -> str:
+    if isinstance(dash_id, dict):
+        dash_id = json.dumps(dash_id, sort_keys=True, separators=(",", ":"))
+    return f"{dash_id}.{prop}"
+
+
+def build_payload(
+    callback_map: dict, output: str, values: dict, changed: str, index=None
+) -> dict:
+    # request body as sent by the dash renderer; values are keyed by
+    # "<id or pattern type>.<property>", changed is one of these keys
+    entry = callback_map[output]
+    changed_ids = []
+
+    def items(specs: list[dict]) -> list[dict]:
+        result = []
+        for spec in specs:
+            dash_id = _dash_id(spec["id"], index)
+            key = dash_id["type"] if isinstance(dash_id, dict) else dash_id
+            key = f"{key}.{spec['property']}"
+            if key == changed:
+                changed_ids.append(_prop_id(dash_id, spec["property"]))
+            result.append(
+                dict(id=dash_id, property=spec["property"], value=values.get(key))
+            )
+        return result
+
+    outputs = [
+        dict(id=_dash_id(o.component_id_str(), index), property=o.component_property)
+        for o in (entry["output"] if isinstance(entry["output"], list) else [])
+    ]
+    if not isinstance(entry["output"], list):
+        o = entry["output"]
+        outputs = dict(
+            id=_dash_id(o.component_id_str(), index), property=o.component_property
+        )
+
+    return dict(
+        output=output,
+        outputs=outputs,
+        inputs=items(entry["inputs"]),
+        state=items(entry["state"]),
+        changedPropIds=changed_ids,
+    )
+
+
+def scenario_flows(n_panels: int, seed: int = 0) -> dict[str, list[dict]]:
+    # the geolocation, panel edit, tab switch and date button flows as the
+    # browser sends them, for one user with n_panels panels
+    from app import app
+    from components.geolocation import with_opti_angles
+
+    rng = random.Random(seed)
+    address = rng.choice(ADDRESSES)
+    # as the browser holds it in the store, after the json round trip
+    geolocation = json.loads(
+        to_json_plotly(with_opti_angles(fake_geolocation(address), year=2022).dict())
+    )
+    panels = [
+        dict(
+            label=f"panel {i + 1}",
+            size_m2=float(rng.randint(1, 20)),
+            azimuth_deg=float(rng.randint(0, 359)),
+            altitude_deg=float(rng.randint(0, 90)),
+            active=True,
+            color="#FF0000",
+            pdc0_Wpm2=None,
+        )
+        for i in range(n_panels)
+    ]
+    values = {
+        f"{ids.INPUT_LOCATION}.value": address,
+        f"{ids.STORE_PANELS}.data": dict(panels=panels),
+        f"{ids.STORE_GEOLOCATION}.data": geolocation,
+        f"{ids.STORE_WEATHER}.data": WEATHER,
+        f"{ids.DATEPICKER}.date": YEAR_DATE,
+        f"{ids.BTN_DATE_PMAX}.n_clicks": 1,
+    }
+    callback_map = app.callback_map
+    graph = f"{ids.DIV_GRAPH}.children"
+
+    def render(tab: str) -> dict:
+        return build_payload(
+            callback_map,
+            graph,
+            {**values, f"{ids.TABS_PLOT}.active_tab": tab},
+            f"{ids.TABS_PLOT}.active_tab",
+        )
+
+    edited = dict(panels[0], azimuth_deg=(panels[0]["azimuth_deg"] + 15) % 360)
+    edit_values = {
+        f"{ids.STORE_PANEL}.data": panels[0],
+        f"{ids.CHECKBOX_PANEL_ACTIVE}.value": True,
+        f"{ids.INPUT_PANEL_LABEL}.value": edited["label"],
+        f"{ids.INPUT_PANEL_AZI}.value": edited["azimuth_deg"],
+        f"{ids.INPUT_PANEL_ALT}.value": edited["altitude_deg"],
+        f"{ids.INPUT_PANEL_SIZE}.value": edited["size_m2"],
+        f"{ids.INPUT_PANEL_COLOR}.value": edited["color"],
+        f"{ids.INPUT_PANEL_MOUNT}.value": "fixed",
+        f"{ids.INPUT_PANEL_INVERTER}.value": None,
+    }
+    modify_output = next(k for k in callback_map if f'"{ids.STORE_PANEL}"' in k)
+    geostore_output = next(k for k in callback_map if ids.STORE_GEOLOCATION in k)
+
+    return {
+        "geolocation": [
+            build_payload(
+                callback_map,
+                geostore_output,
+                values,
+                f"{ids.INPUT_LOCATION}.value",
+            ),
+        ],
+        "panel_edit": [
+            build_payload(
+                callback_map,
+                modify_output,
+                edit_values,
+                f"{ids.INPUT_PANEL_AZI}.value",
+                index="load-test",
+            ),
+            render(ids.TAB_PLOT_YEAR),
+        ],
+        "tab_switch": [
+            render(ids.TAB_PLOT_DAY),
+            render(ids.TAB_PLOT_YEAR),
+            render(ids.TAB_PLOT_OPTI),
+        ],
+        "date_buttons": [
+            build_payload(
+                callback_map,
+                f"{ids.DATEPICKER}.date",
+                values,
+                f"{ids.BTN_DATE_PMAX}.n_clicks",
+            ),
+            render(ids.TAB_PLOT_DAY),
+        ],
+    }
+
+
+def recorded_flows(path: str) -> dict[str, list[dict]]:
+    with open(path) as f:
+        payloads = [json.loads(line)["payload"] for line in f if line.strip() != ""]
+    return {"recorded": [p for p in payloads if p is not None]}
+
+
+def callback_names() -> dict[str, str]:
+    from app import app
+
+    return {
+        k: v["callback"].__name__
+        for k, v in app.callback_map.items()
+        if "callback" in v
+    }
+
+
+def _user(url: str, flows: dict, deadline: float, seed: int) -> list[tuple]:
+    # one virtual user: random flows until the deadline, the requests of a
+    # flow are sent one after the other like the browser does
+    rng = random.Random(seed)
+    session = requests.Session()
+    samples = []
+    names = list(flows)
+    while time.time() < deadline:
+        for payload in flows[rng.choice(names)]:
+            start = time.perf_counter()
+            try:
+                r = session.post(url + UPDATE_PATH, json=payload, timeout=120)
+                ok = r.status_code in (200, 204)
+            except requests.RequestException:
+                ok = False
+            samples.append((payload["output"], time.perf_counter() - start, ok))
+    return samples
+
+
+def run_load(url: str, flows: dict, users: int, duration_s: float) -> list[tuple]:
+    deadline = time.time() + duration_s
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [
+            pool.submit(_user, url, flows, deadline, seed) for seed in range(users)
+        ]
+        return [s for f in futures for s in f.result()]
+
+
+def report(samples: list[tuple], duration_s: float, names: dict):
+    print(
+        f"{'callback':<24} {'requests':>8} {'errors':>6} {'req/s':>7}"
+        f" {'p50 [ms]':>9} {'p95 [ms]':>9} {'p99 [ms]':>9}"
+    )
+    by_callback = {}
+    for output, seconds, ok in samples:
+        by_callback.setdefault(names.get(output, output), []).append((seconds, ok))
+    rows = sorted(by_callback.items()) + [("total", [(s, ok) for _, s, ok in samples])]
+    for name, values in rows:
+        latencies = np.array([s for s, _ in values]) * 1000
+        errors = sum(1 for _, ok in values if not ok)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rate = len(values) / duration_s
+        print(
+            f"{name[:24]:<24} {len(values):>8} {errors:>6} {rate:>7.1f}"
+            f" {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}"
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_command(port: int, workers: int, threads: int) -> list[str]:
+    if workers > 0:
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            f"--workers={workers}",
+            f"--threads={threads}",
+            f"--bind=127.0.0.1:{port}",
+            "benchmarks.load_test:stubbed_server()",
+        ]
+    return [sys.executable, "-m", "benchmarks.load_test", "serve", f"--port={port}"]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen):
+    deadline = time.time() + STARTUP_TIMEOUT_S
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            requests.get(url + "/_dash-layout", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError(f"server not up after {STARTUP_TIMEOUT_S}s")
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="load test the dash callbacks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the app with a stubbed geocoder")
+    serve.add_argument("--port", type=int, default=8050)
+    serve.add_argument("--workers", type=int, default=0, help="gunicorn workers")
+    serve.add_argument("--threads", type=int, default=1)
+    run = sub.add_parser("run", help="replay requests and report latencies")
+    run.add_argument("--url", help="running server, default: start one")
+    run.add_argument("--workers", type=int, default=0, help="gunicorn workers")
+    run.add_argument("--threads", type=int, default=1)
+    run.add_argument("--users", type=int, default=4)
+    run.add_argument("--duration", type=float, default=30.0)
+    run.add_argument("--panels", type=int, default=5)
+    run.add_argument("--payloads", help="recorded jsonl instead of the scenarios")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.workers > 0:
+            subprocess.run(serve_command(args.port, args.workers, args.threads))
+        else:
+            stubbed_server().run(port=args.port, threaded=True)
+        return
+
+    if args.payloads is not None:
+        flows = recorded_flows(args.payloads)
+    else:
+        flows = scenario_flows(args.panels)
+
+    process = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen(
+            serve_command(port, args.workers, args.threads),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    try:
+        if process is not None:
+            _wait_until_up(url, process)
+        mode = f"{args.workers} gunicorn workers" if args.workers else "dev server"
+        print(f"{args.users} users for {args.duration:.0f}s against {url} ({mode})")
+        samples = run_load(url, flows, args.users, args.duration)
+        report(samples, args.duration, callback_names())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
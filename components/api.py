@@ -0,0 +1,564 @@
+import json
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+from flask import Blueprint, Flask, Response, jsonify, request, stream_with_context
+from pydantic import BaseModel, ValidationError
+from scipy.interpolate import interp2d
+from scipy.optimize import minimize
+
+from . import (
+    simulation,
+    panel_io,
+    timeseries,
+    tmy,
+    horizon,
+    battery,
+    inverter,
+    lifetime,
+    uncertainty,
+)
+from .geolocation import tf, lookup_geolocation, lookup_elevation, with_opti_angles
+from .location import Geolocation
+from .panel import Panel
+from .panels import AllPanels, optimal_azimuth, optimal_tilt
+
+# json endpoints for integrators, mounted on the dash flask server;
+# every endpoint takes one request object or {"requests": [...]} and
+# simulates all panels sharing a location and year in one batch
+API_PREFIX = "/api/v1"
+MAX_API_REQUESTS = 1000
+MAX_API_PANELS = panel_io.MAX_IMPORT_ROWS
+GEOCODE_CACHE_SIZE = 256
+
+api = Blueprint("api", __name__, url_prefix=API_PREFIX)
+
+
+class ApiError(ValueError):
+    pass
+
+
+class SimulationRequest(BaseModel):
+    id: str = None
+    address: str = None
+    lat: float = None
+    lon: float = None
+    ele: float = None
+    tz_str: str = None
+    year: int = None
+    day: date = None
+    freq_minutes: int = None
+    monthly_weather_factors: list[float] = None
+    weather_file: str = None  # relative to PV_WEATHER_DIR, see tmy.py
+    horizon_deg: list[float] = None  # for panels without their own, horizon.py
+    battery_kWh: list[float] = None  # capacities to compare, battery.py
+    annual_load_kWh: float = battery.ANNUAL_LOAD_KWH
+    load_W: list[float] = None  # evenly spaced over the year, else synthetic
+    dc_ac_ratios: list[float] = None  # inverter sizes to compare, inverter.py
+    years: int = lifetime.LIFETIME_YEARS
+    degradation_per_year: float = lifetime.DEGRADATION_PER_YEAR
+    scenarios: int = uncertainty.SCENARIOS  # monte carlo, uncertainty.py
+    seed: int = None
+    panels: list[Panel] = []
+
+    @property
+    def weather_factors(self) -> np.ndarray:
+        if self.monthly_weather_factors is None:
+            return np.ones(12)
+        if len(self.monthly_weather_factors) != 12:
+            raise ApiError("monthly_weather_factors needs 12 values")
+        return np.asarray(self.monthly_weather_factors, dtype=float)
+
+    @property
+    def allpanels(self) -> AllPanels:
+        return AllPanels.construct(panels=self.panels)
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def _cached_geolocation(address: str) -> Geolocation:
+    return lookup_geolocation(address)
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def _cached_elevation(lat: float, lon: float) -> float:
+    return lookup_elevation(lat, lon)
+
+
+@lru_cache(maxsize=simulation.SKY_CACHE_SIZE)
+def _cached_opti_angles(
+    tz_str: str, lat: float, lon: float, ele: float, year: int
+) -> Geolocation:
+    geolocation = Geolocation(lat=lat, lon=lon, ele=ele, tz_str=tz_str)
+    return with_opti_angles(geolocation, year=year)
+
+
+def _check_freq_minutes(freq_minutes: int):
+    # the time steps have to tile every hour
+    if freq_minutes is None:
+        return
+    if not 0 < freq_minutes <= 60 or 60 % freq_minutes != 0:
+        raise ApiError(f"invalid freq_minutes {freq_minutes}, must divide 60")
+
+
+def _check_panels(panels: list[Panel]):
+    # the same limits as the panel import, unset values only skip a panel
+    for n, p in enumerate(panels):
+        if p.mount not in simulation.MOUNTS:
+            raise ApiError(f"unknown mount '{p.mount}', one of {simulation.MOUNTS}")
+        for field, (lo, hi) in panel_io.NUMERIC_LIMITS.items():
+            value = getattr(p, field)
+            if value is not None and not (lo <= value <= hi and np.isfinite(value)):
+                raise ApiError(f"panel {n + 1}: invalid {field} {value}")
+
+
+def _resolve(req: SimulationRequest) -> SimulationRequest:
+    _check_freq_minutes(req.freq_minutes)
+    _check_panels(req.panels)
+    if req.seed is not None and req.seed < 0:
+        raise ApiError("seed must not be negative")
+    if req.weather_file is not None:
+        try:
+            req.weather_file = tmy.resolve(req.weather_file)
+        except ValueError as e:
+            raise ApiError(str(e))
+    if req.lat is None or req.lon is None:
+        if req.address is None:
+            raise ApiError("either lat/lon or address is required")
+        geolocation = _cached_geolocation(req.address)
+        if geolocation is None:
+            raise ApiError(f"address '{req.address}' not found")
+        req.lat, req.lon = geolocation.lat, geolocation.lon
+        req.ele = req.ele if req.ele is not None else geolocation.ele
+        req.tz_str = req.tz_str or geolocation.tz_str
+    if not (-90 <= req.lat <= 90 and -180 <= req.lon <= 180):
+        raise ApiError(f"invalid coordinates {req.lat}, {req.lon}")
+    if req.ele is not None and not np.isfinite(req.ele):
+        raise ApiError(f"invalid elevation {req.ele}")
+    try:
+        for profile in [req.horizon_deg] + [p.horizon_deg for p in req.panels]:
+            if profile is not None:
+                horizon.validate(profile)
+    except ValueError as e:
+        raise ApiError(str(e))
+    req.panels = horizon.apply(req.panels, req.horizon_deg)
+    if req.tz_str is None:
+        req.tz_str = tf.timezone_at(lng=req.lon, lat=req.lat)
+    try:
+        pytz.timezone(req.tz_str)
+    except pytz.UnknownTimeZoneError:
+        raise ApiError(f"unknown timezone '{req.tz_str}'")
+    if req.ele is None:
+        req.ele = _cached_elevation(req.lat, req.lon)
+    if req.day is not None and req.year is None:
+        req.year = req.day.year
+    if req.year is None:
+        req.year = date.today().year
+    # the years pandas timestamps can represent in full
+    if not pd.Timestamp.min.year < req.year < pd.Timestamp.max.year:
+        raise ApiError(f"invalid year {req.year}")
+    return req
+
+
+def _parse_requests() -> list[SimulationRequest]:
+    body = request.get_json(silent=True)
+    if body is None and "payload" in request.form:
+        # plain html form posts, used by the download buttons of the ui
+        try:
+            body = json.loads(request.form["payload"])
+        except ValueError:
+            raise ApiError("payload must be json")
+    if body is None:
+        raise ApiError("request body must be json")
+    items = body.get("requests", [body]) if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        raise ApiError("requests must be a list")
+    if len(items) > MAX_API_REQUESTS:
+        raise ApiError(f"at most {MAX_API_REQUESTS} requests per call")
+    if not all(isinstance(item, dict) for item in items):
+        raise ApiError("every request must be a json object")
+
+    reqs = [SimulationRequest(**item) for item in items]
+    if sum(len(r.panels) for r in reqs) > MAX_API_PANELS:
+        raise ApiError(f"at most {MAX_API_PANELS} panels per call")
+    return [_resolve(r) for r in reqs]
+
+
+def _groups(reqs: list[SimulationRequest], *keys: str) -> dict:
+    # request indices grouped by location and the given fields
+    groups = {}
+    for k, r in enumerate(reqs):
+        key = (r.tz_str, r.lat, r.lon, r.ele) + tuple(getattr(r, f) for f in keys)
+        groups.setdefault(key, []).append(k)
+    return groups
+
+
+def _simulated_panels(req: SimulationRequest) -> list:
+    allpanels = req.allpanels
+    return [allpanels.panels[i] for i in allpanels.simulated_indices]
+
+
+def _batched_power(reqs: list[SimulationRequest], indices: list[int], sky) -> list:
+    # simulates the active panels of several requests in one call and
+    # splits the (times, panels) result per request
+    panels = []
+    bounds = [0]
+    for k in indices:
+        panels += _simulated_panels(reqs[k])
+        bounds.append(len(panels))
+    pwr = simulation.panels_dc_power(panels, sky)
+    return [pwr[:, bounds[n] : bounds[n + 1]] for n in range(len(indices))]
+
+
+def _labels(req: SimulationRequest) -> list[str]:
+    allpanels = req.allpanels
+    return [allpanels.label(i) for i in allpanels.simulated_indices]
+
+
+@api.errorhandler(ApiError)
+@api.errorhandler(ValidationError)
+def _bad_request(e):
+    return jsonify(error=str(e)), 400
+
+
+@api.route("/monthly-energy", methods=["POST"])
+def monthly_energy():
+    reqs = _parse_requests()
+    for r in reqs:
+        r.freq_minutes = r.freq_minutes or 60
+    results = [None] * len(reqs)
+
+    for (tz_str, lat, lon, ele, year, freq_minutes, weather_file), indices in _groups(
+        reqs, "year", "freq_minutes", "weather_file"
+    ).items():
+        # one cached, weather independent simulation for all requests of
+        # the group, the weather of each request is applied afterwards
+        panels = [_simulated_panels(reqs[k]) for k in indices]
+        yields = simulation.monthly_yields(
+            [p for group in panels for p in group],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            year=year,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
+        )
+        bounds = np.cumsum([0] + [len(group) for group in panels])
+        for n, k in enumerate(indices):
+            pdc0 = np.array([p.pdc0_W for p in panels[n]], dtype=float)
+            e_kWh = yields[:, bounds[n] : bounds[n + 1]] * pdc0[None, :]
+            e_kWh = e_kWh * reqs[k].weather_factors[:, None]
+            results[k] = dict(
+                id=reqs[k].id,
+                year=year,
+                labels=_labels(reqs[k]),
+                energy_kWh=np.round(e_kWh.T, 2).tolist(),
+                total_kWh=round(float(e_kWh.sum()), 2),
+            )
+
+    return jsonify(months=simulation.MONTHS, results=results)
+
+
+@api.route("/day-curve", methods=["POST"])
+def day_curve():
+    reqs = _parse_requests()
+    for r in reqs:
+        r.freq_minutes = r.freq_minutes or 30
+        r.day = r.day or date.today()
+    results = [None] * len(reqs)
+
+    groups = _groups(reqs, "day", "freq_minutes", "weather_file")
+    for (
+        tz_str,
+        lat,
+        lon,
+        ele,
+        thedate,
+        freq_minutes,
+        weather_file,
+    ), indices in groups.items():
+        times = simulation.day_times(thedate, tz_str=tz_str, freq_minutes=freq_minutes)
+        sky = simulation.sky_conditions(
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            times=times,
+            weather_file=weather_file,
+        )
+        for k, pwr in zip(indices, _batched_power(reqs, indices, sky)):
+            results[k] = dict(
+                id=reqs[k].id,
+                day=thedate.isoformat(),
+                times=[t.isoformat() for t in times],
+                labels=_labels(reqs[k]),
+                power_W=np.round(pwr.T, 1).tolist(),
+                energy_kWh=np.round(
+                    simulation.cumulative_energy(pwr, freq_minutes).T, 3
+                ).tolist(),
+            )
+
+    return jsonify(results=results)
+
+
+@api.route("/days-of-interest", methods=["POST"])
+def days_of_interest():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        if len(r.allpanels.simulated_indices) == 0:
+            results.append(dict(id=r.id, error="no active panels"))
+            continue
+        days = r.allpanels.get_days_of_interest(
+            year=r.year,
+            tz_str=r.tz_str,
+            lat=r.lat,
+            lon=r.lon,
+            ele=r.ele,
+            freq_minutes=r.freq_minutes or 60,
+            weather_file=r.weather_file,
+        )
+        results.append(dict(id=r.id, **{k: v.isoformat() for k, v in days}))
+
+    return jsonify(results=results)
+
+
+@api.route("/optimal-angles", methods=["POST"])
+def optimal_angles():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        geolocation = _cached_opti_angles(r.tz_str, r.lat, r.lon, r.ele, r.year)
+        weather_factors = list(r.weather_factors)
+
+        (x, y, z) = geolocation.get_opti_matrix(weather_factors)
+        f_2d = interp2d(x, y, z.T, kind="cubic")
+        j, i = np.unravel_index(np.argmax(z.T), z.T.shape)
+        best = minimize(
+            fun=lambda v: -f_2d(v[0], v[1])[0],
+            x0=[x[i], y[j]],
+            bounds=[(0, 360), (0, 90)],
+        )
+
+        panels = [
+            dict(
+                label=r.allpanels.label(i),
+                optimal_azimuth_deg=round(
+                    optimal_azimuth(geolocation, p.altitude_deg, weather_factors), 1
+                ),
+                optimal_tilt_deg=round(
+                    optimal_tilt(geolocation, p.azimuth_deg, weather_factors), 1
+                ),
+            )
+            for i, p in enumerate(r.panels)
+            if p.ready and p.active and p.mount == "fixed"
+        ]
+        results.append(
+            dict(
+                id=r.id,
+                azimuth_deg=round(float(best.x[0]), 1),
+                tilt_deg=round(float(best.x[1]), 1),
+                panels=panels,
+            )
+        )
+
+    return jsonify(results=results)
+
+
+@api.route("/lifetime", methods=["POST"])
+def lifetime_energy():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        if not 1 <= r.years <= lifetime.MAX_LIFETIME_YEARS:
+            raise ApiError(f"years must be between 1 and {lifetime.MAX_LIFETIME_YEARS}")
+        if not 0 <= r.degradation_per_year < 1:
+            raise ApiError("degradation_per_year must be between 0 and 1")
+        if len(r.allpanels.simulated_indices) == 0:
+            results.append(dict(id=r.id, error="no active panels"))
+            continue
+        df = r.allpanels.lifetime_energy(
+            tz_str=r.tz_str,
+            lat=r.lat,
+            lon=r.lon,
+            ele=r.ele,
+            monthly_weather_factors=r.weather_factors,
+            year=r.year,
+            years=r.years,
+            degradation_per_year=r.degradation_per_year,
+            freq_minutes=r.freq_minutes or 60,
+            weather_file=r.weather_file,
+        )
+        results.append(
+            dict(
+                id=r.id,
+                years=df.index.tolist(),
+                labels=_labels(r),
+                energy_kWh=np.round(df.values.T, 2).tolist(),
+                total_kWh=round(float(df.values.sum()), 2),
+            )
+        )
+
+    return jsonify(results=results)
+
+
+@api.route("/uncertainty", methods=["POST"])
+def yield_uncertainty():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        if not 1 <= r.scenarios <= uncertainty.MAX_SCENARIOS:
+            raise ApiError(
+                f"scenarios must be between 1 and {uncertainty.MAX_SCENARIOS}"
+            )
+        if len(r.allpanels.simulated_indices) == 0:
+            results.append(dict(id=r.id, error="no active panels"))
+            continue
+        exceedance = r.allpanels.yield_uncertainty(
+            tz_str=r.tz_str,
+            lat=r.lat,
+            lon=r.lon,
+            ele=r.ele,
+            monthly_weather_factors=r.weather_factors,
+            year=r.year,
+            scenarios=r.scenarios,
+            seed=r.seed,
+            freq_minutes=r.freq_minutes or 60,
+            weather_file=r.weather_file,
+        )
+        results.append(
+            dict(
+                id=r.id,
+                year=r.year,
+                scenarios=r.scenarios,
+                **{k: round(float(v), 2) for k, v in exceedance.items()},
+            )
+        )
+
+    return jsonify(results=results)
+
+
+@api.route("/battery-sweep", methods=["POST"])
+def battery_sweep():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        capacities = r.battery_kWh if r.battery_kWh is not None else [0.0]
+        if len(capacities) > battery.MAX_CAPACITIES:
+            raise ApiError(f"at most {battery.MAX_CAPACITIES} battery capacities")
+        if any(not 0 <= c < np.inf for c in capacities):
+            raise ApiError("battery capacities must be finite and not negative")
+        if not 0 <= r.annual_load_kWh < np.inf:
+            raise ApiError("annual_load_kWh must be finite and not negative")
+        if len(r.allpanels.simulated_indices) == 0:
+            results.append(dict(id=r.id, error="no active panels"))
+            continue
+        pv_W = r.allpanels.annual_power(
+            tz_str=r.tz_str,
+            lat=r.lat,
+            lon=r.lon,
+            ele=r.ele,
+            monthly_weather_factors=r.weather_factors,
+            year=r.year,
+            freq_minutes=r.freq_minutes or 15,
+            weather_file=r.weather_file,
+        )
+        if r.load_W is None:
+            load_W = battery.household_load(pv_W.index, r.annual_load_kWh)
+        else:
+            try:
+                load_W = battery.load_from_values(r.load_W, pv_W.index)
+            except ValueError as e:
+                raise ApiError(str(e))
+        df = battery.sweep(pv_W, load_W, capacities).round(3)
+        results.append(dict(id=r.id, batteries=df.reset_index().to_dict("records")))
+
+    return jsonify(results=results)
+
+
+@api.route("/inverter-sweep", methods=["POST"])
+def inverter_sweep():
+    reqs = _parse_requests()
+    results = []
+    for r in reqs:
+        ratios = r.dc_ac_ratios if r.dc_ac_ratios is not None else inverter.DC_AC_RATIOS
+        if not 1 <= len(ratios) <= inverter.MAX_RATIOS:
+            raise ApiError(f"between 1 and {inverter.MAX_RATIOS} dc/ac ratios")
+        if any(not 0 < ratio < np.inf for ratio in ratios):
+            raise ApiError("dc/ac ratios must be positive and finite")
+        if len(r.allpanels.simulated_indices) == 0:
+            results.append(dict(id=r.id, error="no active panels"))
+            continue
+        df = r.allpanels.inverter_sweep(
+            tz_str=r.tz_str,
+            lat=r.lat,
+            lon=r.lon,
+            ele=r.ele,
+            monthly_weather_factors=r.weather_factors,
+            year=r.year,
+            ratios=ratios,
+            freq_minutes=r.freq_minutes or 60,
+            weather_file=r.weather_file,
+        )
+        records = df.round(4).reset_index().to_dict("records")
+        results.append(dict(id=r.id, inverters=records))
+
+    return jsonify(results=results)
+
+
+@api.route("/timeseries", methods=["POST"])
+def timeseries_export():
+    # streams the power of every active panel over the whole year, one
+    # request after the other, as csv, parquet or arrow
+    fmt = request.args.get("format") or request.form.get("format") or "csv"
+    if fmt not in timeseries.EXPORT_FORMATS:
+        raise ApiError(f"unknown format '{fmt}'")
+    freq_minutes = request.args.get("freq_minutes") or request.form.get("freq_minutes")
+    if freq_minutes is not None and not freq_minutes.isdigit():
+        raise ApiError(f"invalid freq_minutes '{freq_minutes}'")
+    if freq_minutes is not None:
+        _check_freq_minutes(int(freq_minutes))
+    reqs = _parse_requests()
+    for r in reqs:
+        r.freq_minutes = int(freq_minutes or r.freq_minutes or 60)
+        # fails before the response starts, not in the middle of the stream
+        r.monthly_weather_factors = list(r.weather_factors)
+
+    def frames():
+        for r in reqs:
+            allpanels = r.allpanels
+            indices = allpanels.simulated_indices
+            labels = [allpanels.label(i) for i in indices]
+            for times, pwr in timeseries.iter_power_chunks(
+                [allpanels.panels[i] for i in indices],
+                tz_str=r.tz_str,
+                lat=r.lat,
+                lon=r.lon,
+                ele=r.ele,
+                year=r.year,
+                monthly_weather_factors=r.weather_factors,
+                freq_minutes=r.freq_minutes,
+                weather_file=r.weather_file,
+            ):
+                yield timeseries.long_frame(r.id, labels, times, pwr)
+
+    try:
+        chunks = timeseries.export_chunks(frames(), fmt)
+    except ImportError as e:
+        return jsonify(error=str(e)), 501
+
+    mimetype, extension = timeseries.EXPORT_FORMATS[fmt]
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=pv_timeseries.{extension}"
+        },
+    )
+
+
+def register(server: Flask):
+    server.register_blueprint(api)
@@ -0,0 +1,309 @@
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from datetime import date
+from typing import Iterable, Iterator
+
+import pandas as pd
+from pydantic import BaseModel
+
+from . import simulation, panel_io, tmy, horizon
+from .geolocation import tf, lookup_geolocation, lookup_elevation
+from .panel import Panel
+from .panels import AllPanels
+
+logger = logging.getLogger(__name__)
+
+JOBS_PER_TASK = 16  # jobs of one location handed to a worker at once
+PARQUET_ROW_GROUP_SIZE = 10000
+
+RESULT_COLUMNS = (
+    ["job_id", "address", "lat", "lon", "ele", "tz_str", "year", "panel", "label"]
+    + simulation.MONTHS
+    + ["total_kWh"]
+)
+
+
+class BatchJob(BaseModel):
+    job_id: str
+    address: str = None
+    lat: float = None
+    lon: float = None
+    ele: float = None
+    tz_str: str = None
+    year: int = None
+    panels: list[Panel] = []
+    panels_file: str = None
+    monthly_weather_factors: list[float] = None
+    weather_file: str = None  # hourly weather instead of clear sky, see tmy.py
+    horizon_file: str = None  # skyline for panels without their own, horizon.py
+    freq_minutes: int = 60
+
+    @property
+    def location_key(self) -> tuple:
+        return (self.tz_str, self.lat, self.lon, self.ele, self.year, self.weather_file)
+
+
+def read_jobs(path: str) -> list[BatchJob]:
+    # .csv with one job per row (panels via a panels_file column),
+    # .jsonl with one job per line or .json with a list of jobs
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype={"job_id": str})
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+    elif path.lower().endswith(".jsonl"):
+        with open(path) as f:
+            records = [json.loads(line) for line in f if line.strip() != ""]
+    else:
+        with open(path) as f:
+            records = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"job {i + 1} is not an object")
+        record.setdefault("job_id", str(i + 1))
+        job = BatchJob(**record)
+        if job.panels_file is not None:
+            panels_file = os.path.join(base_dir, job.panels_file)
+            job.panels = panel_io.load_panels(panels_file)
+        if job.weather_file is not None:
+            job.weather_file = os.path.join(base_dir, job.weather_file)
+        if job.horizon_file is not None:
+            job.horizon_file = os.path.join(base_dir, job.horizon_file)
+            profile = horizon.read_profile(job.horizon_file)
+            job.panels = horizon.apply(job.panels, profile)
+        jobs.append(job)
+    return jobs
+
+
+def resolve_jobs(jobs: list[BatchJob]) -> list[BatchJob]:
+    # fills in coordinates, timezone and elevation, every address is only
+    # looked up once per run
+    geolocations = {}
+    for job in jobs:
+        if job.address is None and job.weather_file is not None:
+            # the location the weather was recorded at
+            _, meta = tmy.load(job.weather_file)
+            job.lat = meta["lat"] if job.lat is None else job.lat
+            job.lon = meta["lon"] if job.lon is None else job.lon
+            job.ele = meta["ele"] if job.ele is None else job.ele
+        if job.lat is None or job.lon is None:
+            if job.address not in geolocations:
+                geolocations[job.address] = lookup_geolocation(job.address)
+            geolocation = geolocations[job.address]
+            if geolocation is None:
+                continue
+            job.lat = geolocation.lat
+            job.lon = geolocation.lon
+            job.ele = job.ele if job.ele is not None else geolocation.ele
+            job.tz_str = job.tz_str or geolocation.tz_str
+        if job.tz_str is None:
+            job.tz_str = tf.timezone_at(lng=job.lon, lat=job.lat)
+        if job.ele is None:
+            job.ele = lookup_elevation(job.lat, job.lon)
+        if job.year is None:
+            job.year = date.today().year
+    return jobs
+
+
+def simulate_job(job: BatchJob) -> list[dict]:
+    allpanels = AllPanels.construct(panels=job.panels)
+    monthly_weather_factors = job.monthly_weather_factors or [1.0] * 12
+    df = allpanels.monthly_energy(
+        tz_str=job.tz_str,
+        lat=job.lat,
+        lon=job.lon,
+        ele=job.ele,
+        monthly_weather_factors=monthly_weather_factors,
+        year=job.year,
+        freq_minutes=job.freq_minutes,
+        weather_file=job.weather_file,
+    )
+
+    rows = []
+    for col in df.columns:
+        i = int(col.split("_")[1])
+        row = dict(
+            job_id=job.job_id,
+            address=job.address,
+            lat=job.lat,
+            lon=job.lon,
+            ele=job.ele,
+            tz_str=job.tz_str,
+            year=job.year,
+            panel=i + 1,
+            label=allpanels.label(i),
+        )
+        row.update(df[col].to_dict())
+        row["total_kWh"] = float(df[col].sum())
+        rows.append(row)
+    return rows
+
+
+def _simulate_jobs(jobs: list[BatchJob]) -> list[tuple[str, list[dict], str]]:
+    # runs in a worker process, all jobs share the location and year so the
+    # solar position and clear sky data is computed once and then cached
+    results = []
+    for job in jobs:
+        try:
+            results.append((job.job_id, simulate_job(job), None))
+        except Exception as e:
+            results.append((job.job_id, [], f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _tasks(jobs: list[BatchJob]) -> list[list[BatchJob]]:
+    by_location = {}
+    for job in jobs:
+        by_location.setdefault(job.location_key, []).append(job)
+    return [
+        group[start : start + JOBS_PER_TASK]
+        for group in by_location.values()
+        for start in range(0, len(group), JOBS_PER_TASK)
+    ]
+
+
+def iter_results(jobs: list[BatchJob], workers: int = None) -> Iterator[dict]:
+    # yields result rows as soon as the jobs are done, in no particular order
+    ready = []
+    for job in jobs:
+        if job.lat is None or job.tz_str is None:
+            logger.error(f"job {job.job_id}: location '{job.address}' not found")
+        elif len(AllPanels.construct(panels=job.panels).simulated_indices) == 0:
+            logger.error(f"job {job.job_id}: no active panels")
+        else:
+            ready.append(job)
+
+    tasks = _tasks(ready)
+    if workers == 1:
+        results = map(_simulate_jobs, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes=workers)
+        results = pool.imap_unordered(_simulate_jobs, tasks)
+
+    try:
+        for task_results in results:
+            for job_id, rows, error in task_results:
+                if error is not None:
+                    logger.error(f"job {job_id}: {error}")
+                yield from rows
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+class CsvResultWriter:
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="") if path != "-" else sys.stdout
+        self.writer = csv.DictWriter(self.file, fieldnames=RESULT_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, row: dict):
+        self.writer.writerow(row)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetResultWriter:
+    def __init__(self, path: str):
+        # optional dependency, only needed for parquet output
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "parquet output needs pyarrow (pip install pyarrow)"
+            ) from e
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                ("job_id", pa.string()),
+                ("address", pa.string()),
+                ("lat", pa.float64()),
+                ("lon", pa.float64()),
+                ("ele", pa.float64()),
+                ("tz_str", pa.string()),
+                ("year", pa.int32()),
+                ("panel", pa.int32()),
+                ("label", pa.string()),
+            ]
+            + [(m, pa.float64()) for m in simulation.MONTHS]
+            + [("total_kWh", pa.float64())]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.rows = []
+
+    def write(self, row: dict):
+        self.rows.append(row)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if len(self.rows) > 0:
+            table = self.pa.Table.from_pylist(self.rows, schema=self.schema)
+            self.writer.write_table(table)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def run_batch(
+    jobs: list[BatchJob], output: str, fmt: str = None, workers: int = None
+) -> int:
+    if fmt is None:
+        fmt = "parquet" if output.lower().endswith(".parquet") else "csv"
+    if fmt == "parquet":
+        writer = ParquetResultWriter(output)
+    else:
+        writer = CsvResultWriter(output)
+
+    n_rows = 0
+    try:
+        for row in iter_results(resolve_jobs(jobs), workers=workers):
+            writer.write(row)
+            n_rows += 1
+    finally:
+        writer.close()
+    return n_rows
+
+
+def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(
+        description="simulate the monthly yields of many sites and panel sets"
+    )
+    parser.add_argument("jobs", help="jobs file (.csv, .json or .jsonl)")
+    parser.add_argument(
+        "-o", "--output", default="-", help="result file, '-' for stdout (csv)"
+    )
+    parser.add_argument("-f", "--format", choices=["csv", "parquet"], default=None)
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="processes, default: all cpus"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    try:
+        jobs = read_jobs(args.jobs)
+    except (ValueError, OSError) as e:
+        parser.error(f"{args.jobs}: {e}")
+    try:
+        n_rows = run_batch(jobs, args.output, fmt=args.format, workers=args.workers)
+    except ImportError as e:
+        parser.error(str(e))
+    logger.info(f"{len(jobs)} jobs, {n_rows} result rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    # python -m components.batch jobs.jsonl -o results.csv
+    main()
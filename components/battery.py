@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from . import metrics, tmy
+
+# battery storage behind the pv system: pv surplus charges the battery,
+# deficits are covered by it before power is imported from the grid.
+# Capacities are usable kWh. Within a run of steps with surplus (or
+# deficit) the state of charge only moves one way, so every run is one
+# clipped sum per capacity and a sweep over many capacities loops over the
+# ~700 runs of a year instead of every time step
+ROUND_TRIP_EFFICIENCY = 0.9
+ANNUAL_LOAD_KWH = 4000.0  # household without heat pump or car
+MAX_CAPACITIES = 200
+
+
+def household_load(times: pd.DatetimeIndex, annual_kWh: float) -> np.ndarray:
+    # synthetic household profile [W] in local time: base load, morning and
+    # evening peaks and more consumption in winter
+    hour = times.hour.values + times.minute.values / 60
+    day = times.dayofyear.values
+    daily = (
+        0.6
+        + 0.6 * np.exp(-(((hour - 7.5) / 1.5) ** 2))
+        + 1.2 * np.exp(-(((hour - 19.0) / 2.5) ** 2))
+    )
+    shape = daily * (1 + 0.2 * np.cos(2 * np.pi * (day - 15) / 365))
+    step_h = _step_hours(times)
+    return shape / (shape.sum() * step_h) * annual_kWh * 1000
+
+
+def load_from_values(values, times: pd.DatetimeIndex) -> np.ndarray:
+    # evenly spaced average powers [W] over one year in local time (8760
+    # hourly, 35040 quarter hourly, ...) at the given times
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 1 or len(values) == 0 or not np.isfinite(values).all():
+        raise ValueError("a load profile needs evenly spaced numbers over a year")
+    if (values < 0).any():
+        raise ValueError("load powers must not be negative")
+    local = times.tz_localize(None) if times.tz is not None else times
+    position = tmy.hours_of_year(local) * len(values) / tmy.HOURS
+    return values[np.floor(position).astype(int) % len(values)]
+
+
+def _step_hours(times: pd.DatetimeIndex) -> float:
+    if len(times) < 2:
+        raise ValueError("a battery needs at least two time steps")
+    return (times[1] - times[0]).total_seconds() / 3600
+
+
+def _flows(net_Wh: np.ndarray) -> np.ndarray:
+    # energy into (> 0) or out of (< 0) the cells per step
+    efficiency = np.sqrt(ROUND_TRIP_EFFICIENCY)
+    return np.where(net_Wh >= 0, net_Wh * efficiency, net_Wh / efficiency)
+
+
+def _run_states(
+    flow_Wh: np.ndarray, starts: np.ndarray, capacities_Wh: np.ndarray
+) -> np.ndarray:
+    # (runs + 1, capacities) state of charge [Wh] at the start of every run
+    # and at the end of the year; the year is simulated twice, so the
+    # result does not depend on the charge on january 1st
+    sums = np.add.reduceat(flow_Wh, starts)
+    states = np.empty((len(starts) + 1, len(capacities_Wh)))
+    soc = np.zeros(len(capacities_Wh))
+    for _ in range(2):
+        states[0] = soc
+        for n, energy in enumerate(sums):
+            if energy >= 0:
+                soc = np.minimum(soc + energy, capacities_Wh)
+            else:
+                soc = np.maximum(soc + energy, 0.0)
+            states[n + 1] = soc
+    return states
+
+
+def _runs(flow_Wh: np.ndarray) -> np.ndarray:
+    charging = flow_Wh >= 0
+    return np.flatnonzero(np.r_[True, charging[1:] != charging[:-1]])
+
+
+@metrics.timed("battery.sweep")
+def sweep(pv_W: pd.Series, load_W: np.ndarray, capacities_kWh) -> pd.DataFrame:
+    # annual energy balance per battery capacity, one row per capacity
+    step_h = _step_hours(pv_W.index)
+    pv_W = pv_W.values
+    load_W = np.asarray(load_W, dtype=float)
+    capacities_Wh = np.asarray(capacities_kWh, dtype=float) * 1000
+    net_Wh = (pv_W - load_W) * step_h
+    flow_Wh = _flows(net_Wh)
+    states = _run_states(flow_Wh, _runs(flow_Wh), capacities_Wh)
+
+    efficiency = np.sqrt(ROUND_TRIP_EFFICIENCY)
+    delta = np.diff(states, axis=0)
+    charged_Wh = np.where(delta > 0, delta, 0).sum(axis=0) / efficiency
+    discharged_Wh = -np.where(delta < 0, delta, 0).sum(axis=0)
+    export_Wh = np.maximum(net_Wh, 0).sum() - charged_Wh
+    import_Wh = np.maximum(-net_Wh, 0).sum() - discharged_Wh * efficiency
+
+    pv_Wh = pv_W.sum() * step_h
+    load_Wh = load_W.sum() * step_h
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cycles = np.where(capacities_Wh > 0, discharged_Wh / capacities_Wh, 0.0)
+    return pd.DataFrame(
+        dict(
+            pv_kWh=pv_Wh / 1000,
+            load_kWh=load_Wh / 1000,
+            import_kWh=import_Wh / 1000,
+            export_kWh=export_Wh / 1000,
+            self_consumption=(pv_Wh - export_Wh) / pv_Wh if pv_Wh > 0 else 0.0,
+            autarky=(load_Wh - import_Wh) / load_Wh if load_Wh > 0 else 0.0,
+            cycles=cycles,
+        ),
+        index=pd.Index(np.asarray(capacities_kWh, dtype=float), name="capacity_kWh"),
+    )
+
+
+@metrics.timed("battery.simulate")
+def simulate(pv_W: pd.Series, load_W: np.ndarray, capacity_kWh: float) -> pd.DataFrame:
+    # time series of one battery: state of charge, battery power (> 0
+    # charging) and grid power (> 0 import)
+    step_h = _step_hours(pv_W.index)
+    capacity_Wh = capacity_kWh * 1000
+    net_Wh = (pv_W.values - load_W) * step_h
+    flow_Wh = _flows(net_Wh)
+    starts = _runs(flow_Wh)
+    states = _run_states(flow_Wh, starts, np.array([capacity_Wh]))[:, 0]
+
+    # within a run the charge is the run's start plus the flows so far
+    run = np.cumsum(np.isin(np.arange(len(flow_Wh)), starts)) - 1
+    cumulated = np.cumsum(flow_Wh)
+    before_run = np.r_[0.0, cumulated][starts]
+    soc_Wh = np.clip(states[run] + cumulated - before_run[run], 0, capacity_Wh)
+
+    efficiency = np.sqrt(ROUND_TRIP_EFFICIENCY)
+    delta = np.diff(np.r_[states[0], soc_Wh])
+    battery_W = np.where(delta > 0, delta / efficiency, delta * efficiency) / step_h
+    return pd.DataFrame(
+        dict(
+            pv_W=pv_W.values,
+            load_W=load_W,
+            battery_W=battery_W,
+            grid_W=load_W - pv_W.values + battery_W,
+            soc_kWh=soc_Wh / 1000,
+        ),
+        index=pv_W.index,
+    )
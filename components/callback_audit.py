@@ -0,0 +1,128 @@
+import builtins
+import dis
+import inspect
+import types
+
+import dash
+from dash import Dash, no_update
+from dash.exceptions import PreventUpdate
+
+from . import ids
+
+# builtins that have a direct javascript counterpart
+PORTABLE_BUILTINS = {
+    "abs",
+    "all",
+    "any",
+    "bool",
+    "dict",
+    "enumerate",
+    "float",
+    "int",
+    "isinstance",
+    "len",
+    "list",
+    "max",
+    "min",
+    "range",
+    "round",
+    "str",
+    "sum",
+    "tuple",
+    "zip",
+    "None",
+    "True",
+    "False",
+}
+# non-builtin globals that are available in the browser as well
+PORTABLE_GLOBALS = {
+    id(ids),
+    id(dash.callback_context),
+    id(no_update),
+    id(PreventUpdate),
+}
+
+
+def _global_names(code: types.CodeType) -> set[str]:
+    # only names looked up as globals/builtins, attribute names are skipped
+    names = {
+        i.argval
+        for i in dis.get_instructions(code)
+        if i.opname in ("LOAD_GLOBAL", "LOAD_NAME")
+    }
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _blockers(fn) -> list[str]:
+    # names the callback needs that only exist on the server
+    fn = inspect.unwrap(fn)
+    closure = inspect.getclosurevars(fn)
+    blockers = [f"closure:{name}" for name in sorted(closure.nonlocals)]
+
+    for name in sorted(_global_names(fn.__code__)):
+        if name in fn.__globals__:
+            value = fn.__globals__[name]
+            if id(value) in PORTABLE_GLOBALS:
+                continue
+            if value is dash and set(fn.__code__.co_names) & {"callback_context"}:
+                continue
+            blockers.append(name)
+        elif hasattr(builtins, name) and name not in PORTABLE_BUILTINS:
+            blockers.append(name)
+    return blockers
+
+
+def audit_callbacks(app: Dash) -> list[dict]:
+    # lists every registered callback and whether it could run clientside
+    clientside = {
+        c["output"] for c in app._callback_list if c.get("clientside_function")
+    }
+    result = []
+    for output, entry in app.callback_map.items():
+        if output in clientside or "callback" not in entry:
+            result.append(
+                dict(
+                    output=output,
+                    function=None,
+                    clientside=True,
+                    portable=True,
+                    blockers=[],
+                )
+            )
+            continue
+        fn = inspect.unwrap(entry["callback"])
+        blockers = _blockers(fn)
+        result.append(
+            dict(
+                output=output,
+                function=f"{fn.__module__}.{fn.__name__}",
+                clientside=False,
+                portable=len(blockers) == 0,
+                blockers=blockers,
+            )
+        )
+    return result
+
+
+def print_audit(app: Dash):
+    for r in audit_callbacks(app):
+        if r["clientside"]:
+            status = "clientside"
+        elif r["portable"]:
+            status = "portable"
+        else:
+            status = "server"
+        print(f"{status:<11} {r['function'] or '-'}")
+        print(f"{'':<11} -> {r['output']}")
+        if len(r["blockers"]) > 0:
+            print(f"{'':<11} needs: {', '.join(r['blockers'])}")
+
+
+if __name__ == "__main__":
+    # python -m components.callback_audit
+    from app import app
+
+    print_audit(app)
@@ -11,15 +11,15 @@ from .geolocation import Geolocation
 
 
 def render(app: Dash) -> html.Div:
-    @app.callback(
+    app.clientside_callback(
+        f"""
+        function(tab) {{
+            return tab !== "{ids.TAB_PLOT_DAY}";
+        }}
+        """,
         Output(ids.DIV_DATEPICKER, "hidden"),
         Input(ids.TABS_PLOT, "active_tab"),
     )
-    def show_hide_datediv(tab):
-        if tab == ids.TAB_PLOT_DAY:
-            return False
-        else:
-            return True
 
     @app.callback(
         Output(ids.DATEPICKER, "date"),
@@ -53,8 +53,8 @@ def render(app: Dash) -> html.Div:
         if geolocation_data == None:
             raise PreventUpdate
 
-        allpanels = AllPanels(**panel_data)
         geolocation = Geolocation(**geolocation_data)
+        allpanels = AllPanels(**panel_data).shaded_by(geolocation.horizon_deg)
         date_object = date.fromisoformat(date_value)
         active_year = date_object.year
 
@@ -0,0 +1,89 @@
+import argparse
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from . import metrics
+
+# elevations from local SRTM height tiles (N52E004.hgt: big endian int16,
+# 1201x1201 or 3601x3601 samples covering one degree, first row north),
+# tiles are memory mapped so only the pages around a lookup are read;
+# https://dwtkns.com/srtm30m/ or any other SRTM mirror
+DEM_DIR_ENV = "PV_DEM_DIR"
+DEFAULT_DEM_DIR = "dem"
+DEM_TILE_CACHE_SIZE = 32  # open tiles, every tile keeps a file handle
+VOID = -32768  # no data, e.g. over water or in deep valleys of srtm v1/v2
+
+
+def dem_dir() -> str:
+    return os.environ.get(DEM_DIR_ENV, DEFAULT_DEM_DIR)
+
+
+def tile_name(lat: float, lon: float) -> str:
+    lat0, lon0 = math.floor(lat), math.floor(lon)
+    return (
+        f"{'N' if lat0 >= 0 else 'S'}{abs(lat0):02d}"
+        f"{'E' if lon0 >= 0 else 'W'}{abs(lon0):03d}.hgt"
+    )
+
+
+def _tile(path: str) -> np.ndarray:
+    # None for missing tiles; only found tiles are cached, so tiles added
+    # while the app runs are picked up
+    if not os.path.isfile(path):
+        return None
+    return _open_tile(path)
+
+
+@lru_cache(maxsize=DEM_TILE_CACHE_SIZE)
+def _open_tile(path: str) -> np.ndarray:
+    # raises ValueError or OSError for unreadable tiles, which are not cached
+    samples = math.isqrt(os.path.getsize(path) // 2)
+    if samples * samples * 2 != os.path.getsize(path):
+        raise ValueError(f"{path}: not a square SRTM tile")
+    return np.memmap(path, dtype=">i2", mode="r", shape=(samples, samples))
+
+
+@metrics.timed("dem.elevation")
+def elevation(lat: float, lon: float) -> float:
+    # bilinear interpolation between the four surrounding samples in meters,
+    # None without a local tile or if all of them are void
+    tile = _tile(os.path.join(dem_dir(), tile_name(lat, lon)))
+    if tile is None:
+        return None
+    steps = tile.shape[0] - 1
+    row = (math.floor(lat) + 1 - lat) * steps
+    col = (lon - math.floor(lon)) * steps
+    i, j = min(int(row), steps - 1), min(int(col), steps - 1)
+    di, dj = row - i, col - j
+
+    corners = tile[i : i + 2, j : j + 2].astype(float)
+    weights = np.array([[(1 - di) * (1 - dj), (1 - di) * dj], [di * (1 - dj), di * dj]])
+    valid = corners != VOID
+    if not valid.any():
+        return None
+    # void samples are left out and the others reweighted
+    weights = weights * valid
+    if weights.sum() == 0:
+        weights = valid.astype(float)
+    return round(float((corners * weights).sum() / weights.sum()), 1)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="local elevation tiles")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    args = parser.parse_args(argv)
+
+    ele = elevation(args.lat, args.lon)
+    if ele is None:
+        tile = os.path.join(dem_dir(), tile_name(args.lat, args.lon))
+        print(f"no elevation data, tile {tile} missing or void")
+    else:
+        print(f"{ele} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import numpy as np
+import plotly.io as pio
+
+from . import metrics
+
+# figures are built as plain dicts, dcc.Graph accepts them directly and
+# the per-property validation of plotly.graph_objects is skipped
+
+AXIS_STYLE = dict(
+    showgrid=True,
+    gridwidth=1,
+    gridcolor="DarkGrey",
+    zeroline=True,
+    zerolinewidth=2,
+    zerolinecolor="black",
+)
+
+
+def _build_template(**layout) -> dict:
+    template = pio.templates["plotly"].to_plotly_json()
+    for key, value in layout.items():
+        template["layout"][key] = {**template["layout"].get(key, {}), **value}
+    return template
+
+
+# computed once and shared by all figures, never mutate these
+BASE_TEMPLATE = _build_template()
+STYLED_TEMPLATE = _build_template(
+    xaxis=AXIS_STYLE,
+    yaxis=AXIS_STYLE,
+    margin=dict(l=5, r=5, t=50, b=5),
+    legend=dict(
+        x=0.0,
+        y=1.0,
+        bgcolor="rgba(255, 255, 255, 0.9)",
+        bordercolor="rgba(255, 255, 255, 1)",
+    ),
+)
+
+
+def _line(color: str, **kwargs) -> dict:
+    if color is not None and color != "":
+        kwargs["color"] = color
+    return kwargs
+
+
+@metrics.timed("figures.day_figure")
+def day_figure(
+    times,
+    powers_W: np.ndarray,
+    energies_kWh: np.ndarray,
+    labels: list[str],
+    colors: list[str],
+    title: str,
+) -> dict:
+    # powers_W and energies_kWh have the shape (len(times), len(labels))
+    data = []
+    for k, (label, color) in enumerate(zip(labels, colors)):
+        data.append(
+            dict(
+                type="scatter",
+                x=times,
+                y=powers_W[:, k],
+                name=f"Pwr {label} [W]",
+                hovertemplate="%{y:.1f}%{_xother}",
+                line=_line(color, width=3),
+            )
+        )
+        data.append(
+            dict(
+                type="scatter",
+                x=times,
+                y=energies_kWh[:, k],
+                name=f"Energy {label} [kWh]",
+                hovertemplate="%{y:.2f}%{_xother}",
+                line=_line(color, width=3, dash="dot"),
+                xaxis="x",
+                yaxis="y2",
+            )
+        )
+
+    data.append(
+        dict(
+            type="scatter",
+            x=times,
+            y=powers_W.sum(axis=1),
+            name="Pwr Sum [W]",
+            hovertemplate="%{y:.1f}%{_xother}",
+            line=dict(color="black", width=4),
+        )
+    )
+    data.append(
+        dict(
+            type="scatter",
+            x=times,
+            y=energies_kWh.sum(axis=1),
+            name="Energy Sum [kWh]",
+            hovertemplate="%{y:.2f}%{_xother}",
+            line=dict(color="black", width=4, dash="dot"),
+            xaxis="x",
+            yaxis="y2",
+        )
+    )
+
+    return dict(
+        data=data,
+        layout=dict(
+            template=STYLED_TEMPLATE,
+            hovermode="x unified",
+            title=dict(text=title),
+            xaxis=dict(anchor="y", domain=[0.0, 0.94]),
+            yaxis=dict(anchor="x", domain=[0.0, 1.0], title=dict(text="Power [W]")),
+            yaxis2=dict(
+                anchor="x",
+                overlaying="y",
+                side="right",
+                title=dict(text="Energy [kWh]"),
+            ),
+        ),
+    )
+
+
+@metrics.timed("figures.annual_figure")
+def annual_figure(
+    months: list[str],
+    energies_kWh: np.ndarray,
+    labels: list[str],
+    colors: list[str],
+    title: str,
+) -> dict:
+    # energies_kWh has the shape (len(months), len(labels))
+    data = [
+        dict(
+            type="bar",
+            name=label,
+            x=months,
+            y=energies_kWh[:, k],
+            hovertemplate="%{x}: %{y:.1f} kWh",
+            marker=_line(color),
+        )
+        for k, (label, color) in enumerate(zip(labels, colors))
+    ]
+    data.append(
+        dict(
+            type="bar",
+            name="<b>total",
+            x=months,
+            y=energies_kWh.sum(axis=1),
+            hovertemplate="%{x}: %{y:.1f} kWh",
+            marker=dict(color="black"),
+        )
+    )
+
+    return dict(
+        data=data,
+        layout=dict(
+            template=STYLED_TEMPLATE,
+            barmode="group",
+            title=dict(text=title),
+            yaxis=dict(title=dict(text="Energy [kWh]")),
+        ),
+    )
+
+
+@metrics.timed("figures.lifetime_figure")
+def lifetime_figure(years: list[int], energies_kWh: np.ndarray, title: str) -> dict:
+    # energies_kWh has the shape (len(years), panels), shown as the annual
+    # total and the energy cumulated over the years
+    totals = energies_kWh.sum(axis=1)
+    data = [
+        dict(
+            type="bar",
+            name="Annual [kWh]",
+            x=years,
+            y=totals,
+            hovertemplate="%{y:.1f} kWh",
+            marker=dict(color="black"),
+        ),
+        dict(
+            type="scatter",
+            name="Cumulated [MWh]",
+            x=years,
+            y=np.cumsum(totals) / 1000,
+            hovertemplate="%{y:.1f} MWh",
+            line=dict(color="firebrick", width=3),
+            xaxis="x",
+            yaxis="y2",
+        ),
+    ]
+
+    return dict(
+        data=data,
+        layout=dict(
+            template=STYLED_TEMPLATE,
+            hovermode="x unified",
+            title=dict(text=title),
+            xaxis=dict(anchor="y", domain=[0.0, 0.94]),
+            yaxis=dict(title=dict(text="Energy [kWh]")),
+            yaxis2=dict(
+                anchor="x",
+                overlaying="y",
+                side="right",
+                rangemode="tozero",
+                title=dict(text="Cumulated energy [MWh]"),
+            ),
+        ),
+    )
+
+
+@metrics.timed("figures.contour_figure")
+def contour_figure(
+    azimuths_deg: np.ndarray,
+    tilts_deg: np.ndarray,
+    efficiency: np.ndarray,
+    markers: list[dict],
+) -> dict:
+    # efficiency has the shape (len(tilts_deg), len(azimuths_deg)), markers
+    # are dicts with label, azimuth_deg, altitude_deg, efficiency and color
+    eff_min = np.min(efficiency)
+
+    data = [
+        dict(
+            type="contour",
+            x=azimuths_deg,
+            y=tilts_deg,
+            z=np.round(efficiency, 2),
+            name="efficiency",
+            hovertemplate="azimuth: %{x}°<br>tilt: %{y}°<br>eff.: %{z}%<extra></extra>",
+            contours=dict(
+                coloring="heatmap",
+                showlabels=True,
+                labelfont=dict(size=16),
+                start=np.floor(eff_min - (eff_min % 5)),
+                size=5,
+                end=100,
+            ),
+            colorbar=dict(
+                title=dict(text="Efficiency [%]", font=dict(size=14)),
+            ),
+        )
+    ]
+    for m in markers:
+        data.append(
+            dict(
+                type="scatter",
+                x=[m["azimuth_deg"]],
+                y=[m["altitude_deg"]],
+                name=m["label"],
+                mode="markers",
+                showlegend=False,
+                hovertemplate=f"<b>{m['label']}</b><br>azimuth: %{{x}}°<br>tilt: %{{y}}°<br>eff.:{m['efficiency']}%<extra></extra>",
+                marker=_line(
+                    m["color"],
+                    symbol="square-cross",
+                    size=30,
+                    line=dict(width=2, color="DarkSlateGrey"),
+                ),
+            )
+        )
+
+    return dict(
+        data=data,
+        layout=dict(
+            template=BASE_TEMPLATE,
+            margin=dict(l=5, r=5, t=5, b=5),
+            yaxis=dict(title=dict(text="Tilt Angle [deg]"), dtick=10),
+            xaxis=dict(title=dict(text="Azimuth Angle [deg]"), dtick=45),
+        ),
+    )
+
+
+@metrics.timed("figures.inverter_figure")
+def inverter_figure(
+    ratios: np.ndarray, ac_kWh: np.ndarray, clipping_loss: np.ndarray, title: str
+) -> dict:
+    # annual ac yield and the share of dc energy clipped per dc/ac ratio
+    data = [
+        dict(
+            type="scatter",
+            x=ratios,
+            y=ac_kWh,
+            name="AC yield [kWh]",
+            hovertemplate="%{y:.1f} kWh",
+            line=dict(color="black", width=4),
+        ),
+        dict(
+            type="scatter",
+            x=ratios,
+            y=np.asarray(clipping_loss) * 100,
+            name="Clipping loss [%]",
+            hovertemplate="%{y:.2f} %",
+            line=dict(color="firebrick", width=3, dash="dot"),
+            xaxis="x",
+            yaxis="y2",
+        ),
+    ]
+
+    return dict(
+        data=data,
+        layout=dict(
+            template=STYLED_TEMPLATE,
+            hovermode="x unified",
+            title=dict(text=title),
+            xaxis=dict(anchor="y", domain=[0.0, 0.94], title=dict(text="DC/AC ratio")),
+            yaxis=dict(title=dict(text="AC energy [kWh]")),
+            yaxis2=dict(
+                anchor="x",
+                overlaying="y",
+                side="right",
+                rangemode="tozero",
+                title=dict(text="Clipping loss [%]"),
+            ),
+        ),
+    )
@@ -0,0 +1,176 @@
+import argparse
+import csv
+import logging
+import os
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .location import Geolocation
+
+# place names resolved without a network call, from a GeoNames dump
+# (https://download.geonames.org/export/dump/, e.g. cities15000.txt) named
+# by PV_GAZETTEER; the labels "<name>, <country code>" are kept sorted so
+# all completions of a prefix are one contiguous slice found by bisection
+GAZETTEER_ENV = "PV_GAZETTEER"
+SUGGESTIONS = 10
+MIN_PREFIX = 2  # shorter prefixes match too many places to be useful
+NO_ELEVATION = -9999
+
+# columns of the geonames "geoname" table
+GEONAMES_COLUMNS = {
+    1: "name",
+    2: "asciiname",
+    4: "lat",
+    5: "lon",
+    8: "country",
+    14: "population",
+    16: "dem",
+    17: "tz_str",
+}
+
+logger = logging.getLogger("pv.gazetteer")
+
+
+def normalize(text: str) -> str:
+    # case and accent insensitive, "Zürich" matches "zurich"
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class Gazetteer:
+    def __init__(self, places: pd.DataFrame):
+        # most populous places first, so the first match of a name wins
+        places = places.sort_values("population", ascending=False, kind="stable")
+        self.places = places.reset_index(drop=True)
+        self.labels = [
+            f"{name}, {country}"
+            for name, country in zip(self.places["name"], self.places["country"])
+        ]
+
+        # every place is found by its name and by its ascii spelling
+        keys = {}
+        self.names = {}
+        for i, (name, ascii_name, country) in enumerate(
+            zip(self.places["name"], self.places["asciiname"], self.places["country"])
+        ):
+            for spelling in {normalize(name), normalize(ascii_name)}:
+                keys.setdefault(f"{spelling}, {country.casefold()}", i)
+                self.names.setdefault(spelling, i)
+        self.keys = sorted(keys)
+        self.key_place = np.array([keys[k] for k in self.keys], dtype=np.int32)
+        self.by_label = keys
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def suggest(self, prefix: str, limit: int = SUGGESTIONS) -> list[str]:
+        # labels of the most populous places starting with the prefix
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX:
+            return []
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        # place indices are ordered by population
+        matches = np.unique(self.key_place[lo:hi])[:limit]
+        return [self.labels[i] for i in matches]
+
+    def resolve(self, text: str) -> Geolocation:
+        # a label or a bare place name, None if unknown
+        key = normalize(text)
+        i = self.by_label.get(key, self.names.get(key))
+        if i is None:
+            return None
+        place = self.places.iloc[i]
+        return Geolocation(
+            lat=float(place["lat"]),
+            lon=float(place["lon"]),
+            ele=float(place["dem"]) if place["dem"] != NO_ELEVATION else None,
+            tz_str=place["tz_str"],
+            address=self.labels[i],
+        )
+
+    def is_label(self, text: str) -> bool:
+        # a complete suggestion, e.g. picked from the list
+        return text is not None and normalize(text) in self.by_label
+
+
+def read_places(path: str) -> pd.DataFrame:
+    df = pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        usecols=list(GEONAMES_COLUMNS),
+        quoting=csv.QUOTE_NONE,
+        keep_default_na=False,
+        dtype={1: str, 2: str, 8: str, 17: str},
+        encoding="utf-8",
+    )
+    df = df.rename(columns=GEONAMES_COLUMNS)
+    return df[df["tz_str"] != ""]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def available() -> bool:
+    return bool(os.environ.get(GAZETTEER_ENV))
+
+
+def gazetteer() -> Gazetteer:
+    # loaded on first use, None without a places file
+    global _gazetteer
+    if not available():
+        return None
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            path = os.environ[GAZETTEER_ENV]
+            with metrics.span("gazetteer.load"):
+                _gazetteer = Gazetteer(read_places(path))
+            logger.info(f"{len(_gazetteer)} places loaded from {path}")
+        return _gazetteer
+
+
+@metrics.timed("gazetteer.suggest")
+def suggest(prefix: str, limit: int = SUGGESTIONS) -> list[str]:
+    index = gazetteer()
+    if index is None or prefix is None:
+        return []
+    return index.suggest(prefix, limit)
+
+
+@metrics.timed("gazetteer.resolve")
+def resolve(text: str) -> Geolocation:
+    index = gazetteer()
+    if index is None or text is None:
+        return None
+    return index.resolve(text)
+
+
+def is_label(text: str) -> bool:
+    index = gazetteer()
+    return index is not None and index.is_label(text)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="local place names")
+    parser.add_argument("text", help="prefix to complete or place to resolve")
+    args = parser.parse_args(argv)
+
+    if not available():
+        parser.error(f"{GAZETTEER_ENV} is not set")
+    for label in suggest(args.text):
+        print(label)
+    geolocation = resolve(args.text)
+    if geolocation is not None:
+        print(geolocation.json(exclude_none=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,130 @@ import requests
 import pytz
 from datetime import date, datetime
 from pydantic import BaseModel
+import logging
 import numpy as np
 
-from . import ids
+from . import ids, simulation, metrics, singleflight, dem, gazetteer, horizon
 from .location import Geolocation
 from .panel import Panel
 
 tf = TimezoneFinder()  # reuse
+logger = logging.getLogger("pv.geolocation")
+
+
+@metrics.timed("geolocation.lookup_geolocation")
+def lookup_geolocation(location_str: str) -> Geolocation:
+    # resolves an address to coordinates, timezone and elevation,
+    # returns None if the address is unknown; place names of the local
+    # gazetteer need no network call
+    geolocation = gazetteer.resolve(location_str)
+    if geolocation is not None:
+        if geolocation.ele is None:
+            geolocation.ele = lookup_elevation(geolocation.lat, geolocation.lon)
+        return geolocation
+
+    geolocator = Nominatim(user_agent="myGeocoder")
+    location = geolocator.geocode(location_str, timeout=2)
+    if location is None:
+        return None
+    lat = location.latitude
+    lon = location.longitude
+
+    return Geolocation(
+        lat=lat,
+        lon=lon,
+        ele=lookup_elevation(lat, lon),
+        tz_str=tf.timezone_at(lng=lon, lat=lat),
+        address=location.address,
+    )
+
+
+def lookup_elevation(lat: float, lon: float) -> float:
+    # local elevation tiles first (PV_DEM_DIR), locations without a tile
+    # are looked up at https://www.open-elevation.com
+    try:
+        ele = dem.elevation(lat, lon)
+    except (ValueError, OSError) as e:
+        logger.warning(f"local elevation at {lat}, {lon} failed: {e}")
+        ele = None
+    if ele is not None:
+        return ele
+    with metrics.span("geolocation.open_elevation"):
+        ele_response = requests.get(
+            f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lon}",
+            timeout=5,
+        )
+    return float(ele_response.json()["results"][0]["elevation"])
+
+
+def opti_angle_grid(
+    tz_str: str, lat: float, lon: float, ele: float, year: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # monthly yield of a 1m² panel on an 8 (azimuth) x 7 (tilt) grid,
+    # all orientations are simulated in one batch
+    azi_vect = np.linspace(0, 360, 8, endpoint=False)
+    tilt_vect = np.linspace(0, 90, 7, endpoint=True)
+    azi_grid, tilt_grid = np.meshgrid(azi_vect, tilt_vect, indexing="ij")
+    opti_panels = [
+        Panel(label="opti_panel", size_m2=1.0, azimuth_deg=azi, altitude_deg=tilt)
+        for azi, tilt in zip(azi_grid.ravel(), tilt_grid.ravel())
+    ]
+    e_kWh = simulation.monthly_energy_batch(
+        opti_panels,
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        monthly_weather_factors=tuple([1.0] * 12),
+        year=year,
+    )
+    return azi_vect, tilt_vect, e_kWh.T.reshape(len(azi_vect), len(tilt_vect), 12)
+
+
+@metrics.timed("geolocation.with_opti_angles")
+def with_opti_angles(geolocation: Geolocation, year: int) -> Geolocation:
+    # users looking up the same town at the same time share one grid build
+    key = (geolocation.tz_str, geolocation.lat, geolocation.lon, geolocation.ele)
+    azi_vect, tilt_vect, opti_angle_matrix = singleflight.do(
+        "opti_angle_grid",
+        key + (year,),
+        lambda: opti_angle_grid(*key, year=year),
+    )
+
+    geolocation.opti_angle_matrix = list(opti_angle_matrix)
+    geolocation.opti_azi_vect = list(azi_vect)
+    geolocation.opti_tilt_vect = list(tilt_vect)
+    return geolocation
 
 
 def render(app: Dash) -> html.Div:
+    # with a local gazetteer the input reports every keystroke, but only
+    # the suggestions follow it; the address is resolved on enter or blur,
+    # or once a complete suggestion was picked
+    autocomplete = gazetteer.available()
+    if autocomplete:
+        resolve_inputs = [
+            Input(ids.INPUT_LOCATION, "n_submit"),
+            Input(ids.INPUT_LOCATION, "n_blur"),
+            Input(ids.STORE_LOCATION_PICKED, "data"),
+            State(ids.INPUT_LOCATION, "value"),
+        ]
+
+        @app.callback(
+            Output(ids.DATALIST_LOCATION, "children"),
+            Output(ids.STORE_LOCATION_PICKED, "data"),
+            Input(ids.INPUT_LOCATION, "value"),
+            prevent_initial_call=True,
+        )
+        def update_suggestions(location_str):
+            if gazetteer.is_label(location_str):
+                return no_update, location_str
+            labels = gazetteer.suggest(location_str)
+            return [html.Option(value=label) for label in labels], no_update
+
+    else:
+        resolve_inputs = [Input(ids.INPUT_LOCATION, "value")]
+
     @app.callback(
         [
             Output(ids.STORE_GEOLOCATION, "data"),
@@ -25,67 +139,56 @@ def render(app: Dash) -> html.Div:
             Output(ids.INPUT_LOCATION, "invalid"),
             Output(ids.COLLAPSE_MAIN_APP, "is_open"),
         ],
-        [
-            Input(ids.INPUT_LOCATION, "value"),
-        ],
+        resolve_inputs,
+        State(ids.STORE_GEOLOCATION, "data"),
     )
-    def update_geostore(location_str):
-        tz_str = None
-        tz = None
+    def update_geostore(*args):
+        location_str = args[-2]
+        previous = Geolocation(**(args[-1] or {}))
+        # leaving the field or picking the resolved place again changes nothing
+        if (
+            dash.ctx.triggered_id is not None
+            and previous.ready
+            and previous.address == location_str
+        ):
+            raise PreventUpdate
 
         if location_str is not None and location_str != "":
-            geolocator = Nominatim(user_agent="myGeocoder")
-            location = geolocator.geocode(location_str, timeout=2)
-            if location is None:
+            geolocation = lookup_geolocation(location_str)
+            if geolocation is None:
                 return ({}, False, True, False)
-            lat = location.latitude
-            lon = location.longitude
-
-            tz_str = tf.timezone_at(lng=lon, lat=lat)
-
-            # lookup elevation for location, https://www.open-elevation.com
-            ele_response = requests.get(
-                f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lon}"
-            )
-            ele = ele_response.json()["results"][0]["elevation"]
-
-            geolocation = Geolocation(
-                lat=lat,
-                lon=lon,
-                ele=ele,
-                tz_str=tz_str,
-                address=location.address,
-            )
-
-            azi_vect = np.linspace(0, 360, 8, endpoint=False)
-            tilt_vect = np.linspace(0, 90, 7, endpoint=True)
-            opti_angle_matrix = np.zeros((8, 7, 12))
-
-            for i, azi in enumerate(azi_vect):
-                for j, tilt in enumerate(tilt_vect):
-                    p = Panel(
-                        label="opti_panel",
-                        size_m2=1.0,
-                        azimuth_deg=azi,
-                        altitude_deg=tilt,
-                    )
-                    df = p.monthly_energy(
-                        tz_str=geolocation.tz_str,
-                        lat=geolocation.lat,
-                        lon=geolocation.lon,
-                        ele=geolocation.ele,
-                        monthly_weather_factors=tuple([1.0] * 12),
-                        year=date.today().year,
-                        label="o",
-                    )
-                    opti_angle_matrix[i, j, :] = df["o"].values
-
-            geolocation.opti_angle_matrix = list(opti_angle_matrix)
-            geolocation.opti_azi_vect = list(azi_vect)
-            geolocation.opti_tilt_vect = list(tilt_vect)
+
+            # an uploaded horizon stays with its location, e.g. on reload
+            if (previous.lat, previous.lon) == (geolocation.lat, geolocation.lon):
+                geolocation.horizon_deg = previous.horizon_deg
+            geolocation = with_opti_angles(geolocation, year=date.today().year)
             return (geolocation.dict(), True, False, True)
         return ({}, False, True, False)
 
+    @app.callback(
+        Output(ids.STORE_GEOLOCATION, "data", allow_duplicate=True),
+        Output(ids.TEXT_HORIZON, "children"),
+        Input(ids.UPLOAD_HORIZON, "contents"),
+        Input(ids.BTN_CLEAR_HORIZON, "n_clicks"),
+        State(ids.UPLOAD_HORIZON, "filename"),
+        State(ids.STORE_GEOLOCATION, "data"),
+        prevent_initial_call=True,
+    )
+    def update_horizon(contents: str, clear_nclicks: int, filename: str, data: dict):
+        geolocation = Geolocation(**(data or {}))
+        if not geolocation.ready:
+            raise PreventUpdate
+        if dash.ctx.triggered_id == ids.BTN_CLEAR_HORIZON:
+            geolocation.horizon_deg = None
+            return geolocation.dict(), ""
+        if contents is None:
+            raise PreventUpdate
+        try:
+            geolocation.horizon_deg = list(horizon.read_upload(contents))
+        except ValueError as e:
+            return no_update, f"Horizon import of {filename} failed: {e}"
+        return geolocation.dict(), ""
+
     @app.callback(
         Output(ids.TEXT_GEOLOC, "children"),
         Input(ids.STORE_GEOLOCATION, "data"),
@@ -104,74 +207,129 @@ def render(app: Dash) -> html.Div:
                     f"{loc.address}, local time={now:%H:%M:%S}, timezone={loc.tz_str}"
                 ),
                 dbc.Row(f"Lat={loc.lat}°, Lon={loc.lon}°, Ele={loc.ele}m"),
+                dbc.Row(
+                    f"Horizon: {len(loc.horizon_deg)} points, "
+                    f"up to {max(loc.horizon_deg):.0f}°"
+                    if loc.horizon_deg is not None
+                    else "Horizon: open sky"
+                ),
             ]
 
         else:
             return "no valid coordinates"
 
-    return dcc.Loading(
-        html.Div(
-            [
-                dcc.Store(id=ids.STORE_GEOLOCATION, storage_type="local"),
-                dbc.Card(
-                    [
-                        dbc.CardHeader(
-                            [
-                                html.H4(
-                                    [
-                                        html.I(
-                                            className="bi bi-geo-alt me-2"
-                                        ),  # bi-globe
-                                        " Location",
-                                    ]
-                                ),
-                            ]
-                        ),
-                        dbc.CardBody(
-                            [
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            dbc.InputGroup(
-                                                [
-                                                    # dbc.InputGroupText(
-                                                    #     [
-                                                    #         html.I(
-                                                    #             className="bi bi-globe"  # me-2"
-                                                    #         ),
-                                                    #     ]
-                                                    # ),
-                                                    dbc.Input(
-                                                        id=ids.INPUT_LOCATION,
-                                                        type="text",
-                                                        placeholder="Enter address here and press enter",
-                                                        persistence=True,
-                                                        debounce=True,
+    # only the results are covered by the loading overlay, an input hidden
+    # by it would lose the focus while typing
+    return html.Div(
+        [
+            dcc.Store(id=ids.STORE_LOCATION_PICKED),
+            dbc.Card(
+                [
+                    dbc.CardHeader(
+                        [
+                            html.H4(
+                                [
+                                    html.I(className="bi bi-geo-alt me-2"),  # bi-globe
+                                    " Location",
+                                ]
+                            ),
+                        ]
+                    ),
+                    dbc.CardBody(
+                        [
+                            dbc.Row(
+                                [
+                                    dbc.Col(
+                                        dbc.InputGroup(
+                                            [
+                                                # dbc.InputGroupText(
+                                                #     [
+                                                #         html.I(
+                                                #             className="bi bi-globe"  # me-2"
+                                                #         ),
+                                                #     ]
+                                                # ),
+                                                dbc.Input(
+                                                    id=ids.INPUT_LOCATION,
+                                                    type="text",
+                                                    placeholder="Enter address here and press enter",
+                                                    persistence=True,
+                                                    debounce=not autocomplete,
+                                                    list=ids.DATALIST_LOCATION,
+                                                    autocomplete=(
+                                                        "off" if autocomplete else None
                                                     ),
-                                                ]
+                                                ),
+                                                html.Datalist(id=ids.DATALIST_LOCATION),
+                                            ]
+                                        )
+                                    )
+                                ]
+                            ),
+                            dcc.Loading(
+                                [
+                                    dcc.Store(
+                                        id=ids.STORE_GEOLOCATION, storage_type="local"
+                                    ),
+                                    dbc.Row(
+                                        dbc.Col(
+                                            html.P(
+                                                "Resolved City/Country and Timezone",
+                                                id=ids.TEXT_GEOLOC,
+                                                className="card-text",
                                             )
                                         )
-                                    ]
-                                ),
-                                dbc.Row(
-                                    dbc.Col(
-                                        html.P(
-                                            "Resolved City/Country and Timezone",
-                                            id=ids.TEXT_GEOLOC,
-                                            className="card-text",
+                                    ),
+                                    dbc.Row(
+                                        dbc.Col(
+                                            [
+                                                dcc.Upload(
+                                                    dbc.Button(
+                                                        [
+                                                            html.I(
+                                                                className="bi bi-upload me-2"
+                                                            ),
+                                                            "Horizon",
+                                                        ],
+                                                        size="sm",
+                                                        className="me-1",
+                                                    ),
+                                                    id=ids.UPLOAD_HORIZON,
+                                                    accept=".csv,.txt",
+                                                    style={"display": "inline-block"},
+                                                ),
+                                                dbc.Tooltip(
+                                                    "Shade the sun behind hills and "
+                                                    "buildings: a CSV file with azimuth "
+                                                    "and elevation columns in degrees",
+                                                    target=ids.UPLOAD_HORIZON,
+                                                ),
+                                                dbc.Button(
+                                                    html.I(className="bi bi-x-lg"),
+                                                    id=ids.BTN_CLEAR_HORIZON,
+                                                    size="sm",
+                                                ),
+                                                dbc.Tooltip(
+                                                    "Remove the horizon, open sky",
+                                                    target=ids.BTN_CLEAR_HORIZON,
+                                                ),
+                                                html.Span(
+                                                    id=ids.TEXT_HORIZON,
+                                                    className="ms-2",
+                                                ),
+                                            ]
                                         )
-                                    )
-                                ),
-                            ]
-                        ),
-                    ],
-                    color="success",
-                    inverse=True,
-                    className="shadow mb-3"
-                    # style={"width": "18rem"},
-                ),
-            ]
-        ),
-        # debug=True,
-        fullscreen=True,
+                                    ),
+                                ],
+                                fullscreen=True,
+                            ),
+                        ]
+                    ),
+                ],
+                color="success",
+                inverse=True,
+                className="shadow mb-3",
+                # style={"width": "18rem"},
+            ),
+        ]
     )
@@ -0,0 +1,124 @@
+import argparse
+import base64
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# horizon profiles: the elevation [deg] of the skyline at evenly spaced
+# azimuths starting north and going clockwise, e.g. 72 values for 5°
+# steps; the sun behind the skyline does not reach the panel directly,
+# diffuse light is not shaded. Files are csv/txt with an azimuth and an
+# elevation column (first two columns, or named azimuth/elevation, PVGIS'
+# A/H_hor horizon output with 0° south is recognized too)
+HORIZON_STEP_DEG = 5.0
+MAX_ELEVATION_DEG = 90.0
+MIN_ELEVATION_DEG = -10.0  # e.g. on a mountain top
+
+
+def validate(profile) -> tuple:
+    # hashable profile, raises ValueError for unusable values
+    profile = tuple(float(e) for e in profile)
+    if len(profile) == 0:
+        raise ValueError("a horizon profile needs at least one elevation")
+    if not all(MIN_ELEVATION_DEG <= e <= MAX_ELEVATION_DEG for e in profile):
+        raise ValueError(
+            f"horizon elevations must be between {MIN_ELEVATION_DEG} and "
+            f"{MAX_ELEVATION_DEG} degrees"
+        )
+    return profile
+
+
+def resample(azimuth_deg, elevation_deg) -> tuple:
+    # measured (azimuth, elevation) points onto the HORIZON_STEP_DEG grid
+    azimuth = np.asarray(azimuth_deg, dtype=float) % 360
+    grid = np.arange(0, 360, HORIZON_STEP_DEG)
+    elevation = np.interp(grid, azimuth, elevation_deg, period=360)
+    return validate(np.round(elevation, 2))
+
+
+def parse_profile(text: str) -> tuple:
+    try:
+        df = pd.read_csv(io.StringIO(text), sep=None, engine="python")
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, csv.Error) as e:
+        raise ValueError(f"not a csv file ({e})") from e
+    df.columns = [str(c).strip() for c in df.columns]
+    if len(df) == 0:
+        raise ValueError("the horizon file has no rows")
+    if {"A", "H_hor"} <= set(df.columns):
+        # PVGIS counts the azimuth from south, positive towards west
+        return resample(df["A"] + 180, df["H_hor"])
+    if {"azimuth", "elevation"} <= set(df.columns):
+        return resample(df["azimuth"], df["elevation"])
+    if len(df.columns) < 2:
+        raise ValueError("a horizon file needs an azimuth and an elevation column")
+    values = df.iloc[:, :2].apply(pd.to_numeric, errors="coerce")
+    if values.isna().any().any():
+        raise ValueError("horizon azimuths and elevations must be numbers")
+    return resample(values.iloc[:, 0], values.iloc[:, 1])
+
+
+def read_upload(contents: str) -> tuple:
+    # contents as delivered by dcc.Upload: "data:<mime>;base64,<payload>"
+    _, content_string = contents.split(",", 1)
+    return parse_profile(base64.b64decode(content_string).decode("utf-8-sig"))
+
+
+def read_profile(path: str) -> tuple:
+    with open(path, encoding="utf-8-sig") as f:
+        return parse_profile(f.read())
+
+
+def elevation_at(profile: tuple, azimuth_deg: np.ndarray) -> np.ndarray:
+    # skyline elevation in the given directions, linear between the points
+    profile = np.asarray(profile, dtype=float)
+    grid = np.arange(len(profile)) * 360 / len(profile)
+    return np.interp(azimuth_deg, grid, profile, period=360)
+
+
+def beam_mask(sky: pd.DataFrame, horizons: list) -> np.ndarray:
+    # (times, n) 1.0 where the sun is above the horizon of the panel, None
+    # without any profile; every distinct profile is one interpolation over
+    # the solar positions of the sky
+    if horizons is None or all(h is None for h in horizons):
+        return None
+    solar_elevation = 90 - sky["apparent_zenith"].values
+    solar_azimuth = sky["azimuth"].values
+    masks = {}
+    visible = np.ones((len(sky), len(horizons)))
+    for n, h in enumerate(horizons):
+        if h is None:
+            continue
+        h = tuple(h)
+        if h not in masks:
+            masks[h] = solar_elevation > elevation_at(h, solar_azimuth)
+        visible[:, n] = masks[h]
+    return visible
+
+
+def apply(panels: list, profile) -> list:
+    # panels without a profile of their own are shaded by the location's
+    if profile is None:
+        return panels
+    profile = list(profile)
+    return [
+        p if p.horizon_deg is not None else p.copy(update=dict(horizon_deg=profile))
+        for p in panels
+    ]
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="horizon profiles")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    profile = read_profile(args.path)
+    for azimuth, elevation in zip(np.arange(0, 360, HORIZON_STEP_DEG), profile):
+        print(f"{azimuth:5.1f}° {elevation:5.1f}°")
+    print(f"{os.path.basename(args.path)}: {len(profile)} points")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 STORE_GEOLOCATION = "store-geolocation"
 INPUT_LOCATION = "input-location"
+DATALIST_LOCATION = "datalist-location"
+STORE_LOCATION_PICKED = "store-location-picked"
 INPUT_DATE = "input-date"
 TEXT_GEOLOC = "txt-geolocation"
+UPLOAD_HORIZON = "upload-horizon"
+BTN_CLEAR_HORIZON = "btn-clear-horizon"
+TEXT_HORIZON = "txt-horizon"
 TABS_PLOT = "tabs-plot"
 TAB_PLOT_DAY = "tab-plot-day"
 TAB_PLOT_YEAR = "tab-plot-year"
 TAB_PLOT_OPTI = "tab-plot-opti"
+TAB_PLOT_INVERTER = "tab-plot-inverter"
 
 COLLAPSE_MAIN_APP = "collapse-main"
 STORE_WEATHER = "store-weather"
@@ -15,6 +21,8 @@ DATEPICKER = "datepicker"
 DIV_DATEPICKER = "div-datepicker"
 INPUT_WEATHER_OVEREALL = "input-weather-overall"
 INPUT_WEATHER_MONTH = "input-weather-month"
+TEXT_WEATHER_SOURCE = "txt-weather-source"
+STORE_WEATHER_LOCATION = "store-weather-location"
 
 BTN_DATE_TODAY = "btn-date-today"
 BTN_DATE_PMIN = "btn-date-pmin"
@@ -23,10 +31,18 @@ BTN_DATE_EMIN = "btn-date-emin"
 BTN_DATE_EMAX = "btn-date-emax"
 
 STORE_PANELS = "store-panels"
+STORE_PANELS_RESET = "store-panels_reset"
 DIV_PANEL_LIST = "div-panel_list"
 BTN_ADD_PANEL = "btn-add_panel"
 BTN_CLEAR_PANELS = "btn-clear_panels"
+UPLOAD_PANELS = "upload-panels"
+BTN_EXPORT_PANELS_CSV = "btn-export_panels_csv"
+BTN_EXPORT_PANELS_JSON = "btn-export_panels_json"
+DOWNLOAD_PANELS = "download-panels"
+ALERT_PANEL_IMPORT = "alert-panel_import"
 
+STORE_PANEL = "store-panel"
+CARD_PANEL = "card-panel"
 CHECKBOX_PANEL_ACTIVE = "check-panel_active"
 BTN_DELETE_PANEL = "btn-panel_delete"
 INPUT_PANEL_LABEL = "input-panel_label"
@@ -35,11 +51,15 @@ INPUT_PANEL_ALT = "input-panel_alt"
 INPUT_PANEL_SIZE = "input-panel_size"
 INPUT_PANEL_COLOR = "input-panel_color"
 INPUT_PANEL_SPECPWR = "input-panel_specific_power"
+INPUT_PANEL_MOUNT = "input-panel_mount"
+INPUT_PANEL_INVERTER = "input-panel_inverter"
 BTN_OPTIMIZE_ANGLES = "btn-optimize-azi"
 BTN_OPTIMIZE_AZI = "btn-optimize-azi"
 BTN_OPTIMIZE_TILT = "btn-optimize-tilt"
 
 DIV_GRAPH = "div-graph"
+TABLE_ANNUAL = "table-annual"
+TABLE_ANNUAL_TOTAL = "table-annual-total"
 
 MODAL_OPTI = "modal-opti"
 DIV_OPTI_GRAPH = "div-opti-graph"
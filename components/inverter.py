@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+# ac stage: panels with the same inverter name share one inverter, panels
+# without a name share the main one. An inverter is sized by the dc/ac
+# ratio, the nominal dc power of its panels over its ac power; the pvwatts
+# model (pvlib.inverter.pvwatts, written out here so a whole grid of sizes
+# broadcasts at once) has part load losses and clips at the ac power
+MAIN_INVERTER = "main"
+ETA_INV_NOM = 0.96
+ETA_INV_REF = 0.9637
+DC_AC_RATIOS = np.round(np.arange(0.8, 2.001, 0.05), 2)
+MAX_RATIOS = 200
+SWEEP_CHUNK_SIZE = 2_000_000  # time steps * ratios per ac evaluation
+
+
+def name(panel) -> str:
+    return panel.inverter if panel.inverter else MAIN_INVERTER
+
+
+def groups(panels: list) -> dict:
+    # inverter name -> positions of its panels, in order of appearance
+    result = {}
+    for n, p in enumerate(panels):
+        result.setdefault(name(p), []).append(n)
+    return result
+
+
+def _converted(pdc_W: np.ndarray, pac0_W: np.ndarray) -> np.ndarray:
+    # ac power before the ac limit, pdc_W (times, 1) and pac0_W (ratios,)
+    # broadcast to (times, ratios)
+    zeta = pdc_W * ETA_INV_NOM / pac0_W
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta = (ETA_INV_NOM / ETA_INV_REF) * (
+            -0.0162 * zeta - np.where(pdc_W != 0, 0.0059 / zeta, 0.0) + 0.9858
+        )
+    return np.maximum(eta * pdc_W, 0)
+
+
+def ac_power(pdc_W: np.ndarray, pac0_W) -> np.ndarray:
+    # identical to pvlib.inverter.pvwatts(pdc_W, pac0_W / ETA_INV_NOM, ...)
+    return np.minimum(_converted(pdc_W, pac0_W), pac0_W)
+
+
+@metrics.timed("inverter.sweep")
+def sweep(dc_W: np.ndarray, pdc0_W: np.ndarray, ratios, step_h: float) -> pd.DataFrame:
+    # annual ac energy of inverters sized by every dc/ac ratio from one dc
+    # profile, dc_W (times, inverters) and their nominal dc powers pdc0_W;
+    # every inverter gets the same ratio
+    ratios = np.asarray(ratios, dtype=float)
+    dc_W = np.asarray(dc_W, dtype=float)
+    rows = max(1, SWEEP_CHUNK_SIZE // max(1, len(ratios)))
+    ac_Wh = np.zeros(len(ratios))
+    clipped_Wh = np.zeros(len(ratios))
+    for k, pdc0 in enumerate(pdc0_W):
+        pdc = dc_W[:, k]
+        pdc = pdc[pdc > 0][:, None]  # nights convert nothing
+        pac0 = pdc0 / ratios
+        for start in range(0, len(pdc), rows):
+            converted = _converted(pdc[start : start + rows], pac0)
+            ac = np.minimum(converted, pac0)
+            ac_Wh += ac.sum(axis=0) * step_h
+            clipped_Wh += (converted - ac).sum(axis=0) * step_h
+
+    dc_Wh = dc_W.clip(min=0).sum() * step_h
+    return pd.DataFrame(
+        dict(
+            dc_kWh=dc_Wh / 1000,
+            ac_kWh=ac_Wh / 1000,
+            clipped_kWh=clipped_Wh / 1000,
+            clipping_loss=clipped_Wh / dc_Wh if dc_Wh > 0 else 0.0,
+            efficiency=ac_Wh / dc_Wh if dc_Wh > 0 else 0.0,
+        ),
+        index=pd.Index(ratios, name="dc_ac_ratio"),
+    )
@@ -59,10 +59,14 @@ def create_layout(app: Dash) -> dbc.Container:
                                                     ),
                                                     dbc.Tab(
                                                         label="Angle Efficiency",
+                                                        tab_id=ids.TAB_PLOT_OPTI,
+                                                    ),
+                                                    dbc.Tab(
+                                                        label="Inverter",
                                                         tab_style={
                                                             "marginRight": "auto"
                                                         },
-                                                        tab_id=ids.TAB_PLOT_OPTI,
+                                                        tab_id=ids.TAB_PLOT_INVERTER,
                                                     ),
                                                 ],
                                                 id=ids.TABS_PLOT,
@@ -0,0 +1,49 @@
+import calendar
+from functools import lru_cache
+
+import numpy as np
+
+from . import metrics
+
+# yields over the lifetime of a system from one simulated year: the cached
+# monthly yields of the first year are moved to the calendar of every
+# later year (february has 29 days in leap years) and reduced by the module
+# degradation, linear in the age as in the performance warranties. The
+# remaining year to year differences of the sun's path are far below the
+# weather's, benchmarks/lifetime_accuracy.py compares against simulations
+LIFETIME_YEARS = 25
+MAX_LIFETIME_YEARS = 50
+DEGRADATION_PER_YEAR = 0.005
+
+
+@lru_cache(maxsize=64)
+def days_in_months(start_year: int, years: int) -> np.ndarray:
+    # (years, 12), shared and must not be modified
+    return np.array(
+        [
+            [calendar.monthrange(y, m)[1] for m in range(1, 13)]
+            for y in range(start_year, start_year + years)
+        ]
+    )
+
+
+def month_ages(days: np.ndarray) -> np.ndarray:
+    # (years, 12) age of the system [years] in the middle of every month
+    within_year = (np.cumsum(days, axis=1) - days / 2) / days.sum(axis=1)[:, None]
+    return np.arange(len(days))[:, None] + within_year
+
+
+@metrics.timed("lifetime.project")
+def project(
+    e_kWh: np.ndarray,
+    start_year: int,
+    years: int = LIFETIME_YEARS,
+    degradation_per_year=DEGRADATION_PER_YEAR,
+) -> np.ndarray:
+    # (12, n) monthly energy of start_year -> (years, n) annual energy;
+    # degradation_per_year is one rate or one per panel
+    days = days_in_months(start_year, years)
+    shift = days / days[0]
+    rate = np.atleast_1d(np.asarray(degradation_per_year, dtype=float))
+    retained = np.maximum(1 - month_ages(days)[:, :, None] * rate, 0)
+    return (shift[:, :, None] * retained * e_kWh[None, :, :]).sum(axis=1)
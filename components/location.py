@@ -11,6 +11,7 @@ class Geolocation(BaseModel):
     opti_angle_matrix: list = None
     opti_azi_vect: list = None
     opti_tilt_vect: list = None
+    horizon_deg: list[float] = None  # skyline of the location, see horizon.py
 
     @property
     def ready(self) -> bool:
@@ -24,22 +25,13 @@ class Geolocation(BaseModel):
     def get_opti_matrix(
         self, monthly_weather_factors: list[float]
     ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (azimuth, tilt, month) clear-sky yields weighted by the monthly
+        # weather, the azimuth 0 row is repeated for 360
         opti_matrix_3d = np.array(self.opti_angle_matrix)
-        opti_max = -1
-        opti_matrix_2d = np.zeros(
-            (len(self.opti_azi_vect) + 1, len(self.opti_tilt_vect))
-        )
-        for i in range(len(self.opti_azi_vect) + 1):
-            for j in range(len(self.opti_tilt_vect)):
-                if i >= len(self.opti_azi_vect):
-                    opti = sum(opti_matrix_3d[0, j, :] * monthly_weather_factors)
-                else:
-                    opti = sum(opti_matrix_3d[i, j, :] * monthly_weather_factors)
-
-                opti_matrix_2d[i, j] = opti
-                opti_max = max(opti_max, opti)
+        opti_matrix_2d = opti_matrix_3d @ np.asarray(monthly_weather_factors, float)
+        opti_matrix_2d = np.vstack([opti_matrix_2d, opti_matrix_2d[:1]])
 
-        opti_matrix_2d = opti_matrix_2d / opti_max * 100.0
+        opti_matrix_2d = opti_matrix_2d / opti_matrix_2d.max() * 100.0
 
         return (
             np.array(self.opti_azi_vect + [360]),
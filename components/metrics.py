@@ -0,0 +1,151 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+from dash import Dash
+from dash.exceptions import PreventUpdate
+from flask import Flask, Response
+
+# in-process timing spans and payload counters, exported in the prometheus
+# text format on /metrics; with several gunicorn workers every worker
+# reports its own numbers
+METRICS_PATH = "/metrics"
+SPAN_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+LOG_ENV = "PV_METRICS_LOG"  # set to 1 for one json log line per span
+
+logger = logging.getLogger("pv.metrics")
+
+_lock = threading.Lock()
+_spans = {}  # name -> [bucket counts..., +Inf count, sum]
+_counters = {}  # (metric, label value) -> value
+_log_spans = os.environ.get(LOG_ENV, "") not in ("", "0", "false")
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        span = _spans.get(name)
+        if span is None:
+            span = _spans[name] = [0] * (len(SPAN_BUCKETS) + 1) + [0.0]
+        span[bisect.bisect_left(SPAN_BUCKETS, seconds)] += 1
+        span[-1] += seconds
+    if _log_spans:
+        logger.info(json.dumps(dict(span=name, seconds=round(seconds, 6))))
+
+
+def count(metric: str, label: str, value: float = 1):
+    with _lock:
+        _counters[(metric, label)] = _counters.get((metric, label), 0) + value
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    # decorator, records the runtime of every call under name
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _dispatch_wrapper(name: str, dispatch):
+    # wraps dash's registered handler: the time includes input validation
+    # and json serialization of the response, on top of the callback itself
+    @functools.wraps(dispatch)
+    def wrapper(*args, **kwargs):
+        count("pv_callback_calls_total", name)
+        request_bytes = flask.request.content_length or 0
+        count("pv_callback_request_bytes_total", name, request_bytes)
+        start = time.perf_counter()
+        try:
+            response = dispatch(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            count("pv_callback_errors_total", name)
+            raise
+        finally:
+            observe(f"dispatch:{name}", time.perf_counter() - start)
+        count("pv_callback_response_bytes_total", name, len(response))
+        return response
+
+    return wrapper
+
+
+def instrument(app: Dash):
+    # must be called before the callbacks are registered, every following
+    # app.callback gets a span for the function and one for the dispatch
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        before = set(app.callback_map)
+        decorator = register(*args, **kwargs)
+        added = set(app.callback_map) - before
+
+        def wrap(fn):
+            name = f"{fn.__module__}.{fn.__name__}"
+            decorator(timed(f"callback:{name}")(fn))
+            for key in added:
+                entry = app.callback_map[key]
+                entry["callback"] = _dispatch_wrapper(name, entry["callback"])
+            return fn
+
+        return wrap
+
+    app.callback = callback
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_metrics() -> str:
+    with _lock:
+        spans = {name: list(values) for name, values in _spans.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP pv_span_seconds runtime of instrumented functions and callbacks",
+        "# TYPE pv_span_seconds histogram",
+    ]
+    for name, values in sorted(spans.items()):
+        label = f'span="{_label(name)}"'
+        cumulated = 0
+        for le, n in zip(SPAN_BUCKETS + ["+Inf"], values[:-1]):
+            cumulated += n
+            lines.append(f'pv_span_seconds_bucket{{{label},le="{le}"}} {cumulated}')
+        lines.append(f"pv_span_seconds_sum{{{label}}} {values[-1]}")
+        lines.append(f"pv_span_seconds_count{{{label}}} {cumulated}")
+
+    for metric in sorted({m for m, _ in counters}):
+        lines.append(f"# TYPE {metric} counter")
+        for (m, name), value in sorted(counters.items()):
+            if m == metric:
+                lines.append(f'{metric}{{callback="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def register(server: Flask):
+    @server.route(METRICS_PATH)
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,20 +1,18 @@
-from dash import Dash, html
+from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc
 from pydantic import BaseModel
-import pytz
-import calendar
-from datetime import datetime
 
 import numpy as np
 import pandas as pd
-from pvlib import pvsystem, modelchain, location
 
 from functools import lru_cache
+from typing import Union
 
-from . import ids
+from . import ids, simulation
 from .location import Geolocation
 
 PDC0_DEFAULT = round(5000 / 35, 2)
+MOUNT_LABELS = dict(fixed="Fixed", single_axis="Single axis", dual_axis="Dual axis")
 
 
 class Panel(BaseModel):
@@ -25,6 +23,9 @@ class Panel(BaseModel):
     active: bool = True
     color: str = None
     pdc0_Wpm2: float = None
+    mount: str = simulation.MOUNTS[0]
+    horizon_deg: list[float] = None  # skyline elevations, see horizon.py
+    inverter: str = None  # panels with the same name share one, inverter.py
 
     class Config:
         arbitrary_types_allowed = True
@@ -36,43 +37,22 @@ class Panel(BaseModel):
             and isinstance(self.altitude_deg, float)
             and isinstance(self.azimuth_deg, float)
             and isinstance(self.size_m2, float)
+            and self.mount in simulation.MOUNTS
         ) or self.active == False
 
-    def dc_power(
-        self, tz_str: str, lat: float, lon: float, ele: float, times: pd.DatetimeIndex
-    ) -> np.ndarray:
-        tz = pytz.timezone(tz_str)
-
+    @property
+    def pdc0_W(self) -> float:
         pdc0_specific = (
             self.pdc0_Wpm2 if isinstance(self.pdc0_Wpm2, float) else PDC0_DEFAULT
         )
-        pdc0 = self.size_m2 * pdc0_specific
-
-        array_kwargs = dict(
-            module_parameters=dict(pdc0=pdc0, gamma_pdc=-0.004),
-            temperature_model_parameters=dict(a=-3.56, b=-0.075, deltaT=3),
-        )
-
-        arrays = [
-            pvsystem.Array(
-                pvsystem.FixedMount(
-                    surface_tilt=self.altitude_deg, surface_azimuth=self.azimuth_deg
-                ),
-                name="MyArray",
-                **array_kwargs,
-            )
-        ]
-        loc = location.Location(latitude=lat, longitude=lon, tz=tz, altitude=ele)
-        system = pvsystem.PVSystem(
-            arrays=arrays, inverter_parameters=dict(pdc0=pdc0, eta_inv_nom=0.97)
-        )
-        mc = modelchain.ModelChain(
-            system, loc, aoi_model="physical", spectral_model="no_loss"
-        )
+        return self.size_m2 * pdc0_specific
 
-        clearsky = loc.get_clearsky(times, model="simplified_solis")
-        mc.run_model(clearsky)
-        return mc.results.dc.values
+    def dc_power(
+        self, tz_str: str, lat: float, lon: float, ele: float, times: pd.DatetimeIndex
+    ) -> np.ndarray:
+        return simulation.dc_power_batch(
+            [self], tz_str=tz_str, lat=lat, lon=lon, ele=ele, times=times
+        )[:, 0]
 
     # @lru_cache(maxsize=32)
     def monthly_energy(
@@ -86,44 +66,26 @@ class Panel(BaseModel):
         label: str,
         freq_minutes: int = 60,
     ) -> pd.DataFrame:
-
-        tz = pytz.timezone(tz_str)
-
-        starttime = datetime(
+        e_kWh = simulation.monthly_energy_batch(
+            [self],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            monthly_weather_factors=monthly_weather_factors,
             year=year,
-            month=1,
-            day=1,
-        )
-        endtime = datetime(
-            year=year + 1,
-            month=1,
-            day=1,
-        )
-
-        times = pd.date_range(
-            f"{starttime:%Y-%m-%d %H:%M}",
-            f"{endtime:%Y-%m-%d %H:%M}",
-            freq=f"{freq_minutes}min",
-            tz=tz,
-        )[:-1]
-
-        pwr = self.dc_power(tz_str=tz_str, lat=lat, lon=lon, ele=ele, times=times)
+            freq_minutes=freq_minutes,
+        )[:, 0]
 
-        df_times = pd.DataFrame(
-            dict(pwr=pwr, month=[t.month for t in times]), index=times
-        )
-
-        pwr_mean_W = df_times.groupby("month").mean().pwr.values
-        pwr_count_h = df_times.groupby("month").count().pwr.values * freq_minutes / 60
-        e_kWh = pwr_mean_W * pwr_count_h / 1000 * monthly_weather_factors
-        months = [calendar.month_abbr[m + 1] for m in range(12)]
-
-        df_result = pd.DataFrame(data={f"{label}": e_kWh}, index=months)
+        df_result = pd.DataFrame(data={f"{label}": e_kWh}, index=simulation.MONTHS)
         return df_result
 
-    def render_as_card(self, app: Dash, i: int) -> dbc.Card:
+    def render_as_card(self, app: Dash, i: Union[int, str]) -> dbc.Card:
+        # i is the pattern-matching index of the card, not its position in
+        # the list; the "n.Panel" numbering is done by a css counter
         return dbc.Card(
             [
+                dcc.Store(id=dict(type=ids.STORE_PANEL, index=i), data=self.dict()),
                 dbc.CardHeader(
                     [
                         dbc.Row(
@@ -132,7 +94,8 @@ class Panel(BaseModel):
                                     dbc.InputGroup(
                                         [
                                             dbc.InputGroupText(
-                                                f"{i+1}.Panel",
+                                                "Panel",
+                                                className="panel-number",
                                             ),
                                             dbc.Input(
                                                 value=self.label,
@@ -279,10 +242,45 @@ class Panel(BaseModel):
                             "Specifc DC Power output per m² under best conditions",
                             target=dict(type=ids.INPUT_PANEL_SPECPWR, index=i),
                         ),
+                        dbc.InputGroup(
+                            [
+                                dbc.InputGroupText("Mount"),
+                                dbc.Select(
+                                    value=self.mount,
+                                    options=[
+                                        dict(label=MOUNT_LABELS[m], value=m)
+                                        for m in simulation.MOUNTS
+                                    ],
+                                    id=dict(type=ids.INPUT_PANEL_MOUNT, index=i),
+                                ),
+                            ]
+                        ),
+                        dbc.Tooltip(
+                            "Single axis trackers rotate about an axis with the "
+                            "azimuth and tilt above, dual axis trackers face the sun",
+                            target=dict(type=ids.INPUT_PANEL_MOUNT, index=i),
+                        ),
+                        dbc.InputGroup(
+                            [
+                                dbc.InputGroupText("Inverter"),
+                                dbc.Input(
+                                    value=self.inverter,
+                                    type="text",
+                                    debounce=True,
+                                    placeholder="main",
+                                    id=dict(type=ids.INPUT_PANEL_INVERTER, index=i),
+                                ),
+                            ]
+                        ),
+                        dbc.Tooltip(
+                            "Panels with the same inverter name share one inverter",
+                            target=dict(type=ids.INPUT_PANEL_INVERTER, index=i),
+                        ),
                     ]
                 ),
             ],
-            className="shadow mb-3",
+            className="shadow mb-3 panel-card",
             color=self.color,  # "warning",
             inverse=True,
+            id=dict(type=ids.CARD_PANEL, index=i),
         )
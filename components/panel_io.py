@@ -0,0 +1,198 @@
+import base64
+import csv
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import horizon, simulation
+from .panel import Panel
+
+PANEL_COLUMNS = [
+    "label",
+    "size_m2",
+    "azimuth_deg",
+    "altitude_deg",
+    "active",
+    "color",
+    "pdc0_Wpm2",
+    "mount",
+    "horizon_deg",
+    "inverter",
+]
+NUMERIC_LIMITS = {
+    "size_m2": (0.0, np.inf),
+    "azimuth_deg": (0.0, 360.0),
+    "altitude_deg": (0.0, 90.0),
+    "pdc0_Wpm2": (0.0, np.inf),
+}
+REQUIRED_COLUMNS = ["size_m2", "azimuth_deg", "altitude_deg"]
+MAX_IMPORT_ROWS = 10000
+MAX_REPORTED_ERRORS = 10
+
+TRUE_STRINGS = ["true", "1", "yes", "y", "x", "on"]
+FALSE_STRINGS = ["false", "0", "no", "n", "", "off"]
+
+
+class PanelImportError(ValueError):
+    pass
+
+
+def parse_horizon(value) -> list:
+    # a list (json) or elevations separated by spaces or semicolons (csv)
+    if value is None or (np.isscalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        value = value.strip("[] ").replace(",", " ").replace(";", " ").split()
+        if len(value) == 0:
+            return None
+    return list(horizon.validate(value))
+
+
+def read_panel_file(contents: str, filename: str) -> pd.DataFrame:
+    # contents as delivered by dcc.Upload: "data:<mime>;base64,<payload>"
+    _, content_string = contents.split(",", 1)
+    decoded = base64.b64decode(content_string).decode("utf-8-sig")
+    return parse_panel_text(decoded, filename)
+
+
+def read_panel_path(path: str) -> pd.DataFrame:
+    with open(path, encoding="utf-8-sig") as f:
+        return parse_panel_text(f.read(), path)
+
+
+def load_panels(path: str) -> list[Panel]:
+    df, errors = validate_panel_frame(read_panel_path(path))
+    if len(errors) > 0:
+        raise PanelImportError(f"{path}: {'; '.join(errors)}")
+    return panels_from_frame(df)
+
+
+def parse_panel_text(decoded: str, filename: str) -> pd.DataFrame:
+    if filename is not None and filename.lower().endswith(".json"):
+        data = json.loads(decoded)
+        if isinstance(data, dict):
+            data = data.get("panels", [])
+        if not isinstance(data, list) or not all(isinstance(d, dict) for d in data):
+            raise PanelImportError("JSON must be a list of panels")
+        df = pd.DataFrame.from_records(data)
+    else:
+        try:
+            df = pd.read_csv(io.StringIO(decoded), sep=None, engine="python")
+        except csv.Error as e:  # the delimiter of an empty file is unknown
+            raise PanelImportError(f"not a CSV file: {e}")
+
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def validate_panel_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    # checks all rows column-wise, returns the cleaned frame and the errors
+    if len(df) > MAX_IMPORT_ROWS:
+        raise PanelImportError(
+            f"too many panels ({len(df)}), at most {MAX_IMPORT_ROWS} are supported"
+        )
+    if len(df) == 0:
+        raise PanelImportError("no panels in the file")
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if len(missing) > 0:
+        raise PanelImportError(f"missing column(s): {', '.join(missing)}")
+
+    clean = pd.DataFrame(index=df.index)
+    invalid = pd.DataFrame(False, index=df.index, columns=PANEL_COLUMNS)
+
+    for col, (lo, hi) in NUMERIC_LIMITS.items():
+        raw = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        values = pd.to_numeric(raw, errors="coerce").astype(float)
+        given = raw.notna() & (raw.astype(str).str.strip() != "")
+        out_of_range = (values < lo) | (values > hi) | np.isinf(values)
+        if col in REQUIRED_COLUMNS:
+            invalid[col] = values.isna() | out_of_range
+        else:
+            invalid[col] = (given & values.isna()) | out_of_range
+        clean[col] = values.where(~invalid[col])
+
+    if "active" in df.columns:
+        active = df["active"].astype(str).str.strip().str.lower()
+        active[df["active"].isna()] = "true"
+        # 1.0/0.0 as written by pandas or spreadsheets for a bool column
+        numeric = pd.to_numeric(df["active"], errors="coerce")
+        active[numeric == 1] = "true"
+        active[numeric == 0] = "false"
+        invalid["active"] = ~active.isin(TRUE_STRINGS + FALSE_STRINGS)
+        clean["active"] = active.isin(TRUE_STRINGS)
+    else:
+        clean["active"] = True
+
+    if "color" in df.columns:
+        color = df["color"].fillna("").astype(str).str.strip()
+        invalid["color"] = (color != "") & ~color.str.fullmatch(r"#[0-9a-fA-F]{6}")
+        clean["color"] = color.where((color != "") & ~invalid["color"], None)
+    else:
+        clean["color"] = None
+
+    if "mount" in df.columns:
+        mount = df["mount"].fillna("").astype(str).str.strip().str.lower()
+        mount[mount == ""] = simulation.MOUNTS[0]
+        invalid["mount"] = ~mount.isin(simulation.MOUNTS)
+        clean["mount"] = mount.where(~invalid["mount"], simulation.MOUNTS[0])
+    else:
+        clean["mount"] = simulation.MOUNTS[0]
+
+    profiles = []
+    if "horizon_deg" in df.columns:
+        for r, value in enumerate(df["horizon_deg"]):
+            try:
+                profiles.append(parse_horizon(value))
+            except (ValueError, TypeError):
+                invalid.iat[r, PANEL_COLUMNS.index("horizon_deg")] = True
+                profiles.append(None)
+    clean["horizon_deg"] = pd.Series(
+        profiles or [None] * len(df), index=df.index, dtype=object
+    )
+
+    for col in ["label", "inverter"]:
+        if col in df.columns:
+            text = df[col].fillna("").astype(str).str.strip()
+            clean[col] = text.where(text != "", None)
+        else:
+            clean[col] = None
+
+    errors = []
+    bad_rows, bad_cols = np.nonzero(invalid.values)
+    for r, c in zip(bad_rows, bad_cols):
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            errors.append(f"... {len(bad_rows) - MAX_REPORTED_ERRORS} more errors")
+            break
+        col = PANEL_COLUMNS[c]
+        value = df[col].iloc[r] if col in df.columns else None
+        if value is None or (np.isscalar(value) and pd.isna(value)):
+            errors.append(f"row {r + 1}: missing {col}")
+        else:
+            errors.append(f"row {r + 1}: invalid {col} '{value}'")
+
+    return clean[PANEL_COLUMNS], errors
+
+
+def panels_from_frame(df: pd.DataFrame) -> list[Panel]:
+    # the frame is already validated, so the per-field pydantic checks
+    # can be skipped by using construct()
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    return [Panel.construct(**r) for r in records]
+
+
+def panels_to_frame(panels: list[Panel]) -> pd.DataFrame:
+    return pd.DataFrame([p.dict() for p in panels], columns=PANEL_COLUMNS)
+
+
+def export_panels(panels: list[Panel], fmt: str = "csv") -> str:
+    df = panels_to_frame(panels)
+    if fmt == "json":
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        return json.dumps(dict(panels=records), indent=2)
+    df["horizon_deg"] = [
+        " ".join(f"{e:g}" for e in h) if h is not None else None
+        for h in df["horizon_deg"]
+    ]
+    return df.to_csv(index=False)
@@ -1,8 +1,10 @@
 import dash
-from dash import Dash, html, dcc, Input, Output, State, ALL, MATCH
+from dash import Dash, html, dcc, Input, Output, State, ALL, MATCH, Patch, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import json
+import time
+import uuid
 import numpy as np
 from scipy.interpolate import interp2d
 from scipy.optimize import minimize
@@ -10,14 +12,26 @@ from scipy.optimize import minimize
 import pandas as pd
 from pydantic import BaseModel
 
-from . import ids
+from . import (
+    ids,
+    simulation,
+    panel_io,
+    metrics,
+    singleflight,
+    horizon,
+    inverter,
+    lifetime,
+    uncertainty,
+)
 from .panel import Panel
 from .location import Geolocation
 from datetime import date, datetime, timedelta
 import pytz
 import calendar
 
-from functools import partial
+from functools import lru_cache, partial
+
+DAYS_CACHE_SIZE = 256
 
 
 class DaysOfInterest(BaseModel):
@@ -34,70 +48,352 @@ class AllPanels(BaseModel):
     def ready(self) -> bool:
         return np.all([p.ready for p in self.panels])
 
-    def get_days_of_interest(
+    @property
+    def simulated_indices(self) -> list[int]:
+        return [i for i, p in enumerate(self.panels) if p.active and p.ready]
+
+    def label(self, i: int) -> str:
+        p = self.panels[i]
+        return p.label if (p.label is not None and p.label != "") else f"{i+1}.Panel"
+
+    def shaded_by(self, horizon_deg: list) -> "AllPanels":
+        # the location's horizon for all panels without their own profile
+        return AllPanels.construct(panels=horizon.apply(self.panels, horizon_deg))
+
+    def monthly_energy(
         self,
+        tz_str: str,
+        lat: float,
+        lon: float,
+        ele: float,
+        monthly_weather_factors: tuple[float],
         year: int,
+        freq_minutes: int = 60,
+        weather_file: str = None,
+    ) -> pd.DataFrame:
+        indices = self.simulated_indices
+        e_kWh = simulation.monthly_energy_batch(
+            [self.panels[i] for i in indices],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            monthly_weather_factors=monthly_weather_factors,
+            year=year,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
+        )
+        return pd.DataFrame(
+            e_kWh, index=simulation.MONTHS, columns=[f"p_{i}" for i in indices]
+        )
+
+    def lifetime_energy(
+        self,
         tz_str: str,
         lat: float,
         lon: float,
         ele: float,
+        monthly_weather_factors: tuple[float],
+        year: int,
+        years: int = lifetime.LIFETIME_YEARS,
+        degradation_per_year: float = lifetime.DEGRADATION_PER_YEAR,
         freq_minutes: int = 60,
-    ) -> DaysOfInterest:
+        weather_file: str = None,
+    ) -> pd.DataFrame:
+        # annual energy [kWh] from year on, projected from the cached yields
+        # of the first year instead of simulating every year
+        indices = self.simulated_indices
+        e_kWh = simulation.monthly_energy_batch(
+            [self.panels[i] for i in indices],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            monthly_weather_factors=monthly_weather_factors,
+            year=year,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
+        )
+        return pd.DataFrame(
+            lifetime.project(e_kWh, year, years, degradation_per_year),
+            index=pd.RangeIndex(year, year + years, name="year"),
+            columns=[f"p_{i}" for i in indices],
+        )
 
-        tz = pytz.timezone(tz_str)
+    @metrics.timed("panels.yield_uncertainty")
+    def yield_uncertainty(
+        self,
+        tz_str: str,
+        lat: float,
+        lon: float,
+        ele: float,
+        monthly_weather_factors: tuple[float],
+        year: int,
+        scenarios: int = uncertainty.SCENARIOS,
+        seed: int = None,
+        freq_minutes: int = 60,
+        weather_file: str = None,
+    ) -> pd.Series:
+        # annual energy [kWh] of all simulated panels exceeded with 50 %,
+        # 90 %, ... probability, the scenarios reuse the cached clear sky yields
+        indices = self.simulated_indices
+        e_kWh = simulation.monthly_energy_batch(
+            [self.panels[i] for i in indices],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            monthly_weather_factors=np.ones(12),
+            year=year,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
+        )
+        weather, module = uncertainty.sample(monthly_weather_factors, scenarios, seed)
+        annual_kWh = uncertainty.annual_energy(e_kWh.sum(axis=1), weather, module)
+        return uncertainty.exceedance(annual_kWh)
 
-        starttime = datetime(
+    @metrics.timed("panels.annual_power")
+    def annual_power(
+        self,
+        tz_str: str,
+        lat: float,
+        lon: float,
+        ele: float,
+        monthly_weather_factors: tuple[float],
+        year: int,
+        freq_minutes: int = 60,
+        weather_file: str = None,
+    ) -> pd.Series:
+        # total dc power [W] of the simulated panels over the year
+        panels = [self.panels[i] for i in self.simulated_indices]
+        times, dc_W = simulation.year_dc_power_sums(
+            panels,
+            [list(range(len(panels)))],
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
             year=year,
-            month=1,
-            day=1,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
         )
-        endtime = datetime(
-            year=year + 1,
-            month=1,
-            day=1,
+        weather = simulation.weather_factors(monthly_weather_factors, times)
+        return pd.Series(dc_W[:, 0] * weather, index=times, name="pv_W")
+
+    @metrics.timed("panels.inverter_sweep")
+    def inverter_sweep(
+        self,
+        tz_str: str,
+        lat: float,
+        lon: float,
+        ele: float,
+        monthly_weather_factors: tuple[float],
+        year: int,
+        ratios=inverter.DC_AC_RATIOS,
+        freq_minutes: int = 60,
+        weather_file: str = None,
+    ) -> pd.DataFrame:
+        # ac yield of the simulated panels per dc/ac ratio of their inverters;
+        # the dc profile is simulated once and every ratio reuses it
+        panels = [self.panels[i] for i in self.simulated_indices]
+        members = list(inverter.groups(panels).values())
+        times, dc_W = simulation.year_dc_power_sums(
+            panels,
+            members,
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            year=year,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
         )
+        dc_W *= simulation.weather_factors(monthly_weather_factors, times)[:, None]
+        pdc0_W = [sum(panels[n].pdc0_W for n in m) for m in members]
+        return inverter.sweep(dc_W, pdc0_W, ratios, freq_minutes / 60)
+
+    @metrics.timed("panels.get_days_of_interest")
+    def get_days_of_interest(
+        self,
+        year: int,
+        tz_str: str,
+        lat: float,
+        lon: float,
+        ele: float,
+        freq_minutes: int = 60,
+        weather_file: str = None,
+    ) -> DaysOfInterest:
+        indices = self.simulated_indices
+        if len(indices) == 0:
+            raise PreventUpdate
 
-        times = pd.date_range(
-            f"{starttime:%Y-%m-%d %H:%M}",
-            f"{endtime:%Y-%m-%d %H:%M}",
-            freq=f"{freq_minutes}min",
-            tz=tz,
-        )[:-1]
-
-        panel_powers = []
-        for p in self.panels:
-            if p.active and p.ready:
-                panel_powers.append(
-                    p.dc_power(tz_str=tz_str, lat=lat, lon=lon, ele=ele, times=times)
+        panels = [self.panels[i] for i in indices]
+        return days_of_interest(
+            tuple(
+                (
+                    p.altitude_deg,
+                    p.azimuth_deg,
+                    p.pdc0_W,
+                    p.mount,
+                    simulation.horizon_key(p),
                 )
+                for p in panels
+            ),
+            year=year,
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            freq_minutes=freq_minutes,
+            weather_file=weather_file,
+        )
 
-        if len(panel_powers) == 0:
-            raise PreventUpdate
 
-        pwr = np.zeros_like(panel_powers[0])
-        for pp in panel_powers:
-            pwr += pp
+@lru_cache(maxsize=DAYS_CACHE_SIZE)
+def days_of_interest(
+    orientations: tuple,
+    year: int,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> DaysOfInterest:
+    # orientations are (tilt, azimuth, pdc0, mount, horizon) of the panels,
+    # the result is shared and must not be modified; concurrent misses of
+    # the prefetch and the ui compute it once
+    key = (orientations, year, tz_str, lat, lon, ele, freq_minutes, weather_file)
+    return singleflight.do("days_of_interest", key, partial(_days_of_interest, *key))
+
+
+def _days_of_interest(
+    orientations: tuple,
+    year: int,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    freq_minutes: int,
+    weather_file: str,
+) -> DaysOfInterest:
+    starttime = datetime(
+        year=year,
+        month=1,
+        day=1,
+    )
+    sky = simulation.year_sky_conditions(
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        year=year,
+        freq_minutes=freq_minutes,
+        weather_file=weather_file,
+    )
+    tilt, azi, pdc0, mount, horizons = zip(*orientations)
+    times = sky.index
+    pwr = np.concatenate(
+        [
+            simulation.orientations_dc_power(
+                sky.iloc[part], tilt, azi, pdc0, mount, horizons
+            ).sum(axis=1)
+            for part in simulation.time_slices(
+                len(sky), len(tilt), simulation.POWER_CHUNK_VALUES
+            )
+        ]
+    )
+
+    df_times = pd.DataFrame(
+        dict(pwr=pwr, day=[t.day_of_year for t in times]), index=times
+    )
+
+    pwr_mean_W = df_times.groupby("day").mean().pwr.values
+    pwr_max_W = df_times.groupby("day").max().pwr.values
+    pwr_count_h = df_times.groupby("day").count().pwr.values * freq_minutes / 60
+    e_kWh = pwr_mean_W * pwr_count_h / 1000
+
+    day_in_year_pmin = int(np.argmin(pwr_max_W))
+    day_in_year_pmax = int(np.argmax(pwr_max_W))
+    day_in_year_emin = int(np.argmin(e_kWh))
+    day_in_year_emax = int(np.argmax(e_kWh))
+
+    return DaysOfInterest(
+        day_Pmin=starttime + timedelta(days=day_in_year_pmin),
+        day_Pmax=starttime + timedelta(days=day_in_year_pmax),
+        day_Emin=starttime + timedelta(days=day_in_year_emin),
+        day_Emax=starttime + timedelta(days=day_in_year_emax),
+    )
+
+
+def optimal_azimuth(
+    geolocation: Geolocation, tilt: float, monthly_weather_factors: list[float]
+) -> float:
+    # azimuth with the maximum annual yield for a fixed tilt, interpolated
+    # on the opti angle matrix of the geolocation
+    (x, y, z) = geolocation.get_opti_matrix(monthly_weather_factors)
+    f_2d = interp2d(x, y, z.T, kind="cubic")
+
+    def f_opt(azi):
+        return -f_2d(azi, tilt)[0]
+
+    result = minimize(fun=f_opt, x0=180.0, bounds=[(0, 360)])
+    return float(result.x[0])
 
-        df_times = pd.DataFrame(
-            dict(pwr=pwr, day=[t.day_of_year for t in times]), index=times
+
+def optimal_tilt(
+    geolocation: Geolocation, azi: float, monthly_weather_factors: list[float]
+) -> float:
+    # tilt with the maximum annual yield for a fixed azimuth
+    (x, y, z) = geolocation.get_opti_matrix(monthly_weather_factors)
+    f_2d = interp2d(x, y, z.T, kind="cubic")
+
+    def f_opt(tilt):
+        return -f_2d(azi, tilt)[0]
+
+    result = minimize(fun=f_opt, x0=45.0, bounds=[(0, 90)])
+    return float(result.x[0])
+
+
+def import_panels(
+    contents: str, filename: str, geolocation_data: dict, weather: list
+) -> tuple:
+    try:
+        df = panel_io.read_panel_file(contents, filename)
+        df, errors = panel_io.validate_panel_frame(df)
+    except (ValueError, UnicodeDecodeError) as e:
+        return no_update, f"Import of {filename} failed: {e}", "danger", True
+
+    if len(errors) > 0:
+        return (
+            no_update,
+            [html.P(f"Import of {filename} failed:")]
+            + [html.Div(e, className="small") for e in errors],
+            "danger",
+            True,
         )
 
-        pwr_mean_W = df_times.groupby("day").mean().pwr.values
-        pwr_max_W = df_times.groupby("day").max().pwr.values
-        pwr_count_h = df_times.groupby("day").count().pwr.values * freq_minutes / 60
-        e_kWh = pwr_mean_W * pwr_count_h / 1000
-
-        day_in_year_pmin = int(np.argmin(pwr_max_W))
-        day_in_year_pmax = int(np.argmax(pwr_max_W))
-        day_in_year_emin = int(np.argmin(e_kWh))
-        day_in_year_emax = int(np.argmax(e_kWh))
-
-        return DaysOfInterest(
-            day_Pmin=starttime + timedelta(days=day_in_year_pmin),
-            day_Pmax=starttime + timedelta(days=day_in_year_pmax),
-            day_Emin=starttime + timedelta(days=day_in_year_emin),
-            day_Emax=starttime + timedelta(days=day_in_year_emax),
+    allpanels = AllPanels.construct(panels=panel_io.panels_from_frame(df))
+    message = f"Imported {len(allpanels.panels)} panels from {filename}"
+
+    geolocation = Geolocation(**(geolocation_data or {}))
+    if geolocation.ready and len(allpanels.simulated_indices) > 0:
+        shaded = allpanels.shaded_by(geolocation.horizon_deg)
+        monthly_weather_factors = [1.0] * 12
+        if isinstance(weather, list):
+            if len(weather) == 12:
+                monthly_weather_factors = weather
+        df_energy = shaded.monthly_energy(
+            tz_str=geolocation.tz_str,
+            lat=geolocation.lat,
+            lon=geolocation.lon,
+            ele=geolocation.ele,
+            monthly_weather_factors=monthly_weather_factors,
+            year=date.today().year,
         )
+        message += f", estimated annual yield {df_energy.values.sum():.0f} kWh"
+
+    return allpanels.dict(), message, "success", True
 
 
 def render(app: Dash) -> html.Div:
@@ -119,14 +415,7 @@ def render(app: Dash) -> html.Div:
         if isinstance(weather, list):
             if len(weather) == 12:
                 monthly_weather_factors = weather
-        (x, y, z) = geolocation.get_opti_matrix(monthly_weather_factors)
-        f_2d = interp2d(x, y, z.T, kind="cubic")
-
-        def f_opt(azi):
-            return -f_2d(azi, tilt)[0]
-
-        result = minimize(fun=f_opt, x0=180.0, bounds=[(0, 360)])
-        return round(result.x[0])
+        return round(optimal_azimuth(geolocation, tilt, monthly_weather_factors))
 
     @app.callback(
         Output({"type": ids.INPUT_PANEL_ALT, "index": MATCH}, "value"),
@@ -146,79 +435,156 @@ def render(app: Dash) -> html.Div:
         if isinstance(weather, list):
             if len(weather) == 12:
                 monthly_weather_factors = weather
-        (x, y, z) = geolocation.get_opti_matrix(monthly_weather_factors)
-        f_2d = interp2d(x, y, z.T, kind="cubic")
+        return round(optimal_tilt(geolocation, azi, monthly_weather_factors))
 
-        def f_opt(tilt):
-            return -f_2d(azi, tilt)[0]
-
-        result = minimize(fun=f_opt, x0=45.0, bounds=[(0, 90)])
-        return round(result.x[0])
+    @app.callback(
+        Output(ids.STORE_PANELS, "data", allow_duplicate=True),
+        Output(ids.STORE_PANELS_RESET, "data"),
+        Output(ids.ALERT_PANEL_IMPORT, "children"),
+        Output(ids.ALERT_PANEL_IMPORT, "color"),
+        Output(ids.ALERT_PANEL_IMPORT, "is_open"),
+        State(ids.UPLOAD_PANELS, "filename"),
+        State(ids.STORE_GEOLOCATION, "data"),
+        State(ids.STORE_WEATHER, "data"),
+        Input(ids.BTN_CLEAR_PANELS, "n_clicks"),
+        Input(ids.UPLOAD_PANELS, "contents"),
+        prevent_initial_call=True,
+    )
+    def replace_panels(
+        upload_filename: str,
+        geolocation_data: dict,
+        weather: list,
+        clear_nclicks: int,
+        upload_contents: str,
+    ):
+        # replaces the whole panel list, the cards are re-rendered afterwards
+        ctx = dash.callback_context
+        trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
+        if trigger_id == ids.BTN_CLEAR_PANELS:
+            return {}, time.time(), no_update, no_update, no_update
+        elif trigger_id == ids.UPLOAD_PANELS:
+            if upload_contents is None:
+                raise PreventUpdate
+            data, *alert = import_panels(
+                upload_contents, upload_filename, geolocation_data, weather
+            )
+            if data is no_update:
+                return (no_update, no_update, *alert)
+            return (data, time.time(), *alert)
+        raise PreventUpdate
 
     @app.callback(
-        Output(ids.STORE_PANELS, "data"),
-        State(ids.STORE_PANELS, "data"),
+        Output(ids.DIV_PANEL_LIST, "children", allow_duplicate=True),
         Input(ids.BTN_ADD_PANEL, "n_clicks"),
-        Input(ids.BTN_CLEAR_PANELS, "n_clicks"),
-        Input({"type": ids.CHECKBOX_PANEL_ACTIVE, "index": ALL}, "value"),
-        Input({"type": ids.BTN_DELETE_PANEL, "index": ALL}, "n_clicks"),
-        Input({"type": ids.INPUT_PANEL_LABEL, "index": ALL}, "value"),
-        Input({"type": ids.INPUT_PANEL_AZI, "index": ALL}, "value"),
-        Input({"type": ids.INPUT_PANEL_ALT, "index": ALL}, "value"),
-        Input({"type": ids.INPUT_PANEL_SIZE, "index": ALL}, "value"),
-        Input({"type": ids.INPUT_PANEL_COLOR, "index": ALL}, "value"),
-        Input({"type": ids.INPUT_PANEL_SPECPWR, "index": ALL}, "value"),
         prevent_initial_call=True,
     )
-    def modify_panels(
+    def add_panel(add_nclicks: int):
+        # appends a single card, the card's store is synced into STORE_PANELS
+        children = Patch()
+        children.append(Panel().render_as_card(app, uuid.uuid4().hex))
+        return children
+
+    @app.callback(
+        Output({"type": ids.STORE_PANEL, "index": MATCH}, "data"),
+        Output({"type": ids.CARD_PANEL, "index": MATCH}, "color"),
+        Output({"type": ids.CARD_PANEL, "index": MATCH}, "style"),
+        State({"type": ids.STORE_PANEL, "index": MATCH}, "data"),
+        Input({"type": ids.CHECKBOX_PANEL_ACTIVE, "index": MATCH}, "value"),
+        Input({"type": ids.BTN_DELETE_PANEL, "index": MATCH}, "n_clicks"),
+        Input({"type": ids.INPUT_PANEL_LABEL, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_AZI, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_ALT, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_SIZE, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_COLOR, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_SPECPWR, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_MOUNT, "index": MATCH}, "value"),
+        Input({"type": ids.INPUT_PANEL_INVERTER, "index": MATCH}, "value"),
+        prevent_initial_call=True,
+    )
+    def modify_panel(
         data: dict,
-        add_nclicks: int,
-        clear_nclicks: int,
-        active_values,
+        active_value,
         delete_panel_nclicks: int,
-        label_values,
-        azi_values,
-        alt_values,
-        size_values,
-        color_values,
-        pdc0_values,
+        label_value,
+        azi_value,
+        alt_value,
+        size_value,
+        color_value,
+        pdc0_value,
+        mount_value,
+        inverter_value,
     ):
+        # only the values of the edited card travel to the server and back
+        if data is None:
+            raise PreventUpdate
         ctx = dash.callback_context
-        trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
+        if ctx.triggered_id["type"] == ids.BTN_DELETE_PANEL:
+            if delete_panel_nclicks is None:
+                raise PreventUpdate
+            return None, no_update, {"display": "none"}
+
+        panel = Panel(
+            **{
+                **data,
+                **dict(
+                    active=active_value,
+                    label=label_value,
+                    azimuth_deg=azi_value,
+                    altitude_deg=alt_value,
+                    size_m2=size_value,
+                    color=color_value,
+                    pdc0_Wpm2=pdc0_value,
+                    mount=mount_value,
+                    inverter=(inverter_value or "").strip() or None,
+                ),
+            }
+        )
+        return panel.dict(), panel.color, no_update
+
+    app.clientside_callback(
+        """
+        function(panels, data) {
+            if (panels.length === 0) {
+                return window.dash_clientside.no_update;
+            }
+            const synced = {panels: panels.filter((p) => p !== null)};
+            if (JSON.stringify(synced) === JSON.stringify(data)) {
+                return window.dash_clientside.no_update;
+            }
+            return synced;
+        }
+        """,
+        Output(ids.STORE_PANELS, "data"),
+        Input({"type": ids.STORE_PANEL, "index": ALL}, "data"),
+        State(ids.STORE_PANELS, "data"),
+    )
+
+    @app.callback(
+        Output(ids.DOWNLOAD_PANELS, "data"),
+        State(ids.STORE_PANELS, "data"),
+        Input(ids.BTN_EXPORT_PANELS_CSV, "n_clicks"),
+        Input(ids.BTN_EXPORT_PANELS_JSON, "n_clicks"),
+        prevent_initial_call=True,
+    )
+    def download_panels(data: dict, csv_nclicks: int, json_nclicks: int):
         if data == None:
             data = {}
         allpanels = AllPanels(**data)
-        if trigger_id == ids.BTN_ADD_PANEL:
-            allpanels.panels.append(Panel())
-            return allpanels.dict()
-        elif trigger_id == ids.BTN_CLEAR_PANELS:
-            return {}
-        else:
-            trigger = json.loads(trigger_id)
-            if "index" in trigger:
-                i = trigger["index"]
-            if "type" in trigger:
-                if trigger["type"] == ids.BTN_DELETE_PANEL:
-                    if delete_panel_nclicks[i] is not None:
-                        allpanels.panels.pop(i)
-                else:
-                    allpanels.panels[i].active = active_values[i]
-                    allpanels.panels[i].label = label_values[i]
-                    allpanels.panels[i].azimuth_deg = azi_values[i]
-                    allpanels.panels[i].altitude_deg = alt_values[i]
-                    allpanels.panels[i].size_m2 = size_values[i]
-                    allpanels.panels[i].color = color_values[i]
-                    allpanels.panels[i].pdc0_Wpm2 = pdc0_values[i]
-
-                return allpanels.dict()
-
-            raise PreventUpdate
+        ctx = dash.callback_context
+        trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
+        fmt = "json" if trigger_id == ids.BTN_EXPORT_PANELS_JSON else "csv"
+        return dict(
+            content=panel_io.export_panels(allpanels.panels, fmt=fmt),
+            filename=f"panels.{fmt}",
+        )
 
     @app.callback(
         Output(ids.DIV_PANEL_LIST, "children"),
-        Input(ids.STORE_PANELS, "data"),
+        Input(ids.STORE_PANELS_RESET, "data"),
+        State(ids.STORE_PANELS, "data"),
     )
-    def render_panels(data: dict):
+    def render_panels(reset, data: dict):
+        # full render only on page load, clear and import
         if data == None:
             data = {}
         allpanels = AllPanels(**data)
@@ -228,6 +594,7 @@ def render(app: Dash) -> html.Div:
     return html.Div(
         [
             dcc.Store(id=ids.STORE_PANELS, storage_type="local"),
+            dcc.Store(id=ids.STORE_PANELS_RESET),
             html.H4([html.I(className="bi bi-microsoft me-2"), "Photovoltaic Panels"]),
             dbc.Row(
                 dbc.Col(
@@ -248,9 +615,45 @@ def render(app: Dash) -> html.Div:
                             className="m-1",
                             id=ids.BTN_CLEAR_PANELS,
                         ),
+                        dcc.Upload(
+                            dbc.Button(
+                                [
+                                    html.I(className="bi bi-upload me-2"),
+                                    "Import",
+                                ],
+                                className="m-1",
+                            ),
+                            id=ids.UPLOAD_PANELS,
+                            accept=".csv,.json",
+                            style={"display": "inline-block"},
+                        ),
+                        dbc.Tooltip(
+                            "Replace all panels by a CSV or JSON file with the columns "
+                            + ", ".join(panel_io.PANEL_COLUMNS),
+                            target=ids.UPLOAD_PANELS,
+                        ),
+                        dbc.DropdownMenu(
+                            [
+                                dbc.DropdownMenuItem(
+                                    "CSV", id=ids.BTN_EXPORT_PANELS_CSV
+                                ),
+                                dbc.DropdownMenuItem(
+                                    "JSON", id=ids.BTN_EXPORT_PANELS_JSON
+                                ),
+                            ],
+                            label="Export",
+                            className="m-1 d-inline-block",
+                        ),
+                        dcc.Download(id=ids.DOWNLOAD_PANELS),
                     ]
                 )
             ),
+            dbc.Alert(
+                id=ids.ALERT_PANEL_IMPORT,
+                is_open=False,
+                dismissable=True,
+                className="m-1",
+            ),
             html.Div(["Panels go here..."], id=ids.DIV_PANEL_LIST),
         ]
     )
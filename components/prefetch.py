@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from . import simulation, metrics
+from .location import Geolocation
+from .panels import AllPanels
+
+# after the location or the panels changed, the results of the other tabs
+# (annual yields, days of interest for the date buttons) are computed in a
+# background thread once no new change arrived for PREFETCH_DELAY_S;
+# the thread uses at most PV_PREFETCH_CPU_SHARE of one core, 0 disables it
+CPU_SHARE_ENV = "PV_PREFETCH_CPU_SHARE"
+DEFAULT_CPU_SHARE = 0.25
+PREFETCH_DELAY_S = 1.0
+MAX_PENDING = 4  # locations, older requests are dropped
+MAX_PANELS = 500  # larger designs are left to the requests themselves
+ANNUAL_FREQ_MINUTES = 60  # as render_graph
+DAYS_FREQ_MINUTES = 30  # as the date buttons
+
+logger = logging.getLogger("pv.prefetch")
+
+_cond = threading.Condition()
+_pending = OrderedDict()  # key -> (geolocation, allpanels, year)
+_last_scheduled = 0.0
+_worker = None
+
+
+def _cpu_share() -> float:
+    try:
+        return float(os.environ.get(CPU_SHARE_ENV, DEFAULT_CPU_SHARE))
+    except ValueError:
+        return DEFAULT_CPU_SHARE
+
+
+def schedule(geolocation: Geolocation, allpanels: AllPanels, year: int):
+    global _last_scheduled, _worker
+    if _cpu_share() <= 0:
+        return
+    indices = allpanels.simulated_indices
+    if not geolocation.ready or len(indices) == 0 or len(indices) > MAX_PANELS:
+        return
+
+    key = (
+        geolocation.tz_str,
+        geolocation.lat,
+        geolocation.lon,
+        geolocation.ele,
+        year,
+        tuple(
+            (
+                p.altitude_deg,
+                p.azimuth_deg,
+                p.pdc0_W,
+                p.mount,
+                simulation.horizon_key(p),
+            )
+            for p in (allpanels.panels[i] for i in indices)
+        ),
+    )
+    with _cond:
+        # an earlier design at the same location is most likely the same
+        # user a few edits ago
+        for superseded in [k for k in _pending if k[:5] == key[:5]]:
+            del _pending[superseded]
+        _pending[key] = (geolocation, allpanels, year)
+        while len(_pending) > MAX_PENDING:
+            _pending.popitem(last=False)
+        _last_scheduled = time.monotonic()
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="pv-prefetch", daemon=True)
+            _worker.start()
+        _cond.notify()
+
+
+def _next() -> tuple:
+    # the newest request, once the changes settled
+    with _cond:
+        while True:
+            quiet = time.monotonic() - _last_scheduled
+            if len(_pending) > 0 and quiet >= PREFETCH_DELAY_S:
+                return _pending.popitem(last=True)[1]
+            _cond.wait(PREFETCH_DELAY_S - quiet if len(_pending) > 0 else None)
+
+
+def _tasks(geolocation: Geolocation, allpanels: AllPanels, year: int) -> list:
+    loc = dict(
+        tz_str=geolocation.tz_str,
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+    )
+    panels = [allpanels.panels[i] for i in allpanels.simulated_indices]
+    return [
+        (
+            "monthly_yields",
+            lambda: simulation.monthly_yields(
+                panels, year=year, freq_minutes=ANNUAL_FREQ_MINUTES, **loc
+            ),
+        ),
+        (
+            "days_of_interest",
+            lambda: allpanels.get_days_of_interest(
+                year=year, freq_minutes=DAYS_FREQ_MINUTES, **loc
+            ),
+        ),
+    ]
+
+
+def _run():
+    while True:
+        job = _next()
+        for name, task in _tasks(*job):
+            cpu = time.thread_time()
+            try:
+                with metrics.span(f"prefetch:{name}"):
+                    task()
+            except Exception:
+                logger.exception("prefetch of %s failed", name)
+            # duty cycle: sleeping share^-1 - 1 times the cpu time used keeps
+            # the average load of this thread below the share of one core
+            share = min(_cpu_share(), 1.0)
+            if share > 0:
+                time.sleep((time.thread_time() - cpu) * (1 / share - 1))
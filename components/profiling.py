@@ -0,0 +1,155 @@
+import argparse
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+
+import flask
+from dash import Dash
+
+# opt-in profiling of dash callbacks, nothing is recorded unless
+# PV_PROFILE_DIR is set:
+#   PV_PROFILE_DIR=profiles PV_PROFILE=render_graph,update_geostore gunicorn app:server
+# profiles every call of the listed callbacks ("*" for all), a request with
+# the header "X-PV-Profile: 1" is profiled regardless of PV_PROFILE;
+# PV_PROFILER=pyinstrument uses the sampling profiler if it is installed;
+# PV_RECORD_FILE=payloads.jsonl appends every callback request to the file,
+# e.g. for python -m benchmarks.load_test run --payloads payloads.jsonl
+DIR_ENV = "PV_PROFILE_DIR"
+RECORD_ENV = "PV_RECORD_FILE"
+CALLBACKS_ENV = "PV_PROFILE"
+PROFILER_ENV = "PV_PROFILER"
+PROFILE_HEADER = "X-PV-Profile"
+UPDATE_PATH = "/_dash-update-component"
+STATS_LINES = 30
+
+_record_lock = threading.Lock()
+
+
+def _enabled(name: str) -> bool:
+    if os.environ.get(DIR_ENV, "") == "":
+        return False
+    if flask.request.headers.get(PROFILE_HEADER, "") not in ("", "0"):
+        return True
+    selected = [n.strip() for n in os.environ.get(CALLBACKS_ENV, "").split(",")]
+    return "*" in selected or name in selected
+
+
+def _write(name: str, profiler, seconds: float) -> str:
+    # the profile plus the request payload, which can be replayed with
+    # python -m components.profiling replay <file>.json
+    directory = os.environ[DIR_ENV]
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(
+        directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(seconds * 1000)}ms"
+    )
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(base + ".prof")
+    else:
+        with open(base + ".html", "w") as f:
+            f.write(profiler.output_html())
+    with open(base + ".json", "w") as f:
+        json.dump(
+            dict(
+                callback=name,
+                seconds=seconds,
+                path=flask.request.path,
+                payload=flask.request.get_json(silent=True),
+            ),
+            f,
+        )
+    return base
+
+
+def _profiler():
+    if os.environ.get(PROFILER_ENV, "") == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+
+            return Profiler()
+        except ImportError:
+            pass
+    return cProfile.Profile()
+
+
+def _profiled(name: str, dispatch):
+    @functools.wraps(dispatch)
+    def wrapper(*args, **kwargs):
+        if not _enabled(name):
+            return dispatch(*args, **kwargs)
+        profiler = _profiler()
+        start = time.perf_counter()
+        if isinstance(profiler, cProfile.Profile):
+            profiler.enable()
+        else:
+            profiler.start()
+        try:
+            return dispatch(*args, **kwargs)
+        finally:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            _write(name, profiler, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _record(response: flask.Response) -> flask.Response:
+    if flask.request.path == UPDATE_PATH:
+        payload = flask.request.get_json(silent=True)
+        line = json.dumps(dict(payload=payload, status=response.status_code))
+        with _record_lock:
+            with open(os.environ[RECORD_ENV], "a") as f:
+                f.write(line + "\n")
+    return response
+
+
+def instrument(app: Dash):
+    # wraps the callbacks registered so far, call after the layout is set
+    for entry in app.callback_map.values():
+        if "callback" in entry:
+            name = entry["callback"].__name__
+            entry["callback"] = _profiled(name, entry["callback"])
+    if os.environ.get(RECORD_ENV, "") != "":
+        app.server.after_request(_record)
+
+
+def replay(path: str, app: Dash):
+    # posts a recorded payload again and prints the profile
+    with open(path) as f:
+        recorded = json.load(f)
+    client = app.server.test_client()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    response = client.post(recorded.get("path", UPDATE_PATH), json=recorded["payload"])
+    profiler.disable()
+    print(f"{recorded['callback']}: status {response.status_code}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(STATS_LINES)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="inspect recorded callback profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="print a recorded .prof file")
+    show.add_argument("path")
+    show.add_argument("--sort", default="cumulative")
+    rerun = sub.add_parser("replay", help="run a recorded .json payload again")
+    rerun.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        pstats.Stats(args.path).sort_stats(args.sort).print_stats(STATS_LINES)
+    else:
+        from app import app
+
+        replay(args.path, app)
+
+
+if __name__ == "__main__":
+    # python -m components.profiling show profiles/<file>.prof
+    # python -m components.profiling replay profiles/<file>.json
+    main()
@@ -1,19 +1,35 @@
-from dash import Dash, html, dcc, Input, Output
+import dash
+from dash import Dash, html, dcc, dash_table, Input, Output
+from dash.exceptions import PreventUpdate
+from dash.dash_table.Format import Format, Scheme
 import dash_bootstrap_components as dbc
 
-from . import ids
+from . import (
+    ids,
+    simulation,
+    figures,
+    api,
+    metrics,
+    prefetch,
+    inverter,
+    lifetime,
+    uncertainty,
+)
 from .panels import AllPanels
 from .geolocation import Geolocation
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import json
 import pytz
 from datetime import date, datetime
 
 import numpy as np
 from scipy.interpolate import interp2d
 import pandas as pd
-from scipy.integrate import cumtrapz
+
+ANNUAL_TABLE_PAGE_SIZE = 50
+ANNUAL_TABLE_CELL_WIDTH = 70  # px, the panel and the total table line up
+ANNUAL_TABLE_LABEL_WIDTH = 160
+UNCERTAINTY_SEED = 0  # the same scenarios on every render
 
 
 def create_day_figure(
@@ -21,117 +37,30 @@ def create_day_figure(
     allpanels: AllPanels,
     thedate: date,
     freq_minutes: int = 30,
-) -> go.Figure:
-    tz = pytz.timezone(geolocation.tz_str)
-
-    starttime = datetime(
-        year=thedate.year,
-        month=thedate.month,
-        day=thedate.day,
-        hour=0,
-        minute=0,
-        second=0,
-    )
-    endtime = datetime(
-        year=thedate.year,
-        month=thedate.month,
-        day=thedate.day,
-        hour=23,
-        minute=59,
-        second=59,
-    )
-
-    times = pd.date_range(
-        f"{starttime:%Y-%m-%d %H:%M}",
-        f"{endtime:%Y-%m-%d %H:%M}",
-        freq=f"{freq_minutes}min",
-        tz=tz,
+) -> dict:
+    times = simulation.day_times(
+        thedate, tz_str=geolocation.tz_str, freq_minutes=freq_minutes
     )
 
-    dc_powers_W = [
-        p.dc_power(
-            tz_str=geolocation.tz_str,
-            lat=geolocation.lat,
-            lon=geolocation.lon,
-            ele=geolocation.ele,
-            times=times,
-        )
-        if p.active and p.ready
-        else None
-        for p in allpanels.panels
-    ]
-
-    # fig = go.Figure()
-    fig = make_subplots(
-        rows=1,
-        cols=1,
-        # subplot_titles=["Max Yield Day", "Energy over the Year"],
-        # vertical_spacing=0.06,
-        specs=[[{"secondary_y": True}]],
+    indices = allpanels.simulated_indices
+    pwr = simulation.dc_power_batch(
+        [allpanels.panels[i] for i in indices],
+        tz_str=geolocation.tz_str,
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+        times=times,
     )
-    pwr_sum_W = np.zeros_like(dc_powers_W[0])
-    e_sum_kWh = np.zeros_like(dc_powers_W[0])
-    for i, p in enumerate(allpanels.panels):
-        if p.active:
-            energy_kWh = (
-                cumtrapz(dc_powers_W[i], initial=dc_powers_W[i][0] / 1000)
-                / 1000
-                * freq_minutes
-                / 60
-            )
-            pwr_sum_W = pwr_sum_W + dc_powers_W[i]
-            e_sum_kWh = e_sum_kWh + energy_kWh
-            label = (
-                p.label if (p.label is not None and p.label != "") else f"{i+1}.Panel"
-            )
-            fig.add_trace(
-                go.Scatter(
-                    x=times,
-                    y=dc_powers_W[i],
-                    name=f"Pwr {label} [W]",
-                    hovertemplate="%{y:.1f}%{_xother}",
-                    line=dict(width=3, color=p.color),
-                )
-            )
-            fig.add_trace(
-                go.Scatter(
-                    x=times,
-                    y=energy_kWh,
-                    name=f"Energy {label} [kWh]",
-                    hovertemplate="%{y:.2f}%{_xother}",
-                    line=dict(width=3, dash="dot", color=p.color),
-                ),
-                secondary_y=True,
-            )
-
-    fig.add_trace(
-        go.Scatter(
-            x=times,
-            y=pwr_sum_W,
-            name="Pwr Sum [W]",
-            hovertemplate="%{y:.1f}%{_xother}",
-            line=dict(color="black", width=4),
-        )
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=times,
-            y=e_sum_kWh,
-            name="Energy Sum [kWh]",
-            hovertemplate="%{y:.2f}%{_xother}",
-            line=dict(color="black", width=4, dash="dot"),
-        ),
-        secondary_y=True,
-    )
-
-    fig.update_layout(
-        hovermode="x unified",
+    energies_kWh = simulation.cumulative_energy(pwr, freq_minutes)
+
+    return figures.day_figure(
+        times=times,
+        powers_W=pwr,
+        energies_kWh=energies_kWh,
+        labels=[allpanels.label(i) for i in indices],
+        colors=[allpanels.panels[i].color for i in indices],
         title=f"DC power and energy in one day ({thedate.day}.{thedate.month}.{thedate.year}) - best case (not considering weather)",
-        yaxis1=dict(title="Power [W]"),
-        yaxis2=dict(title="Energy [kWh]"),
     )
-    style_figure(fig=fig)
-    return fig
 
 
 def create_annual_figure(
@@ -140,171 +69,255 @@ def create_annual_figure(
     thedate: date,
     monthly_weather_factors: tuple[float],
     freq_minutes: int = 60,
-) -> tuple[go.Figure, pd.DataFrame]:
+) -> tuple[dict, pd.DataFrame]:
     tz = pytz.timezone(geolocation.tz_str)
 
-    panel_energy_dfs = [
-        p.monthly_energy(
-            tz_str=geolocation.tz_str,
-            lat=geolocation.lat,
-            lon=geolocation.lon,
-            ele=geolocation.ele,
-            monthly_weather_factors=monthly_weather_factors,
-            year=thedate.year,
-            label=f"p_{i}",
-        )
-        if p.active and p.ready
-        else None
-        for i, p in enumerate(allpanels.panels)
-    ]
-
-    result = pd.concat(panel_energy_dfs, axis=1)
-
-    fig = go.Figure()
-    for col in result.columns:
-        i = int(col.split("_")[1])
-        p = allpanels.panels[i]
-        label = p.label if (p.label is not None and p.label != "") else f"{i+1}.Panel"
-        fig.add_trace(
-            go.Bar(
-                name=f"{label}",  # ({result[col].sum():.1f} kWh/Y)",
-                x=result.index,
-                y=result[col],
-                hovertemplate="%{x}: %{y:.1f} kWh",  #%{_xother}",
-                # hovertemplate="%{y:.1f} kWh%{_xother}",
-                marker_color=p.color,
-            )
-        )
-        result.rename(columns={f"p_{i}": label}, inplace=True)
-
-    fig.add_trace(
-        go.Bar(
-            name=f"<b>total",  # ({result.sum().sum():.1f} kWh/Y)</b>",
-            x=result.index,
-            y=result.sum(axis=1),
-            hovertemplate="%{x}: %{y:.1f} kWh",  #%{_xother}",
-            # hovertemplate="%{y:.1f} kWh%{_xother}",
-            marker_color="black",
-        )
+    result = allpanels.monthly_energy(
+        tz_str=geolocation.tz_str,
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+        monthly_weather_factors=monthly_weather_factors,
+        year=thedate.year,
+        freq_minutes=freq_minutes,
     )
 
-    fig.update_layout(
-        # barmode='stack',
-        barmode="group",
-        # margin=dict(l=10, r=10, t=50, b=5),
+    indices = [int(col.split("_")[1]) for col in result.columns]
+    labels = [allpanels.label(i) for i in indices]
+    fig = figures.annual_figure(
+        months=list(result.index),
+        energies_kWh=result.values,
+        labels=labels,
+        colors=[allpanels.panels[i].color for i in indices],
         title=f"Monthly energy yields within one year ({thedate.year})",
-        yaxis_title="Energy [kWh]",
     )
-    style_figure(fig=fig)
-    # fig.update_layout(margin=dict(l=100, r=115, t=50, b=5))
+    result.columns = labels
 
     return fig, result
 
 
-def style_figure(fig: go.Figure):
-    fig.update_xaxes(
-        showgrid=True,
-        gridwidth=1,
-        gridcolor="DarkGrey",
-        zeroline=True,
-        zerolinewidth=2,
-        zerolinecolor="black",
-    )
-    fig.update_yaxes(
-        showgrid=True,
-        gridwidth=1,
-        gridcolor="DarkGrey",
-        zeroline=True,
-        zerolinewidth=2,
-        zerolinecolor="black",
-    )
-    fig.update_layout(
-        margin=dict(l=5, r=5, t=50, b=5),
-        legend=dict(
-            x=0.0,
-            y=1.0,
-            bgcolor="rgba(255, 255, 255, 0.9)",
-            bordercolor="rgba(255, 255, 255, 1)",
-        ),
-    )
-
-
 def create_optimal_contour_figure(
     geolocation: Geolocation,
     thedate: date,
     monthly_weather_factors: list[float],
     allpanels: AllPanels,
     freq_minutes: int = 60,
-) -> go.Figure:
+) -> dict:
 
     (x, y, z) = geolocation.get_opti_matrix(
         monthly_weather_factors=monthly_weather_factors
     )
 
-    eff_min = np.min(np.min(z))
-
-    fig = go.Figure()
-    fig.add_trace(
-        go.Contour(
-            x=x,
-            y=y,
-            z=np.round(z.T, 2),
-            name="efficiency",
-            hovertemplate="azimuth: %{x}°<br>tilt: %{y}°<br>eff.: %{z}%<extra></extra>",
-            contours=dict(
-                coloring="heatmap",
-                showlabels=True,  # show labels on contours
-                labelfont=dict(  # label font properties
-                    size=16,
-                ),
-                start=np.floor(eff_min - (eff_min % 5)),
-                size=5,
-                end=100,
-            ),
-            colorbar=dict(
-                title="Efficiency [%]",  # title here
-                titlefont=dict(
-                    size=14,
-                ),
-            ),
-        )
-    )
     f = interp2d(
         x,
         y,
         z.T,
         kind="cubic",
     )
-    for i, p in enumerate(allpanels.panels):
-        label = p.label if (p.label is not None and p.label != "") else f"{i+1}.Panel"
-        eff = np.round(f(p.azimuth_deg, p.altitude_deg)[0], 2)
-        if p.active:
-            fig.add_trace(
-                go.Scatter(
-                    x=[p.azimuth_deg],
-                    y=[p.altitude_deg],
-                    name=label,
-                    # text=label,
-                    mode="markers",
-                    showlegend=False,
-                    marker_symbol="square-cross",
-                    hovertemplate=f"<b>{label}</b><br>azimuth: %{{x}}°<br>tilt: %{{y}}°<br>eff.:{eff}%<extra></extra>",
-                    marker=dict(
-                        size=30,  # p.size_m2,
-                        color=p.color,
-                        line=dict(width=2, color="DarkSlateGrey"),
-                    ),
-                )
+    markers = [
+        dict(
+            label=allpanels.label(i),
+            azimuth_deg=p.azimuth_deg,
+            altitude_deg=p.altitude_deg,
+            efficiency=np.round(f(p.azimuth_deg, p.altitude_deg)[0], 2),
+            color=p.color,
+        )
+        for i, p in enumerate(allpanels.panels)
+        if p.active and p.mount == "fixed"  # trackers have no fixed orientation
+    ]
+
+    return figures.contour_figure(
+        azimuths_deg=x, tilts_deg=y, efficiency=z.T, markers=markers
+    )
+
+
+def create_lifetime_figure(df_annual: pd.DataFrame, thedate: date) -> dict:
+    # projected from the monthly energies of the year tab, see lifetime.py
+    e_kWh = lifetime.project(df_annual.values, thedate.year)
+    return figures.lifetime_figure(
+        years=list(range(thedate.year, thedate.year + len(e_kWh))),
+        energies_kWh=e_kWh,
+        title=f"Lifetime yields with {lifetime.DEGRADATION_PER_YEAR:.1%} degradation "
+        "per year",
+    )
+
+
+def create_inverter_figure(
+    geolocation: Geolocation,
+    allpanels: AllPanels,
+    thedate: date,
+    monthly_weather_factors: list[float],
+    freq_minutes: int = 60,
+) -> dict:
+    df = allpanels.inverter_sweep(
+        tz_str=geolocation.tz_str,
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+        monthly_weather_factors=monthly_weather_factors,
+        year=thedate.year,
+        freq_minutes=freq_minutes,
+    )
+    simulated = [allpanels.panels[i] for i in allpanels.simulated_indices]
+    inverters = len(inverter.groups(simulated))
+    return figures.inverter_figure(
+        ratios=df.index.values,
+        ac_kWh=df["ac_kWh"].values,
+        clipping_loss=df["clipping_loss"].values,
+        title=f"AC yield vs. inverter size ({thedate.year}, {inverters} inverter(s))",
+    )
+
+
+@metrics.timed("result_graph.create_annual_table")
+def create_annual_table(df_annual: pd.DataFrame) -> html.Div:
+    # df_annual has months as rows and panels as columns; the total row is a
+    # table of its own below the paginated panels, so it stays on screen
+    values = df_annual.values.T
+    values = np.column_stack([values, values.sum(axis=1)])
+    totals = values.sum(axis=0, keepdims=True).round(1)
+    values = values.round(1)
+
+    columns = list(df_annual.index) + ["Total"]
+    df_table = pd.DataFrame(values, columns=columns)
+    df_table.insert(0, "Panel", list(df_annual.columns))
+    df_total = pd.DataFrame(totals, columns=columns)
+    df_total.insert(0, "Panel", ["Total"])
+
+    shared = dict(
+        columns=[dict(name="Panel", id="Panel")]
+        + [
+            dict(
+                name=c,
+                id=c,
+                type="numeric",
+                format=Format(precision=1, scheme=Scheme.fixed),
             )
+            for c in columns
+        ],
+        style_cell={
+            "minWidth": ANNUAL_TABLE_CELL_WIDTH,
+            "width": ANNUAL_TABLE_CELL_WIDTH,
+            "maxWidth": ANNUAL_TABLE_CELL_WIDTH,
+            "textAlign": "right",
+        },
+        style_cell_conditional=[
+            {
+                "if": {"column_id": "Panel"},
+                "textAlign": "left",
+                "minWidth": ANNUAL_TABLE_LABEL_WIDTH,
+                "width": ANNUAL_TABLE_LABEL_WIDTH,
+                "maxWidth": ANNUAL_TABLE_LABEL_WIDTH,
+                "overflow": "hidden",
+                "textOverflow": "ellipsis",
+            }
+        ],
+    )
+    return html.Div(
+        [
+            dash_table.DataTable(
+                id=ids.TABLE_ANNUAL,
+                data=df_table.to_dict("records"),
+                page_action="native",
+                page_size=ANNUAL_TABLE_PAGE_SIZE,
+                virtualization=True,
+                fixed_rows={"headers": True},
+                style_data_conditional=[
+                    {
+                        "if": {"row_index": "odd"},
+                        "backgroundColor": "rgba(0, 0, 0, 0.05)",
+                    },
+                    {"if": {"column_id": "Total"}, "fontWeight": "bold"},
+                ],
+                style_header={"fontWeight": "bold"},
+                style_table={"overflowX": "auto", "maxHeight": "50vh"},
+                **shared,
+            ),
+            dash_table.DataTable(
+                id=ids.TABLE_ANNUAL_TOTAL,
+                data=df_total.to_dict("records"),
+                style_header={"display": "none"},
+                style_data={"fontWeight": "bold"},
+                style_table={"overflowX": "auto"},
+                **shared,
+            ),
+        ]
+    )
+
 
-    fig.update_layout(
-        margin=dict(l=5, r=5, t=5, b=5),
-        yaxis_title="Tilt Angle [deg]",
-        xaxis_title="Azimuth Angle [deg]",
-        xaxis=dict(dtick=45),
-        yaxis=dict(dtick=10),
+def create_uncertainty_text(
+    geolocation: Geolocation,
+    allpanels: AllPanels,
+    thedate: date,
+    monthly_weather_factors: list[float],
+) -> html.P:
+    exceedance = allpanels.yield_uncertainty(
+        tz_str=geolocation.tz_str,
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+        monthly_weather_factors=monthly_weather_factors,
+        year=thedate.year,
+        seed=UNCERTAINTY_SEED,
+    )
+    return html.P(
+        "Annual yield with weather and module uncertainty: "
+        + ", ".join(f"{k} {v:.0f} kWh" for k, v in exceedance.items())
+        + f" ({uncertainty.SCENARIOS} scenarios)",
+        className="mt-3",
+    )
+
+
+def create_timeseries_export(
+    geolocation: Geolocation,
+    allpanels: AllPanels,
+    thedate: date,
+    monthly_weather_factors: list[float],
+) -> html.Form:
+    # plain form post, the browser downloads the streamed response directly
+    # instead of receiving the whole file through a callback
+    payload = dict(
+        lat=geolocation.lat,
+        lon=geolocation.lon,
+        ele=geolocation.ele,
+        tz_str=geolocation.tz_str,
+        year=thedate.year,
+        monthly_weather_factors=monthly_weather_factors,
+        panels=[p.dict() for p in allpanels.panels],
+    )
+    return html.Form(
+        [
+            dcc.Input(type="hidden", name="payload", value=json.dumps(payload)),
+            dbc.InputGroup(
+                [
+                    dbc.InputGroupText("Power time series"),
+                    dbc.Select(
+                        name="freq_minutes",
+                        value="60",
+                        options=[
+                            dict(label="hourly", value="60"),
+                            dict(label="30 min", value="30"),
+                            dict(label="15 min", value="15"),
+                        ],
+                    ),
+                    dbc.Button(
+                        [html.I(className="bi bi-download me-2"), "CSV"],
+                        type="submit",
+                        name="format",
+                        value="csv",
+                    ),
+                    dbc.Button(
+                        [html.I(className="bi bi-download me-2"), "Parquet"],
+                        type="submit",
+                        name="format",
+                        value="parquet",
+                    ),
+                ],
+                className="mt-3",
+            ),
+        ],
+        action=f"{api.API_PREFIX}/timeseries",
+        method="POST",
     )
-    return fig
 
 
 def render(app: Dash) -> html.Div:
@@ -324,8 +337,8 @@ def render(app: Dash) -> html.Div:
         if geolocation_data == None:
             geolocation_data = {}
 
-        allpanels = AllPanels(**panel_data)
         geolocation = Geolocation(**geolocation_data)
+        allpanels = AllPanels(**panel_data).shaded_by(geolocation.horizon_deg)
         date_object = date.fromisoformat(date_value)
         # year=date_object.year
         # month=date_object.month
@@ -344,7 +357,12 @@ def render(app: Dash) -> html.Div:
         if allpanels.ready == False:
             return html.H4("⇦ 🚫 At least one panel is not parametrized!")
 
+        # the other tabs and the date buttons are computed in the background
+        prefetch.schedule(geolocation, allpanels, date_object.year)
+
         if tab == ids.TAB_PLOT_DAY:
+            if dash.callback_context.triggered_id == ids.STORE_WEATHER:
+                raise PreventUpdate  # the day curve is clear sky
             fig = create_day_figure(
                 geolocation=geolocation, allpanels=allpanels, thedate=date_object
             )
@@ -357,27 +375,29 @@ def render(app: Dash) -> html.Div:
                 allpanels=allpanels,
                 thedate=date_object,
             )
-            df_annual = df_annual.T
-            df_annual["Total"] = df_annual.sum(axis=1)
-            totals_dict = df_annual.sum(axis=0).to_dict()
-            df_annual = pd.concat(
-                [df_annual, pd.DataFrame(totals_dict, index=["Total"])], axis=0
+            table = create_annual_table(df_annual)
+            fig_lifetime = create_lifetime_figure(df_annual, thedate=date_object)
+            uncertainty_text = create_uncertainty_text(
+                geolocation=geolocation,
+                allpanels=allpanels,
+                thedate=date_object,
+                monthly_weather_factors=monthly_weather_factors,
             )
-
-            for col in df_annual:
-                for i in range(len(df_annual)):
-                    df_annual[col].iloc[i] = round(
-                        df_annual[col].iloc[i], 1
-                    )  # f"{round(df_annual[col].iloc[i], 1):.01f}"
-            df_annual.index.set_names("Panel", inplace=True)
-
-            table = dbc.Table.from_dataframe(
-                df_annual, striped=True, bordered=True, hover=False, index=True
+            export = create_timeseries_export(
+                geolocation=geolocation,
+                allpanels=allpanels,
+                thedate=date_object,
+                monthly_weather_factors=monthly_weather_factors,
             )
 
             return [
                 dcc.Graph(figure=fig, responsive=True, style={"height": "70vh"}),
                 table,
+                uncertainty_text,
+                export,
+                dcc.Graph(
+                    figure=fig_lifetime, responsive=True, style={"height": "50vh"}
+                ),
             ]
         elif tab == ids.TAB_PLOT_OPTI:
             fig = create_optimal_contour_figure(
@@ -388,6 +408,14 @@ def render(app: Dash) -> html.Div:
                 freq_minutes=60,
             )
             return dcc.Graph(figure=fig, responsive=True, style={"height": "70vh"})
+        elif tab == ids.TAB_PLOT_INVERTER:
+            fig = create_inverter_figure(
+                geolocation=geolocation,
+                allpanels=allpanels,
+                thedate=date_object,
+                monthly_weather_factors=monthly_weather_factors,
+            )
+            return dcc.Graph(figure=fig, responsive=True, style={"height": "70vh"})
         else:
             return html.H4("Something went horribly wrong!")
 
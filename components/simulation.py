@@ -0,0 +1,487 @@
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+from pvlib import location, irradiance, iam, temperature, pvsystem, tracking
+from scipy.integrate import cumtrapz
+
+from . import horizon, metrics, singleflight, tmy
+
+GAMMA_PDC = -0.004
+ALBEDO = 0.25
+TEMPERATURE_MODEL_PARAMETERS = dict(a=-3.56, b=-0.075, deltaT=3)
+TEMP_AIR = 20.0
+WIND_SPEED = 0.0
+PANEL_CHUNK_SIZE = 256  # bounds the (times x panels) temporaries together
+DC_CHUNK_VALUES = PANEL_CHUNK_SIZE * 8784  # with time slices, an hourly year
+POWER_CHUNK_VALUES = 2**24  # power values held at once by yearly aggregates
+SKY_CACHE_SIZE = 32
+YIELD_CACHE_SIZE = 8192  # orientations, 12 floats each
+# fixed panels face tilt/azimuth; single axis trackers rotate about an axis
+# with the panel's tilt and azimuth (180: north-south axis), dual axis
+# trackers face the sun and ignore both
+MOUNTS = ("fixed", "single_axis", "dual_axis")
+TRACKER_MAX_ANGLE = 60.0
+TRACKER_GCR = 0.35  # ground coverage ratio of the tracker rows, backtracking
+
+MONTHS = [calendar.month_abbr[m + 1] for m in range(12)]
+
+_yields = OrderedDict()  # (location, year, ..., tilt, azimuth, mount, horizon)
+_yields_lock = threading.Lock()
+
+
+def year_times(year: int, tz_str: str, freq_minutes: int = 60) -> pd.DatetimeIndex:
+    tz = pytz.timezone(tz_str)
+
+    starttime = datetime(
+        year=year,
+        month=1,
+        day=1,
+    )
+    endtime = datetime(
+        year=year + 1,
+        month=1,
+        day=1,
+    )
+
+    return pd.date_range(
+        f"{starttime:%Y-%m-%d %H:%M}",
+        f"{endtime:%Y-%m-%d %H:%M}",
+        freq=f"{freq_minutes}min",
+        tz=tz,
+    )[:-1]
+
+
+def day_times(thedate: date, tz_str: str, freq_minutes: int = 30) -> pd.DatetimeIndex:
+    starttime = datetime(year=thedate.year, month=thedate.month, day=thedate.day)
+    endtime = starttime.replace(hour=23, minute=59, second=59)
+
+    return pd.date_range(
+        f"{starttime:%Y-%m-%d %H:%M}",
+        f"{endtime:%Y-%m-%d %H:%M}",
+        freq=f"{freq_minutes}min",
+        tz=pytz.timezone(tz_str),
+    )
+
+
+@metrics.timed("simulation.sky_conditions")
+def sky_conditions(
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    times: pd.DatetimeIndex,
+    weather_file: str = None,
+) -> pd.DataFrame:
+    # everything that does not depend on the panel orientation,
+    # computed once and shared by all panels; clear sky, or the irradiance
+    # and temperatures of an hourly weather file (see tmy.py)
+    loc = location.Location(
+        latitude=lat, longitude=lon, tz=pytz.timezone(tz_str), altitude=ele
+    )
+    solpos = loc.get_solarposition(times)
+    if weather_file is None:
+        weather = loc.get_clearsky(times, model="simplified_solis")
+        weather = {c: weather[c].values for c in ["ghi", "dni", "dhi"]}
+    else:
+        weather = tmy.weather_at(weather_file, times)
+        # interpolated hourly averages, no light before sunrise
+        night = solpos["apparent_zenith"].values >= 90
+        for c in ["ghi", "dni", "dhi"]:
+            weather[c][night] = 0.0
+    return pd.DataFrame(
+        dict(
+            apparent_zenith=solpos["apparent_zenith"].values,
+            azimuth=solpos["azimuth"].values,
+            dni_extra=irradiance.get_extra_radiation(times).values,
+            **weather,
+        ),
+        index=times,
+    )
+
+
+def single_axis_orientation(
+    sky: pd.DataFrame, axis_tilt_deg: np.ndarray, axis_azimuth_deg: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # (times, n) surface tilt and azimuth, pvlib.tracking.singleaxis with
+    # backtracking on flat ground, which only takes one axis at a time
+    zenith = np.radians(sky["apparent_zenith"].values[:, None])
+    solar_azimuth = np.radians(sky["azimuth"].values[:, None])
+    axis_tilt = np.radians(np.asarray(axis_tilt_deg, dtype=float)[None, :])
+    axis_azimuth = np.radians(np.asarray(axis_azimuth_deg, dtype=float)[None, :])
+
+    # sun position in the tracker frame, y along the axis
+    x = np.sin(zenith) * np.sin(solar_azimuth)
+    y = np.sin(zenith) * np.cos(solar_azimuth)
+    z = np.cos(zenith)
+    xp = x * np.cos(axis_azimuth) - y * np.sin(axis_azimuth)
+    zp = (
+        x * np.sin(axis_tilt) * np.sin(axis_azimuth)
+        + y * np.sin(axis_tilt) * np.cos(axis_azimuth)
+        + z * np.cos(axis_tilt)
+    )
+    theta = np.degrees(np.arctan2(xp, zp))
+
+    # backtracking: rotated back towards flat while rows would shade each other
+    shading = np.abs(np.cos(np.radians(theta)) / TRACKER_GCR)
+    with np.errstate(invalid="ignore"):
+        backtrack = -np.sign(theta) * np.degrees(np.arccos(shading))
+    theta = theta + np.where(shading < 1, backtrack, 0)
+    theta = np.clip(theta, -TRACKER_MAX_ANGLE, TRACKER_MAX_ANGLE)
+    theta = np.where(zenith < np.pi / 2, theta, 0.0)  # stowed at night
+
+    surface = tracking.calc_surface_orientation(
+        theta, np.degrees(axis_tilt), np.degrees(axis_azimuth)
+    )
+    return surface["surface_tilt"], surface["surface_azimuth"]
+
+
+def surface_orientation(
+    sky: pd.DataFrame, tilt_deg: np.ndarray, azimuth_deg: np.ndarray, mount=None
+) -> tuple[np.ndarray, np.ndarray]:
+    # (1, n) tilt and azimuth of fixed panels, (times, n) as soon as one
+    # panel tracks the sun; all trackers are computed in one go
+    tilt = np.asarray(tilt_deg, dtype=float)[None, :]
+    azi = np.asarray(azimuth_deg, dtype=float)[None, :]
+    if mount is None:
+        return tilt, azi
+    mount = np.asarray(mount)
+    single = mount == "single_axis"
+    dual = mount == "dual_axis"
+    if not single.any() and not dual.any():
+        return tilt, azi
+
+    tilt = np.repeat(tilt, len(sky), axis=0)
+    azi = np.repeat(azi, len(sky), axis=0)
+    if len(sky) == 0:  # e.g. no daylight hours, nothing to track
+        return tilt, azi
+    if single.any():
+        tilt[:, single], azi[:, single] = single_axis_orientation(
+            sky, tilt[0, single], azi[0, single]
+        )
+    if dual.any():
+        zenith = sky["apparent_zenith"].values[:, None]
+        tilt[:, dual] = np.where(zenith < 90, zenith, 0.0)
+        azi[:, dual] = sky["azimuth"].values[:, None]
+    return tilt, azi
+
+
+def dc_power_from_sky(
+    sky: pd.DataFrame,
+    tilt_deg: np.ndarray,
+    azimuth_deg: np.ndarray,
+    pdc0_W: np.ndarray,
+    mount: np.ndarray = None,
+    horizons: list = None,
+) -> np.ndarray:
+    # same chain as pvlib's ModelChain with aoi_model="physical",
+    # spectral_model="no_loss", haydavies transposition, sapm cell
+    # temperature and pvwatts dc, broadcast over (times, panels);
+    # horizons has a profile (see horizon.py) or None per panel
+    zenith = sky["apparent_zenith"].values[:, None]
+    solar_azimuth = sky["azimuth"].values[:, None]
+    dni = sky["dni"].values[:, None]
+    ghi = sky["ghi"].values[:, None]
+    dhi = sky["dhi"].values[:, None]
+    dni_extra = sky["dni_extra"].values[:, None]
+
+    tilt, azi = surface_orientation(sky, tilt_deg, azimuth_deg, mount)
+    pdc0 = np.asarray(pdc0_W, dtype=float)[None, :]
+
+    aoi = irradiance.aoi(tilt, azi, zenith, solar_azimuth)
+    poa_sky_diffuse = irradiance.haydavies(
+        tilt, azi, dhi, dni, dni_extra, zenith, solar_azimuth
+    )
+    poa_ground_diffuse = irradiance.get_ground_diffuse(tilt, ghi, albedo=ALBEDO)
+    beam_mask = horizon.beam_mask(sky, horizons)
+    if beam_mask is not None:
+        dni = dni * beam_mask
+    poa = irradiance.poa_components(aoi, dni, poa_sky_diffuse, poa_ground_diffuse)
+
+    effective_irradiance = poa["poa_direct"] * iam.physical(aoi) + poa["poa_diffuse"]
+    # constant without a weather file
+    temp_air = TEMP_AIR
+    if "temp_air" in sky:
+        temp_air = sky["temp_air"].values[:, None]
+    wind_speed = WIND_SPEED
+    if "wind_speed" in sky:
+        wind_speed = sky["wind_speed"].values[:, None]
+    temp_cell = temperature.sapm_cell(
+        poa["poa_global"],
+        temp_air,
+        wind_speed,
+        **TEMPERATURE_MODEL_PARAMETERS,
+    )
+    return np.asarray(
+        pvsystem.pvwatts_dc(effective_irradiance, temp_cell, pdc0, GAMMA_PDC)
+    )
+
+
+@lru_cache(maxsize=SKY_CACHE_SIZE)
+def year_sky_conditions(
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    year: int,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> pd.DataFrame:
+    # shared by all callers simulating the same location and year,
+    # the returned frame must not be modified; concurrent cache misses
+    # (e.g. the graph and the date buttons on page load) compute it once
+    def compute():
+        times = year_times(year=year, tz_str=tz_str, freq_minutes=freq_minutes)
+        return sky_conditions(
+            tz_str=tz_str,
+            lat=lat,
+            lon=lon,
+            ele=ele,
+            times=times,
+            weather_file=weather_file,
+        )
+
+    key = (tz_str, lat, lon, ele, year, freq_minutes, weather_file)
+    return singleflight.do("year_sky_conditions", key, compute)
+
+
+def clear_caches():
+    # e.g. for benchmarking cold starts
+    year_sky_conditions.cache_clear()
+    with _yields_lock:
+        _yields.clear()
+
+
+@metrics.timed("simulation.panels_dc_power")
+def orientations_dc_power(
+    sky: pd.DataFrame,
+    tilt_deg: np.ndarray,
+    azimuth_deg: np.ndarray,
+    pdc0_W,
+    mount=None,
+    horizons: list = None,
+) -> np.ndarray:
+    # returns the dc power [W] with shape (len(sky), len(tilt_deg)),
+    # mount is one of MOUNTS per orientation, None for fixed panels,
+    # horizons a profile or None per orientation, None for an open sky
+    tilt = np.asarray(tilt_deg, dtype=float)
+    azi = np.asarray(azimuth_deg, dtype=float)
+    pdc0 = np.broadcast_to(np.asarray(pdc0_W, dtype=float), tilt.shape)
+    if mount is not None:
+        mount = np.broadcast_to(np.asarray(mount), tilt.shape)
+
+    pwr = np.empty((len(sky), len(tilt)))
+    slices = time_slices(len(sky), min(len(tilt), PANEL_CHUNK_SIZE), DC_CHUNK_VALUES)
+    for start in range(0, len(tilt), PANEL_CHUNK_SIZE):
+        chunk = slice(start, start + PANEL_CHUNK_SIZE)
+        for times in slices:
+            pwr[times, chunk] = dc_power_from_sky(
+                sky.iloc[times] if len(slices) > 1 else sky,
+                tilt[chunk],
+                azi[chunk],
+                pdc0[chunk],
+                mount[chunk] if mount is not None else None,
+                horizons[chunk] if horizons is not None else None,
+            )
+    return pwr
+
+
+def time_slices(n_times: int, n_panels: int, values: int) -> list[slice]:
+    # consecutive time steps with at most values (times x panels) each
+    rows = max(1, values // max(1, n_panels))
+    return [slice(start, start + rows) for start in range(0, n_times, rows)]
+
+
+def panels_dc_power(panels: list, sky: pd.DataFrame) -> np.ndarray:
+    # returns the dc power [W] with shape (len(sky), len(panels))
+    return orientations_dc_power(
+        sky,
+        [p.altitude_deg for p in panels],
+        [p.azimuth_deg for p in panels],
+        [p.pdc0_W for p in panels],
+        [p.mount for p in panels],
+        [p.horizon_deg for p in panels],
+    )
+
+
+def horizon_key(panel) -> tuple:
+    # hashable profile for the cache keys
+    return tuple(panel.horizon_deg) if panel.horizon_deg is not None else None
+
+
+def dc_power_batch(
+    panels: list,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    times: pd.DatetimeIndex,
+    weather_file: str = None,
+) -> np.ndarray:
+    sky = sky_conditions(
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        times=times,
+        weather_file=weather_file,
+    )
+    return panels_dc_power(panels, sky)
+
+
+def year_dc_power_sums(
+    panels: list,
+    members: list,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    year: int,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    # (times, len(members)) dc power [W] summed over the panel positions of
+    # every member; the year is simulated in time slices, so all time steps
+    # x panels are never held at once
+    sky = year_sky_conditions(
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        year=year,
+        freq_minutes=freq_minutes,
+        weather_file=weather_file,
+    )
+    sums = np.zeros((len(sky), len(members)))
+    for times in time_slices(len(sky), len(panels), POWER_CHUNK_VALUES):
+        pwr = panels_dc_power(panels, sky.iloc[times])
+        for n, m in enumerate(members):
+            sums[times, n] = pwr[:, m].sum(axis=1)
+    return sky.index, sums
+
+
+@metrics.timed("simulation.monthly_energy_from_power")
+def monthly_energy_from_power(
+    pwr: np.ndarray, times: pd.DatetimeIndex, freq_minutes: int
+) -> np.ndarray:
+    # (len(times), n) power [W] -> (12, n) energy [kWh]
+    months = times.month.values
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    e_kWh = np.zeros((12,) + pwr.shape[1:])
+    e_kWh[months[starts] - 1] = np.add.reduceat(pwr, starts, axis=0)
+    return e_kWh * freq_minutes / 60 / 1000
+
+
+def cumulative_energy(pwr: np.ndarray, freq_minutes: int) -> np.ndarray:
+    # (len(times), n) power [W] -> cumulated energy [kWh] within the times
+    e_kWh = cumtrapz(pwr, axis=0, initial=0)
+    e_kWh[0] = pwr[0] / 1000
+    return e_kWh / 1000 * freq_minutes / 60
+
+
+def weather_factors(weather, times: pd.DatetimeIndex) -> np.ndarray:
+    # weather is applied after the clear-sky simulation: returns one factor
+    # per time step from 12 monthly factors, or from a profile which has
+    # one factor per time step already; None is clear sky
+    if weather is None:
+        return np.ones(len(times))
+    factors = np.asarray(weather, dtype=float)
+    if factors.shape == (12,):
+        return factors[times.month.values - 1]
+    if factors.shape != (len(times),):
+        raise ValueError(
+            f"weather needs 12 monthly or {len(times)} factors, got {factors.size}"
+        )
+    return factors
+
+
+def monthly_yields(
+    panels: list,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    year: int,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> np.ndarray:
+    # (12, n) energy [kWh] per W of pdc0 before the weather factors, cached
+    # per orientation, mount and horizon: the dc power is proportional to
+    # pdc0, so resizing a panel or editing one of many panels only simulates
+    # new orientations
+    location_key = (tz_str, lat, lon, ele, year, freq_minutes, weather_file)
+    keys = [
+        location_key + (p.altitude_deg, p.azimuth_deg, p.mount, horizon_key(p))
+        for p in panels
+    ]
+    with _yields_lock:
+        found = {k: _yields[k] for k in keys if k in _yields}
+        for k in found:
+            _yields.move_to_end(k)
+
+    missing = list(dict.fromkeys(k for k in keys if k not in found))
+    if len(missing) > 0:
+        orientations = tuple(k[-4:] for k in missing)
+
+        def compute():
+            tilt, azi, mount, horizons = zip(*orientations)
+            sky = year_sky_conditions(
+                tz_str=tz_str,
+                lat=lat,
+                lon=lon,
+                ele=ele,
+                year=year,
+                freq_minutes=freq_minutes,
+                weather_file=weather_file,
+            )
+            e_kWh = np.zeros((12, len(tilt)))
+            for times in time_slices(len(sky), len(tilt), POWER_CHUNK_VALUES):
+                part = sky.iloc[times]
+                pwr = orientations_dc_power(part, tilt, azi, 1.0, mount, horizons)
+                e_kWh += monthly_energy_from_power(pwr, part.index, freq_minutes)
+            return e_kWh
+
+        e_kWh = singleflight.do("monthly_yields", location_key + orientations, compute)
+        with _yields_lock:
+            for n, k in enumerate(missing):
+                found[k] = _yields[k] = e_kWh[:, n]
+            while len(_yields) > YIELD_CACHE_SIZE:
+                _yields.popitem(last=False)
+
+    e_kWh = np.zeros((12, len(keys)))
+    for n, k in enumerate(keys):
+        e_kWh[:, n] = found[k]
+    return e_kWh
+
+
+def monthly_energy_batch(
+    panels: list,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    monthly_weather_factors: tuple[float],
+    year: int,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> np.ndarray:
+    e_kWh = monthly_yields(
+        panels,
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        year=year,
+        freq_minutes=freq_minutes,
+        weather_file=weather_file,
+    )
+    # the cached yields are weather independent, a weather change is a
+    # (12, n) multiplication and never simulates again
+    pdc0 = np.array([p.pdc0_W for p in panels], dtype=float)
+    weather = np.asarray(monthly_weather_factors, dtype=float)
+    return e_kWh * pdc0[None, :] * weather[:, None]
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import pickle
+import re
+import stat
+import tempfile
+import threading
+import time
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # windows: coalescing within the process only
+    fcntl = None
+
+# concurrent calls with the same key share one computation: threads of a
+# process wait for the first caller, other worker processes (gunicorn) wait
+# on a lock file and load the pickled result of the process holding it;
+# PV_SINGLEFLIGHT_DIR= (empty) disables the coalescing across processes.
+# The pickles are loaded, so the directory must be private to the user
+# running the app, otherwise only threads of a process are coalesced
+DIR_ENV = "PV_SINGLEFLIGHT_DIR"
+DEFAULT_DIR = os.path.join(
+    tempfile.gettempdir(),
+    f"pv-singleflight-{os.getuid()}" if hasattr(os, "getuid") else "pv-singleflight",
+)
+RESULT_TTL_S = 60.0  # results are only shared with processes already waiting
+# keys are hashed into a fixed number of lock files per name instead of one
+# per key; calls of different names nest (monthly_yields takes the lock of
+# year_sky_conditions), so the names must not share lock files
+LOCK_SLOTS = 64
+_PER_KEY_LOCK = re.compile(r".+-[0-9a-f]{40}\.(lock|waiters)")  # before the slots
+
+logger = logging.getLogger("pv.singleflight")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_lock = threading.Lock()
+_calls = {}  # (name, key) -> _Call in flight
+_last_prune = 0.0
+_not_private = set()  # directories warned about
+
+
+def do(name: str, key: tuple, fn):
+    # returns fn(), or the result of an identical call already in flight
+    with _lock:
+        call = _calls.get((name, key))
+        leader = call is None
+        if leader:
+            call = _calls[(name, key)] = _Call()
+
+    if not leader:
+        with metrics.span(f"singleflight.wait:{name}"):
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _across_processes(name, key, fn)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[(name, key)]
+        call.done.set()
+
+
+def _directory() -> str:
+    return os.environ.get(DIR_ENV, DEFAULT_DIR)
+
+
+def _private(directory: str) -> bool:
+    # created 0700 if missing; an existing directory must be a real one,
+    # owned by this user and not writable by anyone else
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and info.st_mode & (stat.S_IWGRP | stat.S_IWOTH) == 0
+    )
+
+
+def _across_processes(name: str, key: tuple, fn):
+    directory = _directory()
+    if fcntl is None or directory == "":
+        return fn()
+    if not _private(directory):
+        if directory not in _not_private:
+            _not_private.add(directory)
+            logger.warning(f"{directory} is not private, results stay per process")
+        return fn()
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    slot = os.path.join(directory, f"{name}-{int(digest, 16) % LOCK_SLOTS:02d}")
+    result_path = os.path.join(directory, f"{name}-{digest}.pickle")
+
+    # lock files are kept, removing one could hand out a second lock;
+    # waiters hold a shared lock on the .waiters file, so the holder of
+    # the lock only pickles its result if another process wants it. Keys
+    # sharing a slot wait for each other, a waiter without a result for
+    # its own key computes it
+    with open(slot + ".lock", "a") as lockfile, open(slot + ".waiters", "a") as waiters:
+        try:
+            fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            waited = False
+        except BlockingIOError:
+            fcntl.flock(waiters, fcntl.LOCK_SH)
+            with metrics.span(f"singleflight.wait:{name}"):
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+            fcntl.flock(waiters, fcntl.LOCK_UN)
+            waited = True
+        try:
+            if waited:
+                found, result = _load(result_path)
+                if found:
+                    return result
+            result = fn()
+            if _has_waiters(waiters):
+                _store(result_path, result)
+            return result
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+
+def _has_waiters(waiters) -> bool:
+    try:
+        fcntl.flock(waiters, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    fcntl.flock(waiters, fcntl.LOCK_UN)
+    return False
+
+
+def _load(path: str) -> tuple:
+    # (False, None) if the holder of the lock failed or the result is old
+    try:
+        if time.time() - os.path.getmtime(path) > RESULT_TTL_S:
+            return False, None
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return False, None
+
+
+def _store(path: str, result):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, pickle.PicklingError):
+        return
+    _prune(os.path.dirname(path))
+
+
+def _prune(directory: str):
+    # removes outdated results and the per key lock files of earlier
+    # versions, at most once per RESULT_TTL_S and process
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < RESULT_TTL_S:
+        return
+    _last_prune = now
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".pickle") or _PER_KEY_LOCK.fullmatch(entry.name):
+            try:
+                if now - entry.stat().st_mtime > RESULT_TTL_S:
+                    os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,141 @@
+import io
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from . import simulation
+
+# the year is simulated and written in time slices of at most this many
+# power values, so memory stays flat for any resolution and panel count
+EXPORT_CHUNK_VALUES = 2**18
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+TIMESERIES_COLUMNS = ["id", "time", "panel", "power_W"]
+
+
+def iter_power_chunks(
+    panels: list,
+    tz_str: str,
+    lat: float,
+    lon: float,
+    ele: float,
+    year: int,
+    monthly_weather_factors: tuple[float] = None,
+    freq_minutes: int = 60,
+    weather_file: str = None,
+) -> Iterator[tuple[pd.DatetimeIndex, np.ndarray]]:
+    # yields (times, power [W]) with the shape (len(times), len(panels)),
+    # scaled by the weather factor of the month like the monthly energy
+    sky = simulation.year_sky_conditions(
+        tz_str=tz_str,
+        lat=lat,
+        lon=lon,
+        ele=ele,
+        year=year,
+        freq_minutes=freq_minutes,
+        weather_file=weather_file,
+    )
+    factors = simulation.weather_factors(monthly_weather_factors, sky.index)
+
+    rows = max(1, EXPORT_CHUNK_VALUES // max(1, len(panels)))
+    for start in range(0, len(sky), rows):
+        sky_chunk = sky.iloc[start : start + rows]
+        pwr = simulation.panels_dc_power(panels, sky_chunk)
+        pwr *= factors[start : start + rows][:, None]
+        yield sky_chunk.index, pwr
+
+
+def long_frame(
+    job_id: str, labels: list[str], times: pd.DatetimeIndex, pwr: np.ndarray
+) -> pd.DataFrame:
+    # one row per time step and panel, sorted by time
+    return pd.DataFrame(
+        dict(
+            id=job_id,
+            time=np.repeat(times, len(labels)),
+            panel=np.tile(np.asarray(labels, dtype=object), len(times)),
+            power_W=np.round(pwr.ravel(), 1),
+        ),
+        columns=TIMESERIES_COLUMNS,
+    )
+
+
+def csv_chunks(frames: Iterator[pd.DataFrame]) -> Iterator[str]:
+    yield ",".join(TIMESERIES_COLUMNS) + "\n"
+    for df in frames:
+        yield df.to_csv(header=False, index=False, date_format="%Y-%m-%dT%H:%M%z")
+
+
+class _ChunkSink(io.RawIOBase):
+    # file-like target for pyarrow writers, the written bytes are handed
+    # out by drain() instead of being kept
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_chunks(frames: Iterator[pd.DataFrame], fmt: str) -> Iterator[bytes]:
+    # optional dependency, only needed for parquet and arrow output; imported
+    # before streaming starts so a missing package is reported up front
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(f"{fmt} output needs pyarrow (pip install pyarrow)") from e
+
+    schema = pa.schema(
+        [
+            ("id", pa.string()),
+            ("time", pa.timestamp("s", tz="UTC")),
+            ("panel", pa.string()),
+            ("power_W", pa.float32()),
+        ]
+    )
+
+    def chunks():
+        sink = _ChunkSink()
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(sink, schema)
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        for df in frames:
+            df["time"] = df["time"].dt.tz_convert("UTC")
+            writer.write_table(
+                pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            )
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    return chunks()
+
+
+def export_chunks(frames: Iterator[pd.DataFrame], fmt: str = "csv") -> Iterator:
+    # str chunks for csv, bytes for parquet (one row group per frame) and
+    # the arrow ipc stream format
+    if fmt == "csv":
+        return csv_chunks(frames)
+    if fmt in EXPORT_FORMATS:
+        return _arrow_chunks(frames, fmt)
+    raise ValueError(f"unknown export format '{fmt}'")
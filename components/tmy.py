@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pvlib import iotools
+
+# hourly typical meteorological year data (EPW or PVGIS csv/json/epw files)
+# replacing the clear sky model: every file is parsed once into a float32
+# (column, hour of year) array, later loads memory map the cached .npy;
+#   python -m components.tmy ingest weather/*.epw
+# the api and batch jobs name files relative to PV_WEATHER_DIR; the ui
+# simulates clear sky and only takes the monthly factors of the nearest
+# file (weather_grid.py), so its weather stays the user's percentages
+WEATHER_DIR_ENV = "PV_WEATHER_DIR"
+CACHE_DIR_ENV = "PV_WEATHER_CACHE"  # default <weather dir>/.cache
+DEFAULT_WEATHER_DIR = "weather"
+WEATHER_EXTENSIONS = (".epw", ".csv", ".json")
+TMY_COLUMNS = ["ghi", "dni", "dhi", "temp_air", "wind_speed"]
+HOURS = 8760
+TMY_CACHE_SIZE = 64
+
+# first day of each month within a year without february 29
+_MONTH_START_DAYS = np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def weather_dir() -> str:
+    return os.environ.get(WEATHER_DIR_ENV, DEFAULT_WEATHER_DIR)
+
+
+def cache_dir() -> str:
+    return os.environ.get(CACHE_DIR_ENV, os.path.join(weather_dir(), ".cache"))
+
+
+def resolve(name: str) -> str:
+    # path of a weather file named by a client, which must stay inside the
+    # weather directory
+    directory = os.path.realpath(weather_dir())
+    path = os.path.realpath(os.path.join(directory, name))
+    if os.path.commonpath([directory, path]) != directory:
+        raise ValueError(f"weather file '{name}' is outside of the weather directory")
+    if not path.lower().endswith(WEATHER_EXTENSIONS):
+        raise ValueError(f"weather file '{name}' is not one of {WEATHER_EXTENSIONS}")
+    if not os.path.isfile(path):
+        raise ValueError(f"weather file '{name}' not found")
+    return path
+
+
+def hours_of_year(times: pd.DatetimeIndex) -> np.ndarray:
+    # fractional utc hours since january 1st, february 29 counts as the 28th
+    if times.tz is not None:
+        times = times.tz_convert("UTC")
+    month = times.month.values
+    day = np.where((month == 2) & (times.day.values == 29), 28, times.day.values)
+    hours = (_MONTH_START_DAYS[month - 1] + day - 1) * 24 + times.hour.values
+    return hours + times.minute.values / 60
+
+
+def parse(path: str) -> tuple[np.ndarray, dict]:
+    # returns the (len(TMY_COLUMNS), HOURS) float32 data and the location
+    try:
+        if path.lower().endswith(".epw"):
+            df, meta = iotools.read_epw(path)
+            location = dict(
+                lat=meta["latitude"], lon=meta["longitude"], ele=meta["altitude"]
+            )
+        else:
+            fmt = os.path.splitext(path)[1].lower().lstrip(".")
+            df, _, inputs, _ = iotools.read_pvgis_tmy(
+                path, pvgis_format=fmt, map_variables=True
+            )
+            inputs = inputs.get("location", inputs)
+            location = dict(
+                lat=inputs["latitude"],
+                lon=inputs["longitude"],
+                ele=inputs["elevation"],
+            )
+    except (IndexError, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"{path}: not an EPW or PVGIS TMY file ({e!r})") from e
+
+    missing = [c for c in TMY_COLUMNS if c not in df.columns]
+    if len(missing) > 0:
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+
+    # the months of a tmy come from different years, only the position
+    # within the year is kept
+    hours = hours_of_year(df.index).astype(int)
+    data = np.full((len(TMY_COLUMNS), HOURS), np.nan, dtype=np.float32)
+    data[:, hours] = df[TMY_COLUMNS].values.T
+    if np.isnan(data).any():
+        raise ValueError(f"{path}: not a complete hourly year")
+    location = {k: float(v) for k, v in location.items()}
+    return data, dict(source=os.path.basename(path), **location)
+
+
+def _cache_base(path: str, size: int, mtime_ns: int) -> str:
+    key = f"{os.path.realpath(path)}:{size}:{mtime_ns}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir(), f"{stem}-{digest}")
+
+
+@lru_cache(maxsize=TMY_CACHE_SIZE)
+def _load(path: str, size: int, mtime_ns: int) -> tuple[np.ndarray, dict]:
+    base = _cache_base(path, size, mtime_ns)
+    if os.path.exists(base + ".npy") and os.path.exists(base + ".json"):
+        with open(base + ".json") as f:
+            return np.load(base + ".npy", mmap_mode="r"), json.load(f)
+
+    data, meta = parse(path)
+    os.makedirs(cache_dir(), exist_ok=True)
+    tmp = f"{base}.{os.getpid()}"
+    np.save(tmp + ".npy", data)
+    with open(tmp + ".json", "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp + ".npy", base + ".npy")
+    os.replace(tmp + ".json", base + ".json")
+    return np.load(base + ".npy", mmap_mode="r"), meta
+
+
+def load(path: str) -> tuple[np.ndarray, dict]:
+    # a changed file gets a new cache entry
+    stat = os.stat(path)
+    return _load(path, stat.st_size, stat.st_mtime_ns)
+
+
+def weather_at(path: str, times: pd.DatetimeIndex) -> dict[str, np.ndarray]:
+    # the tmy columns at the given times; the hourly values are averages
+    # over the hour, they are interpolated between the centers of the hours
+    data, _ = load(path)
+    position = hours_of_year(times) - 0.5
+    lower = np.floor(position).astype(int)
+    weight = (position - lower)[None, :]
+    values = (
+        data[:, lower % HOURS] * (1 - weight) + data[:, (lower + 1) % HOURS] * weight
+    )
+    return {c: values[i].astype(float) for i, c in enumerate(TMY_COLUMNS)}
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="hourly weather files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="parse files into the cache")
+    ingest.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        try:
+            data, meta = load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{path}: {e}")
+            continue
+        ghi_kWh = data[TMY_COLUMNS.index("ghi")].sum() / 1000
+        print(
+            f"{path}: lat={meta['lat']} lon={meta['lon']} ele={meta['ele']}m, "
+            f"ghi {ghi_kWh:.0f} kWh/m², cached in {cache_dir()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
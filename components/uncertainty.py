@@ -0,0 +1,56 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+# uncertainty of the annual yield: scenarios of the weather (one draw for
+# the whole year plus one per month around the monthly weather factors)
+# and of the module power (nameplate tolerance and losses) are sampled and
+# applied to the cached weather independent monthly energies of the
+# system, all scenarios at once as one (scenarios, 12) x (12,) product.
+# P90 is the annual energy exceeded in 90 % of the scenarios
+SCENARIOS = 5000
+MAX_SCENARIOS = 100_000
+ANNUAL_WEATHER_SD = 0.05  # relative year to year variability
+MONTHLY_WEATHER_SD = 0.15  # additional, independent per month
+MODULE_SD = 0.03
+EXCEEDANCE_LEVELS = (50, 75, 90, 99)
+
+
+def _draws(scenarios: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    # (scenarios, 12) relative weather and (scenarios,) module factors
+    rng = np.random.default_rng(seed)
+    annual = rng.normal(1, ANNUAL_WEATHER_SD, (scenarios, 1))
+    monthly = rng.normal(1, MONTHLY_WEATHER_SD, (scenarios, 12))
+    module = rng.normal(1, MODULE_SD, scenarios)
+    return np.maximum(annual * monthly, 0), np.maximum(module, 0)
+
+
+# seeded draws are the same for every weather, shared and never modified
+_seeded_draws = lru_cache(maxsize=8)(_draws)
+
+
+def sample(
+    monthly_weather_factors, scenarios: int = SCENARIOS, seed: int = None
+) -> tuple[np.ndarray, np.ndarray]:
+    # (scenarios, 12) weather factors and (scenarios,) module factors
+    draws = _draws if seed is None else _seeded_draws
+    relative, module = draws(scenarios, seed)
+    weather = np.asarray(monthly_weather_factors, dtype=float)[None, :]
+    return weather * relative, module
+
+
+@metrics.timed("uncertainty.annual_energy")
+def annual_energy(
+    e_kWh: np.ndarray, weather: np.ndarray, module: np.ndarray
+) -> np.ndarray:
+    # (12,) clear sky monthly energy -> (scenarios,) annual energy
+    return (weather @ e_kWh) * module
+
+
+def exceedance(annual_kWh: np.ndarray, levels=EXCEEDANCE_LEVELS) -> pd.Series:
+    # energy exceeded with the probability of each level, "P50", "P90", ...
+    quantiles = np.percentile(annual_kWh, [100 - level for level in levels])
+    return pd.Series(quantiles, index=[f"P{level}" for level in levels])
@@ -1,45 +1,90 @@
-from dash import Dash, html, dcc, Input, Output, ALL
+from dash import Dash, html, dcc, Input, Output, State, ALL, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from datetime import date
 import calendar
-import numpy as np
-from . import ids
+from . import ids, weather_grid
+from .location import Geolocation
 
 
 def render(app: Dash) -> html.Div:
-    @app.callback(
+    app.clientside_callback(
+        """
+        function(switch_value) {
+            return switch_value === true;
+        }
+        """,
         Output(ids.COLLAPSE_WEATHER, "is_open"),
         Input(ids.SWITCH_WEATHER, "value"),
     )
-    def show_hide_weather(switch):
-        if switch == True:
-            return True
-        else:
-            return False
 
-    @app.callback(
+    app.clientside_callback(
+        """
+        function(overall_percentage, month_percentages, weather_active) {
+            const factors = Array(12).fill(1.0);
+            if (weather_active === false) {
+                return factors;
+            }
+            const isSet = (v) => v !== null && v !== undefined && v !== "";
+            if (isSet(overall_percentage)) {
+                for (let i = 0; i < 12; i++) {
+                    factors[i] *= Number(overall_percentage) / 100;
+                }
+            }
+            month_percentages.forEach((month_percentage, i) => {
+                if (isSet(month_percentage)) {
+                    factors[i] *= Number(month_percentage) / 100;
+                }
+            });
+            return factors;
+        }
+        """,
         Output(ids.STORE_WEATHER, "data"),
         Input(ids.INPUT_WEATHER_OVEREALL, "value"),
         Input({"type": ids.INPUT_WEATHER_MONTH, "index": ALL}, "value"),
         Input(ids.COLLAPSE_WEATHER, "is_open"),
-        # prevent_initial_call=True,
     )
-    def store_weather(overall_percentage, month_percentages, weather_active):
-        if weather_active is False:
-            return tuple([1.0] * 12)
-        factors = np.array([1.0] * 12)
-        if overall_percentage is not None:
-            factors *= float(overall_percentage) / 100
 
-        for i, month_percentage in enumerate(month_percentages):
-            if month_percentage is not None:
-                factors[i] *= float(month_percentage) / 100
-        return tuple(factors)
+    @app.callback(
+        Output({"type": ids.INPUT_WEATHER_MONTH, "index": ALL}, "value"),
+        Output(ids.INPUT_WEATHER_OVEREALL, "value"),
+        Output(ids.SWITCH_WEATHER, "value"),
+        Output(ids.TEXT_WEATHER_SOURCE, "children"),
+        Output(ids.STORE_WEATHER_LOCATION, "data"),
+        Input(ids.STORE_GEOLOCATION, "data"),
+        State(ids.STORE_WEATHER_LOCATION, "data"),
+        prevent_initial_call=True,
+    )
+    def default_weather(geolocation_data: dict, defaults_location: list):
+        # fills in the monthly percentages from the local weather data once
+        # per new location, values entered for this location are kept
+        geolocation = Geolocation(**(geolocation_data or {}))
+        if not geolocation.ready:
+            raise PreventUpdate
+        if defaults_location == [geolocation.lat, geolocation.lon]:
+            raise PreventUpdate
+
+        match = weather_grid.lookup(geolocation.lat, geolocation.lon)
+        if match is None:
+            return (
+                [no_update] * 12,
+                no_update,
+                no_update,
+                "No local weather data near this location.",
+                [geolocation.lat, geolocation.lon],
+            )
+        return (
+            [round(f * 100) for f in match.monthly_weather_factors],
+            None,
+            True,
+            f"Monthly values from {match.source} ({match.distance_km:.0f} km away).",
+            [geolocation.lat, geolocation.lon],
+        )
 
     return dcc.Loading(
         html.Div(
             [
                 dcc.Store(id=ids.STORE_WEATHER, storage_type="local"),
+                dcc.Store(id=ids.STORE_WEATHER_LOCATION, storage_type="local"),
                 dbc.Card(
                     [
                         dbc.CardHeader(
@@ -161,6 +206,10 @@ def render(app: Dash) -> html.Div:
                                             ],
                                         ]
                                     ),
+                                    html.P(
+                                        id=ids.TEXT_WEATHER_SOURCE,
+                                        className="card-text small m-1",
+                                    ),
                                 ],
                                 is_open=False,
                                 id=ids.COLLAPSE_WEATHER,
@@ -0,0 +1,255 @@
+import argparse
+import hashlib
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pvlib import location
+from pydantic import BaseModel
+from scipy.spatial import cKDTree
+
+from . import metrics, simulation, tmy
+
+# monthly weather factors for any location, interpolated between the nearest
+# points of the local weather data: the hourly files in PV_WEATHER_DIR (real
+# against clear-sky irradiance per month) and an optional csv grid with the
+# columns lat, lon, Jan..Dec in percent (PV_WEATHER_GRID); the points are
+# persisted next to the tmy cache, python -m components.weather_grid build
+GRID_ENV = "PV_WEATHER_GRID"
+MAX_DISTANCE_KM = 150.0  # farther points are not representative
+NEIGHBOURS = 4
+EARTH_RADIUS_KM = 6371.0
+
+logger = logging.getLogger("pv.weather_grid")
+
+
+class GridMatch(BaseModel):
+    monthly_weather_factors: list[float]
+    distance_km: float
+    source: str
+    weather_file: str = None  # nearest hourly weather file, if any in range
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    # 3d points on the unit sphere, chord distances grow with the great
+    # circle distance so a plain kd-tree finds the nearest points
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+def _unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    # a single query point, without the numpy overhead of _unit_vectors
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1))
+
+
+def tmy_monthly_factors(path: str) -> tuple[float, float, np.ndarray]:
+    # (lat, lon, factors) of a weather file, the factors are the monthly
+    # irradiation relative to the clear sky model of the simulation
+    data, meta = tmy.load(path)
+    times = pd.date_range("2019-01-01 00:30", periods=tmy.HOURS, freq="60min", tz="UTC")
+    loc = location.Location(
+        latitude=meta["lat"], longitude=meta["lon"], altitude=meta["ele"]
+    )
+    clearsky = loc.get_clearsky(times, model="simplified_solis")["ghi"].values
+    ghi = np.asarray(data[tmy.TMY_COLUMNS.index("ghi")], dtype=float)
+    months = times.month.values - 1
+    factors = np.bincount(months, ghi, 12) / np.bincount(months, clearsky, 12)
+    return meta["lat"], meta["lon"], np.clip(factors, 0, 1)
+
+
+def _weather_files() -> list[str]:
+    directory = tmy.weather_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.realpath(os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.lower().endswith(tmy.WEATHER_EXTENSIONS)
+    )
+
+
+def _signature(paths: list[str]) -> str:
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append(f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def _read_points(grid_file: str, files: list[str]) -> dict:
+    # sources name the file of every point, weather files only those points
+    # with hourly data
+    lat, lon, factors, sources, weather_files = [], [], [], [], []
+    if grid_file is not None:
+        try:
+            df = pd.read_csv(grid_file)
+            grid_lat = df["lat"].astype(float)
+            grid_lon = df["lon"].astype(float)
+            grid_factors = df[simulation.MONTHS].astype(float).values / 100
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"weather grid {grid_file} skipped: {e}")
+        else:
+            lat += list(grid_lat)
+            lon += list(grid_lon)
+            factors += list(grid_factors)
+            sources += [os.path.basename(grid_file)] * len(df)
+            weather_files += [""] * len(df)
+    for path in files:
+        try:
+            file_lat, file_lon, file_factors = tmy_monthly_factors(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"weather file {path} skipped: {e}")
+            continue
+        lat.append(file_lat)
+        lon.append(file_lon)
+        factors.append(file_factors)
+        sources.append(os.path.basename(path))
+        weather_files.append(path)
+    return dict(
+        lat=np.asarray(lat, dtype=float),
+        lon=np.asarray(lon, dtype=float),
+        factors=np.asarray(factors, dtype=float).reshape(-1, 12),
+        sources=np.asarray(sources, dtype=str),
+        weather_files=np.asarray(weather_files, dtype=str),
+    )
+
+
+class WeatherGrid:
+    def __init__(self, lat, lon, factors, sources, weather_files):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.factors = np.asarray(factors, dtype=float)
+        self.sources = list(sources)
+        self.weather_files = list(weather_files)
+        self.tree = None
+        if len(self.lat) > 0:
+            self.tree = cKDTree(_unit_vectors(self.lat, self.lon))
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def lookup(self, lat: float, lon: float) -> GridMatch:
+        # inverse distance weighted factors of the nearest points in range,
+        # None without local data
+        if self.tree is None:
+            return None
+        k = min(NEIGHBOURS, len(self))
+        chord, index = self.tree.query(_unit_vector(lat, lon), k=[*range(1, k + 1)])
+        distance_km = _km(chord)
+        in_range = distance_km <= MAX_DISTANCE_KM
+        if not in_range.any():
+            return None
+        distance_km, index = distance_km[in_range], index[in_range]
+
+        if distance_km[0] < 1e-3:
+            factors = self.factors[index[0]]
+        else:
+            weights = 1 / distance_km**2
+            factors = weights @ self.factors[index] / weights.sum()
+
+        files = [self.weather_files[i] for i in index if self.weather_files[i] != ""]
+        weather_file = files[0] if len(files) > 0 else None
+        return GridMatch(
+            monthly_weather_factors=list(np.round(factors, 3)),
+            distance_km=round(float(distance_km[0]), 1),
+            source=self.sources[index[0]],
+            weather_file=weather_file,
+        )
+
+
+def build() -> WeatherGrid:
+    # reads the points from the persisted file, or computes and stores them
+    grid_file = os.environ.get(GRID_ENV) or None
+    if grid_file is not None:
+        grid_file = os.path.realpath(grid_file)
+        if not os.path.isfile(grid_file):
+            logger.warning(f"weather grid {grid_file} not found")
+            grid_file = None
+    files = [f for f in _weather_files() if f != grid_file]
+    paths = ([grid_file] if grid_file is not None else []) + files
+    if len(paths) == 0:
+        return WeatherGrid([], [], np.zeros((0, 12)), [], [])
+
+    persisted = os.path.join(tmy.cache_dir(), f"grid-{_signature(paths)}.npz")
+    if os.path.exists(persisted):
+        with np.load(persisted) as f:
+            points = {k: f[k] for k in f.files}
+    else:
+        points = _read_points(grid_file, files)
+        os.makedirs(tmy.cache_dir(), exist_ok=True)
+        tmp = f"{persisted}.{os.getpid()}.npz"
+        np.savez(tmp, **points)
+        os.replace(tmp, persisted)
+    return WeatherGrid(**points)
+
+
+_grid = None
+_grid_state = None
+_grid_lock = threading.Lock()
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _state() -> tuple:
+    # changes when weather files are added or removed or the grid file is
+    # replaced, unlike _signature without reading every file
+    grid_file = os.environ.get(GRID_ENV) or None
+    directory = tmy.weather_dir()
+    return (
+        grid_file,
+        _mtime(grid_file) if grid_file is not None else None,
+        directory,
+        _mtime(directory),
+    )
+
+
+def grid() -> WeatherGrid:
+    # built on first use and rebuilt once the weather data changed
+    global _grid, _grid_state
+    state = _state()
+    with _grid_lock:
+        if _grid is None or state != _grid_state:
+            _grid = build()
+            _grid_state = state
+        return _grid
+
+
+@metrics.timed("weather_grid.lookup")
+def lookup(lat: float, lon: float) -> GridMatch:
+    return grid().lookup(lat, lon)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="local weather grid")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="compute and persist the grid points")
+    query = sub.add_parser("lookup", help="monthly factors of a location")
+    query.add_argument("lat", type=float)
+    query.add_argument("lon", type=float)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(f"{len(grid())} points, persisted in {tmy.cache_dir()}")
+    else:
+        match = lookup(args.lat, args.lon)
+        print(match.json() if match is not None else "no local weather data in range")
+
+
+if __name__ == "__main__":
+    main()